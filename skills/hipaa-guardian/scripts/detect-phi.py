@@ -16,26 +16,52 @@ Options:
     --exclude        File patterns to exclude (glob)
     --synthetic      Treat all findings as synthetic/test data
     --verbose, -v    Verbose output
+    --watch          Rescan files as they change and print new/resolved findings
 """
 
+if __name__ == '__main__':
+    # Hand the run to hipaa-guardiand if it is running, before paying for
+    # the imports below; it returns, and the script runs itself, if not
+    from hipaa_core.daemon import run_in_daemon
+    run_in_daemon('detect-phi')
+
 import argparse
+import bisect
 import hashlib
+import io
+import ipaddress
 import json
+import mmap
 import os
 import re
 import sys
-from dataclasses import dataclass, field, asdict
+from collections import Counter
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from functools import partial
+from itertools import chain, islice
+from typing import Callable, Iterator, Optional, TextIO, Tuple
+
+from hipaa_core import (DEFAULT_CACHE_DIR, SNIFF_BYTES, ArchiveLimitError, CdaSyntaxError,
+                        CdaValue, CorruptArchiveError, Dialect, FailFastGate, GlobMatcher,
+                        JsonSyntaxError, LineIndex, MemberLimitError, ScanCache, SourceFile,
+                        WatchedTree, add_fail_fast_argument, add_watch_argument, cell_value,
+                        element_spans, field_spans, field_values, is_archive, iter_cda_blocks,
+                        iter_hl7_blocks, iter_json_regions, iter_members, iter_ncpdp_blocks,
+                        iter_records, iter_text_windows, iter_windows, iter_x12_blocks,
+                        member_opener, repetition_spans, ruleset_fingerprint, scan_files, sniff,
+                        sniff_dialect, sniff_header, split_excludes, split_record, walk_files,
+                        watch_tree)
 
 
 # =============================================================================
 # Security Constants & Input Sanitization
 # =============================================================================
 
-# Maximum file size to scan (10 MB) - prevents memory exhaustion from
-# adversarial or excessively large inputs
+# Maximum file size to load whole (10 MB) - prevents memory exhaustion from
+# adversarial or excessively large inputs. Larger files are streamed in
+# bounded windows, or skipped with --no-stream.
 MAX_FILE_SIZE_BYTES = 10 * 1024 * 1024
 
 # Maximum number of findings per file to prevent output flooding
@@ -80,10 +106,11 @@ def sanitize_output_string(value: str, max_length: int = 1000) -> str:
     return cleaned
 
 
-def is_safe_file(file_path: Path) -> bool:
+def is_safe_file(file_path: Path, max_size: Optional[int] = MAX_FILE_SIZE_BYTES) -> bool:
     """Check if a file is safe to scan.
 
     Validates file size, type, and path to prevent processing of adversarial inputs.
+    A max_size of None skips the size check, for files that are streamed.
     """
     try:
         # Check file exists and is a regular file (not a device, pipe, etc.)
@@ -94,17 +121,28 @@ def is_safe_file(file_path: Path) -> bool:
         if not resolved.is_file():
             return False
         # Enforce file size limit
-        if resolved.stat().st_size > MAX_FILE_SIZE_BYTES:
+        if max_size is not None and resolved.stat().st_size > max_size:
             return False
         return True
     except (OSError, ValueError):
         return False
 
 
+def is_oversized(file_path: Path) -> bool:
+    """Return True if file_path is too large to load whole."""
+    try:
+        return file_path.stat().st_size > MAX_FILE_SIZE_BYTES
+    except OSError:
+        return False
+
+
 # =============================================================================
 # Detection Patterns
 # =============================================================================
 
+# A family with 'anchors' can only match when one of those literals occurs in
+# the file (case-insensitively if 'anchor_case_insensitive' is set), so its
+# patterns are skipped for files that contain none of them.
 PATTERNS = {
     'ssn': {
         'name': 'Social Security Number',
@@ -124,6 +162,8 @@ PATTERNS = {
         ],
         'sensitivity': 80,
         'classification': 'PHI',
+        'anchors': ['mr', 'medical', 'pat', 'pid'],
+        'anchor_case_insensitive': True,
     },
     'dob': {
         'name': 'Date of Birth',
@@ -152,6 +192,8 @@ PATTERNS = {
         ],
         'sensitivity': 60,
         'classification': 'PII',
+        'anchors': ['fax', 'facsimile'],
+        'anchor_case_insensitive': True,
     },
     'email': {
         'name': 'Email Address',
@@ -160,6 +202,7 @@ PATTERNS = {
         ],
         'sensitivity': 55,
         'classification': 'PII',
+        'anchors': ['@'],
     },
     'address': {
         'name': 'Physical Address',
@@ -187,6 +230,8 @@ PATTERNS = {
         ],
         'sensitivity': 75,
         'classification': 'PHI',
+        'anchors': ['member', 'subscriber', 'insurance', 'policy', 'medicare', 'medicaid'],
+        'anchor_case_insensitive': True,
     },
     'account_number': {
         'name': 'Account Number',
@@ -208,6 +253,8 @@ PATTERNS = {
         ],
         'sensitivity': 70,
         'classification': 'PII',
+        'anchors': ['driver', 'dl', 'dea', 'npi'],
+        'anchor_case_insensitive': True,
     },
     'device_id': {
         'name': 'Device Identifier',
@@ -233,6 +280,7 @@ PATTERNS = {
         ],
         'sensitivity': 40,
         'classification': 'PII',
+        'anchors': ['http'],
     },
     'biometric': {
         'name': 'Biometric Identifier',
@@ -241,6 +289,16 @@ PATTERNS = {
         ],
         'sensitivity': 95,
         'classification': 'PHI',
+        'anchors': ['fingerprint', 'biometric'],
+        'anchor_case_insensitive': True,
+    },
+    # Names have no reliable text pattern; they are only reported from the
+    # fields of structured formats that hold them
+    'person_name': {
+        'name': 'Person Name',
+        'patterns': [],
+        'sensitivity': 70,
+        'classification': 'PHI',
     },
     'fhir_patient': {
         'name': 'FHIR Patient Resource',
@@ -250,6 +308,7 @@ PATTERNS = {
         ],
         'sensitivity': 95,
         'classification': 'PHI',
+        'anchors': ['"resourceType"'],
     },
     'fhir_identifier': {
         'name': 'FHIR Patient Identifier',
@@ -259,25 +318,46 @@ PATTERNS = {
         ],
         'sensitivity': 90,
         'classification': 'PHI',
+        'anchors': ['"identifier"', '"birthDate"'],
     },
     'hl7_segment': {
         'name': 'HL7 Message Segment',
         'patterns': [
-            (r'^MSH\|[^|]*\|[^|]*\|[^|]*\|[^|]*\|[^|]*\|[^|]*\|[^|]*\|(ADT|ORU|ORM)', 'hl7_header'),
-            (r'^PID\|', 'hl7_patient'),
-            (r'^DG1\|', 'hl7_diagnosis'),
-            (r'^OBX\|', 'hl7_observation'),
+            (r'(?m)^MSH\|(?:[^|\n]*\|){7}(ADT|ORU|ORM)', 'hl7_header'),
+            (r'(?m)^PID\|', 'hl7_patient'),
+            (r'(?m)^DG1\|', 'hl7_diagnosis'),
+            (r'(?m)^OBX\|', 'hl7_observation'),
         ],
         'sensitivity': 95,
         'classification': 'PHI',
+        'anchors': ['MSH|', 'PID|', 'DG1|', 'OBX|'],
     },
     'hl7_ssn': {
         'name': 'HL7 SSN Field',
         'patterns': [
-            (r'^PID\|(?:[^|]*\|){18}(\d{3}-\d{2}-\d{4})', 'hl7_pid_ssn'),
+            (r'(?m)^PID\|(?:[^|\n]*\|){18}(\d{3}-\d{2}-\d{4})', 'hl7_pid_ssn'),
         ],
         'sensitivity': 100,
         'classification': 'PHI',
+        'anchors': ['PID|'],
+    },
+    'x12_transaction': {
+        'name': 'X12 Healthcare Transaction',
+        'patterns': [
+            (r'\bST\*(270|271|276|277|278|834|835|837)\*', 'x12_transaction'),
+        ],
+        'sensitivity': 85,
+        'classification': 'PHI',
+        'anchors': ['ST*'],
+    },
+    'ncpdp_transaction': {
+        'name': 'NCPDP Pharmacy Transaction',
+        'patterns': [
+            (r'\x1cAM01\x1c', 'ncpdp_patient'),
+        ],
+        'sensitivity': 90,
+        'classification': 'PHI',
+        'anchors': ['\x1cAM01'],
     },
     'cda_document': {
         'name': 'CDA Clinical Document',
@@ -287,6 +367,7 @@ PATTERNS = {
         ],
         'sensitivity': 95,
         'classification': 'PHI',
+        'anchors': ['<ClinicalDocument', '<patientRole>'],
     },
     'genetic_data': {
         'name': 'Genetic/Genomic Data',
@@ -300,160 +381,832 @@ PATTERNS = {
     },
 }
 
-# Exclusion patterns to reduce false positives
+# Exclusion rules to reduce false positives. Each identifier type with rules
+# has a validator below that checks candidates numerically or by set lookup.
 EXCLUSIONS = {
-    'ssn': [
-        r'000-\d{2}-\d{4}',  # Invalid area
-        r'666-\d{2}-\d{4}',  # Invalid area
-        r'9\d{2}-\d{2}-\d{4}',  # Invalid area
-        r'\d{3}-00-\d{4}',  # Invalid group
-        r'\d{3}-\d{2}-0000',  # Invalid serial
-    ],
-    'phone': [
-        r'555-01\d{2}',  # Fictional numbers
-        r'1-800-',
-        r'1-888-',
-        r'1-877-',
-    ],
-    'email': [
-        r'@example\.com$',
-        r'@test\.com$',
-        r'@localhost$',
-        r'^noreply@',
-        r'^no-reply@',
-    ],
-    'ip_address': [
-        r'^127\.',  # Localhost
-        r'^0\.0\.0\.0$',
-        r'^192\.168\.',  # Private (may still want to flag)
-        r'^10\.',  # Private
-    ],
+    'ssn': {
+        # Never-issued area numbers: 000, 666 and 900-999
+        'invalid_areas': {0, 666},
+        'invalid_area_floor': 900,
+        'invalid_group': 0,
+        'invalid_serial': 0,
+    },
+    'phone': {
+        # 555-0100 through 555-0199 are reserved for fiction
+        'fictional_exchange': 555,
+        'fictional_lines': (100, 199),
+        'toll_free_area_codes': {800, 888, 877},
+    },
+    'email': {
+        'domains': {'example.com', 'example.org', 'example.net', 'test.com', 'localhost'},
+        'local_parts': {'noreply', 'no-reply'},
+    },
+    'ip_address': {
+        'networks': [
+            '0.0.0.0/32',       # Unspecified
+            '127.0.0.0/8',      # Loopback
+            '10.0.0.0/8',       # Private
+            '172.16.0.0/12',    # Private
+            '192.168.0.0/16',   # Private (may still want to flag)
+            '169.254.0.0/16',   # Link-local
+            '192.0.2.0/24',     # Documentation (TEST-NET-1)
+            '198.51.100.0/24',  # Documentation (TEST-NET-2)
+            '203.0.113.0/24',   # Documentation (TEST-NET-3)
+        ],
+    },
+}
+
+
+# =============================================================================
+# Exclusion Validators
+# =============================================================================
+
+def _index_networks(networks: list) -> dict:
+    """Map each first octet to the (network, netmask) integer pairs of the
+    excluded networks it falls in, so most addresses need one dict lookup."""
+    index = {}
+    for net in map(ipaddress.IPv4Network, networks):
+        first = int(net.network_address) >> 24
+        last = int(net.broadcast_address) >> 24
+        for octet in range(first, last + 1):
+            index.setdefault(octet, []).append(
+                (int(net.network_address), int(net.netmask)))
+    return index
+
+
+EXCLUDED_NETWORKS = _index_networks(EXCLUSIONS['ip_address']['networks'])
+
+
+NON_DIGITS = re.compile(r'\D')
+
+
+def _ssn_excluded(value: str) -> bool:
+    """Exclude SSNs with a never-issued area, group 00 or serial 0000."""
+    if len(value) == 11 and value[3] in '- ' and value[6] in '- ':
+        # Fast path for the unlabeled ddd-dd-dddd / ddd dd dddd forms
+        digits = value[:3] + value[4:6] + value[7:]
+    else:
+        digits = NON_DIGITS.sub('', value)
+    if len(digits) != 9:
+        return False
+    rules = EXCLUSIONS['ssn']
+    area = int(digits[:3])
+    return (area in rules['invalid_areas']
+            or area >= rules['invalid_area_floor']
+            or int(digits[3:5]) == rules['invalid_group']
+            or int(digits[5:]) == rules['invalid_serial'])
+
+
+def _phone_excluded(value: str) -> bool:
+    """Exclude fictional 555-01xx numbers and toll-free lines."""
+    if len(value) == 12 and value[3] in '-. ' and value[7] in '-. ':
+        # Fast path for the unlabeled ddd-ddd-dddd form
+        digits = value[:3] + value[4:7] + value[8:]
+    else:
+        digits = NON_DIGITS.sub('', value)
+    if len(digits) == 11 and digits[0] == '1':
+        digits = digits[1:]
+    if len(digits) != 10:
+        return False
+    rules = EXCLUSIONS['phone']
+    if int(digits[:3]) in rules['toll_free_area_codes']:
+        return True
+    low, high = rules['fictional_lines']
+    return (int(digits[3:6]) == rules['fictional_exchange']
+            and low <= int(digits[6:]) <= high)
+
+
+def _email_excluded(value: str) -> bool:
+    """Exclude documentation domains and no-reply mailboxes."""
+    local, _, domain = value.lower().rpartition('@')
+    rules = EXCLUSIONS['email']
+    return domain in rules['domains'] or local in rules['local_parts']
+
+
+def _ip_excluded(value: str) -> bool:
+    """Exclude unspecified, loopback, private and documentation addresses."""
+    parts = value.split('.')
+    if len(parts) != 4 or not all(part.isdigit() for part in parts):
+        return False
+    networks = EXCLUDED_NETWORKS.get(int(parts[0]))
+    if not networks:
+        return False
+    address = ((int(parts[0]) << 24) | (int(parts[1]) << 16)
+               | (int(parts[2]) << 8) | int(parts[3]))
+    return any(address & mask == network for network, mask in networks)
+
+
+EXCLUSION_VALIDATORS = {
+    'ssn': _ssn_excluded,
+    'phone': _phone_excluded,
+    'email': _email_excluded,
+    'ip_address': _ip_excluded,
 }
 
 
+# =============================================================================
+# Checksum Validators
+# =============================================================================
+
+# Card numbers, NPIs, DEA numbers and VINs end in a check digit. A candidate
+# that fails its check is an arbitrary run of the right shape (a build ID, a
+# hash, a timestamp) and is dropped before a finding is built for it.
+
+# Luhn value of each digit in a doubled position
+LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+# An NPI's Luhn check covers the card issuer prefix 80840 as well
+NPI_PREFIX = '80840'
+
+# VIN character values and position weights (49 CFR 565.15); the check
+# digit is position 9, with 10 written as 'X'
+VIN_VALUES = {**{str(d): d for d in range(10)},
+              **dict(zip('ABCDEFGH', range(1, 9))), **dict(zip('JKLMN', range(1, 6))),
+              'P': 7, 'R': 9, **dict(zip('STUVWXYZ', range(2, 10)))}
+VIN_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+def luhn_valid(digits: str) -> bool:
+    """Return True if a string of digits passes the Luhn (mod 10) check."""
+    total = sum(map(int, digits[-1::-2]))
+    total += sum(LUHN_DOUBLED[int(d)] for d in digits[-2::-2])
+    return total % 10 == 0
+
+
+def _npi_valid(value: str) -> bool:
+    """Check the Luhn digit of the 10-digit NPI ending a labeled match."""
+    return luhn_valid(NPI_PREFIX + value[-10:])
+
+
+def _dea_valid(value: str) -> bool:
+    """Check the last digit of the DEA number (two letters, seven digits)
+    ending a labeled match."""
+    digits = [int(d) for d in value[-7:]]
+    total = digits[0] + digits[2] + digits[4] + 2 * (digits[1] + digits[3] + digits[5])
+    return total % 10 == digits[6]
+
+
+def _vin_valid(value: str) -> bool:
+    """Check the ninth character of a 17-character VIN."""
+    total = sum(VIN_VALUES[c] * w for c, w in zip(value, VIN_WEIGHTS))
+    check = total % 11
+    return value[8] == ('X' if check == 10 else str(check))
+
+
+CHECKSUM_VALIDATORS = {
+    ('account_number', 'visa'): luhn_valid,
+    ('account_number', 'mastercard'): luhn_valid,
+    ('account_number', 'amex'): luhn_valid,
+    ('license', 'npi'): _npi_valid,
+    ('license', 'dea'): _dea_valid,
+    ('device_id', 'vin'): _vin_valid,
+}
+
+# Candidates rejected by CHECKSUM_VALIDATORS in the file being scanned, by
+# (identifier_type, pattern_name). Reset for each file by scan_file_counted.
+CHECKSUM_REJECTIONS = Counter()
+
+
+# =============================================================================
+# Healthcare Keywords
+# =============================================================================
+
+# Terms that raise a match's confidence when one is near it: the "Context
+# Keywords" of references/detection-patterns.md, with the forms of
+# 'clinic', 'health', 'medical' and 'patient' scored before they were added
+HEALTHCARE_KEYWORDS = (
+    # Medical terms
+    'patient', 'inpatient', 'outpatient', 'diagnosis', 'treatment', 'medication',
+    'prescription', 'admission', 'discharge', 'visit', 'appointment', 'referral',
+    # Facility terms
+    'hospital', 'clinic', 'clinical', 'medical', 'medical center', 'health',
+    'healthcare', 'provider', 'physician', 'doctor', 'nurse', 'pharmacy',
+    # Record terms
+    'medical record', 'chart', 'history', 'notes', 'report', 'lab', 'radiology',
+    'imaging', 'results',
+    # Insurance terms
+    'insurance', 'coverage', 'claim', 'billing', 'copay', 'deductible',
+    'authorization', 'pre-auth',
+    # HIPAA terms
+    'PHI', 'protected health information', 'confidential', 'HIPAA', 'privacy',
+    'consent',
+)
+
+# Characters either side of a match searched for a keyword (--keyword-window)
+DEFAULT_KEYWORD_WINDOW = 30
+
+# Characters of a buffer indexed for keywords at a time
+KEYWORD_SEGMENT_CHARS = 1024
+
+# Longest keyword, with its plural ending
+KEYWORD_MAX_CHARS = max(map(len, HEALTHCARE_KEYWORDS)) + 1
+
+# Keywords, longest first so 'medical record' wins over 'medical'. Text is
+# lowered before it is searched, which is several times faster than
+# matching ignoring case; non-ASCII text, which lower() may lengthen, is
+# matched ignoring case instead. Word boundaries are checked after a match.
+_KEYWORD_ALTERNATION = '|'.join(
+    re.escape(keyword.lower())
+    for keyword in sorted(HEALTHCARE_KEYWORDS, key=len, reverse=True))
+KEYWORD_PATTERN = re.compile(_KEYWORD_ALTERNATION)
+KEYWORD_PATTERN_BYTES = re.compile(_KEYWORD_ALTERNATION.encode('ascii'))
+KEYWORD_PATTERN_ANY_CASE = re.compile(_KEYWORD_ALTERNATION, re.IGNORECASE)
+
+
+def keyword_end(text, start: int, end: int) -> Optional[int]:
+    """Return where the keyword match text[start:end] ends, after a plural
+    's', or None if it is part of a longer word.
+
+    A keyword may be a word or one part of an identifier, so 'patients',
+    'patient_ssn', 'patientId' and 'dobPatient' count but 'label' and
+    'graphic' do not.
+    """
+    before = text[start - 1:start] if start else text[:0]
+    if before.isalpha() and not (before.islower() and text[start:start + 1].isupper()):
+        return None
+    stop = end
+    while True:
+        after = text[stop:stop + 1]
+        if not after.isalpha() or (after.isupper() and text[stop - 1:stop].islower()):
+            return stop
+        if stop > end or after.lower() not in ('s', b's'):
+            return None
+        stop += 1
+
+
+class NearbyKeywords:
+    """Answers whether a healthcare keyword is near a match.
+
+    A buffer is indexed a segment at a time, the first time a match near
+    the segment is asked about: one pass of KEYWORD_PATTERN records the
+    sorted offsets of every keyword starting in it, and each question after
+    that is a binary search. A file with few findings only pays for the
+    segments around them. Only the last buffer's index is kept, as a
+    buffer's findings are built together.
+    """
+
+    def __init__(self, window: int = DEFAULT_KEYWORD_WINDOW):
+        self.window = window
+        self.clear()
+
+    def clear(self):
+        self._content = None
+        # segment number -> (keyword starts, keyword ends)
+        self._segments: dict = {}
+
+    def _segment(self, number: int) -> tuple:
+        content = self._content
+        low = number * KEYWORD_SEGMENT_CHARS
+        high = low + KEYWORD_SEGMENT_CHARS
+        # A keyword starting in the segment may end past it, and the
+        # characters either side of it decide its word boundaries
+        first = max(0, low - 1)
+        limit = min(len(content), high + KEYWORD_MAX_CHARS + 1)
+        piece = content[first:limit]
+        if not isinstance(piece, str):
+            matches = KEYWORD_PATTERN_BYTES.finditer(piece.lower())
+        elif piece.isascii():
+            matches = KEYWORD_PATTERN.finditer(piece.lower())
+        else:
+            matches = KEYWORD_PATTERN_ANY_CASE.finditer(piece)
+        starts, ends = [], []
+        for match in matches:
+            offset = match.start()
+            if offset + first >= high:
+                break
+            if offset + first < low:
+                continue
+            stop = keyword_end(piece, offset, match.end())
+            # The character after a keyword ending the piece is unknown
+            if stop is not None and (stop < len(piece) or limit == len(content)):
+                starts.append(offset + first)
+                ends.append(stop + first)
+        spans = self._segments[number] = (starts, ends)
+        return spans
+
+    def near(self, content, start: int, end: int) -> bool:
+        """Return True if a keyword lies wholly within the window before
+        content[start:end] or wholly within the window after it."""
+        if content is not self._content:
+            self.clear()
+            self._content = content
+        low = max(0, start - self.window)
+        high = end + self.window
+        segments = self._segments
+        for number in range(low // KEYWORD_SEGMENT_CHARS,
+                            (high - 1) // KEYWORD_SEGMENT_CHARS + 1):
+            spans = segments.get(number) or self._segment(number)
+            starts = spans[0]
+            if not starts:
+                continue
+            ends = spans[1]
+            index = bisect.bisect_left(starts, low)
+            while index < len(starts) and starts[index] < high:
+                if ends[index] <= start or (starts[index] >= end and ends[index] <= high):
+                    return True
+                index += 1
+        return False
+
+
+NEARBY_KEYWORDS = NearbyKeywords()
+
+
+# =============================================================================
+# Pattern Engine
+# =============================================================================
+
+# Leading global inline flags such as "(?i)". Python refuses global flags in
+# the middle of an expression, so they are rewritten as scoped "(?i:...)"
+# groups before the patterns are joined into one alternation.
+INLINE_FLAGS = re.compile(r'^\(\?([aiLmsux]+)\)')
+
+
+def _uncapture(pattern: str) -> str:
+    """Turn capturing groups into non-capturing ones.
+
+    The engine only needs to know which pattern matched, and a branch that
+    opens with a capture group cannot use the regex engine's first-character
+    fast path, so inner groups are dropped from the combined expressions.
+    """
+    out = []
+    i = 0
+    in_class = False
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\':
+            out.append(pattern[i:i + 2])
+            i += 2
+            continue
+        if in_class:
+            if ch == ']':
+                in_class = False
+        elif ch == '[':
+            in_class = True
+            out.append(ch)
+            i += 1
+            # A leading "^" or "]" is literal inside a class
+            if pattern.startswith('^', i):
+                out.append('^')
+                i += 1
+            if pattern.startswith(']', i):
+                out.append(']')
+                i += 1
+            continue
+        elif ch == '(' and not pattern.startswith('?', i + 1):
+            out.append('(?:')
+            i += 1
+            continue
+        out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def _compile_branches(branches: list, tagged: bool, binary: bool = False) -> Optional[re.Pattern]:
+    """Join engine branches into one alternation, optionally tagging each
+    with a named group that records its PATTERNS index. With binary set the
+    alternation is compiled as a bytes pattern."""
+    bounded = []
+    unbounded = []
+    for index, flags, body, word_bounded in branches:
+        expr = f'(?{flags}:{body})' if flags else f'(?:{body})'
+        if tagged:
+            expr = f'(?P<p{index}>{expr})'
+        (bounded if word_bounded else unbounded).append(expr)
+    parts = []
+    if bounded:
+        parts.append(r'\b(?:' + '|'.join(bounded) + ')')
+    parts.extend(unbounded)
+    if not parts:
+        return None
+    expression = '|'.join(parts)
+    return re.compile(expression.encode('ascii') if binary else expression)
+
+
+class PatternEngine:
+    """Single-pass matcher over every entry in PATTERNS.
+
+    All patterns are compiled once into one alternation (with the common
+    leading \\b factored out) that walks the content a single time to find
+    candidate positions. At each candidate an anchored, group-tagged copy of
+    the alternation identifies which patterns match there. Matches are
+    returned in the same order, and with the same non-overlap rules, as
+    running re.finditer once per pattern.
+
+    Families that declare 'anchors' are only searched for when one of their
+    literal anchors occurs in the content; a substring check per anchor
+    decides which of them to switch off.
+
+    A binary engine matches bytes-like content (bytes or an mmap) of ASCII
+    text, where bytes and str patterns behave identically.
+    """
+
+    def __init__(self, patterns: dict, binary: bool = False):
+        self.binary = binary
+        # entries[i] = (identifier_type, pattern_name)
+        self.entries = []
+        branches = []
+        for identifier_type, config in patterns.items():
+            for pattern, pattern_name in config['patterns']:
+                index = len(self.entries)
+                self.entries.append((identifier_type, pattern_name))
+                flags_match = INLINE_FLAGS.match(pattern)
+                flags = flags_match.group(1) if flags_match else ''
+                body = pattern[flags_match.end():] if flags_match else pattern
+                word_bounded = body.startswith(r'\b')
+                if word_bounded:
+                    body = body[2:]
+                branches.append((index, flags, _uncapture(body), word_bounded))
+        self.families = frozenset(patterns)
+
+        # Word-bounded branches go first so they share one \b check; the
+        # alternation order is otherwise irrelevant because every pattern
+        # matching at a candidate position is collected.
+        self._order = ([b for b in branches if b[3]] +
+                       [b for b in branches if not b[3]])
+        self._rank = {b[0]: rank for rank, b in enumerate(self._order)}
+        # Candidate scanners per active family set, and _tails[r], which
+        # identifies the patterns ranked r or later at one position. Both
+        # are compiled on first use.
+        self._scanners = {}
+        self._tails = {}
+
+        # family -> (anchor literals, case-insensitive) for gated families
+        self._anchors = {}
+        for identifier_type, config in patterns.items():
+            if not config.get('anchors'):
+                continue
+            case_insensitive = bool(config.get('anchor_case_insensitive'))
+            anchors = [anchor.casefold() if case_insensitive else anchor
+                       for anchor in config['anchors']]
+            if binary:
+                anchors = [anchor.encode('ascii') for anchor in anchors]
+            self._anchors[identifier_type] = (tuple(anchors), case_insensitive)
+        self.gated_families = frozenset(self._anchors)
+        # Folded blocks of bytes content overlap by this much so an anchor
+        # straddling two blocks is still seen
+        self._anchor_overlap = max(
+            (len(anchor) for anchors, _ in self._anchors.values() for anchor in anchors),
+            default=1) - 1
+
+    def _scanner(self, families: frozenset) -> Optional[re.Pattern]:
+        """Untagged alternation of the branches of the given families."""
+        if families not in self._scanners:
+            self._scanners[families] = _compile_branches(
+                [b for b in self._order if self.entries[b[0]][0] in families],
+                tagged=False, binary=self.binary)
+        return self._scanners[families]
+
+    def _tail(self, rank: int) -> Optional[re.Pattern]:
+        """Tagged alternation of the branches ranked at or after rank."""
+        if rank not in self._tails:
+            self._tails[rank] = _compile_branches(self._order[rank:], tagged=True,
+                                                  binary=self.binary)
+        return self._tails[rank]
+
+    def _folded_blocks(self, content):
+        """Yield casefolded copies of content: all of it for str, and
+        overlapping 1 MB blocks for bytes-like content such as an mmap."""
+        if isinstance(content, str):
+            yield content.casefold()
+            return
+        block = 1024 * 1024
+        for start in range(0, len(content), block):
+            yield content[max(0, start - self._anchor_overlap):start + block].lower()
+
+    def active_families(self, content) -> frozenset:
+        """Return the families that can possibly match content.
+
+        Ungated families are always active. Anchors are plain substring
+        checks, against casefolded content for case-insensitive families,
+        and a family is confirmed by its first anchor found.
+        """
+        active = set(self.families - self.gated_families)
+        folding = {}
+        for family, (anchors, case_insensitive) in self._anchors.items():
+            if case_insensitive:
+                folding[family] = anchors
+            elif any(content.find(anchor) != -1 for anchor in anchors):
+                active.add(family)
+        if folding:
+            for folded in self._folded_blocks(content):
+                for family, anchors in list(folding.items()):
+                    if any(anchor in folded for anchor in anchors):
+                        active.add(family)
+                        del folding[family]
+                if not folding:
+                    break
+        return frozenset(active)
+
+    def scan(self, content, families: Optional[frozenset] = None) -> list:
+        """Return (entry_index, start, end) for every match in content,
+        ordered by entry index and then position.
+
+        Only families in families are searched for (default: all). Patterns
+        of other families are still identified at a candidate position, which
+        is harmless because a family is only left out when it cannot match.
+        """
+        scanner = self._scanner(self.families if families is None else families)
+        matches = []
+        if scanner is None:
+            return matches
+        next_allowed = [0] * len(self.entries)
+        search = scanner.search
+        identify = self._tail(0).match
+        pos = 0
+        while True:
+            candidate = search(content, pos)
+            if candidate is None:
+                break
+            start = candidate.start()
+            match = identify(content, start)
+            while match is not None:
+                index = int(match.lastgroup[1:])
+                end = match.end()
+                # Per-pattern non-overlap, as re.finditer would enforce
+                if next_allowed[index] <= start:
+                    matches.append((index, start, end))
+                    next_allowed[index] = end
+                tail = self._tail(self._rank[index] + 1)
+                match = tail.match(content, start) if tail is not None else None
+            pos = start + 1
+        matches.sort(key=lambda m: m[0])
+        return matches
+
+
+PATTERN_ENGINE = PatternEngine(PATTERNS)
+BYTES_PATTERN_ENGINE = PatternEngine(PATTERNS, binary=True)
+
+# Any byte other than printable ASCII, tab, LF, VT and FF. A file without
+# one is matched as bytes with identical results: it has no \r for
+# universal-newline decoding to rewrite, and none of the non-ASCII or
+# separator characters where str patterns apply Unicode rules to \b, \d
+# and \s.
+NOT_PLAIN_ASCII = re.compile(rb'[^\t\n\x0b\x0c\x20-\x7f]')
+
+
 # =============================================================================
 # Data Classes
 # =============================================================================
 
-@dataclass
+def _hipaa_rules(config: dict) -> tuple:
+    """HIPAA rules that apply to every finding of one identifier type."""
+    if config['classification'] != 'PHI':
+        return ()
+    return (
+        {
+            'rule': 'Privacy Rule',
+            'section': '164.514(b)(2)',
+            'description': f"{config['name']} is a HIPAA identifier requiring protection"
+        },
+        {
+            'rule': 'Security Rule',
+            'section': '164.312(a)(1)',
+            'description': 'Access controls required for ePHI'
+        },
+    )
+
+
+def _remediation_steps(identifier_type: str, config: dict) -> tuple:
+    """Remediation steps shared by every finding of one identifier type."""
+    steps = (
+        f"Remove or encrypt the {config['name']}",
+        'Implement access controls',
+        'Add audit logging for access',
+    )
+    if identifier_type == 'ssn':
+        steps = ('URGENT: SSN requires immediate remediation',) + steps
+    return steps
+
+
+# Rule and remediation text depends only on the identifier type, so it is
+# built once here and expanded into each finding only when serialized
+HIPAA_RULES = {t: _hipaa_rules(config) for t, config in PATTERNS.items()}
+REMEDIATION_STEPS = {t: _remediation_steps(t, config) for t, config in PATTERNS.items()}
+
+# Severities from least to most severe, ranked for --severity
+SEVERITY_RANK = {'informational': 0, 'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+
+
+def risk_score(identifier_type: str, confidence: float) -> int:
+    """Calculate risk score based on sensitivity and confidence."""
+    # Simplified risk calculation
+    base = PATTERNS[identifier_type]['sensitivity'] * confidence
+    return min(100, int(base))
+
+
+def severity_for(risk: int) -> str:
+    """Map risk score to severity level."""
+    if risk >= 90:
+        return 'critical'
+    elif risk >= 70:
+        return 'high'
+    elif risk >= 50:
+        return 'medium'
+    elif risk >= 25:
+        return 'low'
+    return 'informational'
+
+
+@dataclass(slots=True)
 class Finding:
-    """Represents a single PHI/PII finding."""
+    """Represents a single PHI/PII finding.
+
+    Only per-match data is stored. Name, classification, sensitivity, HIPAA
+    rules and remediation steps come from the identifier type's shared
+    tables; to_dict() expands them into the full record.
+    """
     id: str
     timestamp: str
     file: str
     line: int
     column: int
     identifier_type: str
-    identifier_name: str
     pattern_name: str
     value_hash: str
     context: str
-    classification: str
     confidence: float
-    sensitivity: int
     risk_score: int = 0
     severity: str = ''
-    hipaa_rules: list = field(default_factory=list)
-    remediation_steps: list = field(default_factory=list)
     status: str = 'open'
+    field: Optional[str] = None  # element path, for structured formats
+    match_count: Optional[int] = None  # values found, for a column-level finding
 
     def __post_init__(self):
         self.risk_score = self._calculate_risk()
         self.severity = self._get_severity()
-        self.hipaa_rules = self._get_hipaa_rules()
-        self.remediation_steps = self._get_remediation()
+
+    @property
+    def identifier_name(self) -> str:
+        return PATTERNS[self.identifier_type]['name']
+
+    @property
+    def classification(self) -> str:
+        return PATTERNS[self.identifier_type]['classification']
+
+    @property
+    def sensitivity(self) -> int:
+        return PATTERNS[self.identifier_type]['sensitivity']
 
     def _calculate_risk(self) -> int:
-        """Calculate risk score based on sensitivity and confidence."""
-        # Simplified risk calculation
-        base = self.sensitivity * self.confidence
-        return min(100, int(base))
+        return risk_score(self.identifier_type, self.confidence)
 
     def _get_severity(self) -> str:
-        """Map risk score to severity level."""
-        if self.risk_score >= 90:
-            return 'critical'
-        elif self.risk_score >= 70:
-            return 'high'
-        elif self.risk_score >= 50:
-            return 'medium'
-        elif self.risk_score >= 25:
-            return 'low'
-        return 'informational'
-
-    def _get_hipaa_rules(self) -> list:
-        """Get applicable HIPAA rules for this finding."""
-        rules = []
-        if self.classification == 'PHI':
-            rules.append({
-                'rule': 'Privacy Rule',
-                'section': '164.514(b)(2)',
-                'description': f'{self.identifier_name} is a HIPAA identifier requiring protection'
-            })
-            rules.append({
-                'rule': 'Security Rule',
-                'section': '164.312(a)(1)',
-                'description': 'Access controls required for ePHI'
-            })
-        return rules
-
-    def _get_remediation(self) -> list:
-        """Get remediation steps for this finding."""
-        steps = [
-            f'Remove or encrypt the {self.identifier_name}',
-            'Implement access controls',
-            'Add audit logging for access',
-        ]
-        if self.identifier_type == 'ssn':
-            steps.insert(0, 'URGENT: SSN requires immediate remediation')
-        return steps
+        return severity_for(self.risk_score)
+
+    def to_dict(self) -> dict:
+        """Expand into the full finding record used by every output format."""
+        config = PATTERNS[self.identifier_type]
+        return {
+            'id': self.id,
+            'timestamp': self.timestamp,
+            'file': self.file,
+            'line': self.line,
+            'column': self.column,
+            'field': self.field,
+            'match_count': self.match_count,
+            'identifier_type': self.identifier_type,
+            'identifier_name': config['name'],
+            'pattern_name': self.pattern_name,
+            'value_hash': self.value_hash,
+            'context': self.context,
+            'classification': config['classification'],
+            'confidence': self.confidence,
+            'sensitivity': config['sensitivity'],
+            'risk_score': self.risk_score,
+            'severity': self.severity,
+            'hipaa_rules': [dict(rule) for rule in HIPAA_RULES[self.identifier_type]],
+            'remediation_steps': list(REMEDIATION_STEPS[self.identifier_type]),
+            'status': self.status,
+        }
+
+
+@dataclass(slots=True)
+class Candidate:
+    """A match that is located and scored but not yet a Finding.
+
+    Severity and the per-file limit are decided on candidates, so context
+    and hash are only worked out, by finding(), for those reported.
+    """
+    content: object  # str, or bytes-like plain ASCII, holding the match
+    start: int
+    end: int
+    value: str
+    identifier_type: str
+    pattern_name: str
+    line: int
+    column: int
+    confidence: float
+    severity: str
+    field: Optional[str] = None
+
+    def finding(self, file_path: str, timestamp: str) -> Finding:
+        return Finding(
+            id='',
+            timestamp=timestamp,
+            file=file_path,
+            line=self.line,
+            column=self.column,
+            identifier_type=self.identifier_type,
+            pattern_name=self.pattern_name,
+            value_hash=hash_value(self.value),
+            context=get_context(self.content, self.start, self.end),
+            confidence=self.confidence,
+            field=self.field,
+        )
+
+
+class SeverityFloor:
+    """The least severity reported (--severity). Candidates below it are
+    dropped before a Finding is built; scan_file_counted sets it per file."""
+
+    def __init__(self):
+        self.rank = 0
+
+    def admits(self, candidate: Candidate) -> bool:
+        return SEVERITY_RANK[candidate.severity] >= self.rank
+
+
+SEVERITY_FLOOR = SeverityFloor()
+
+
+class FileFindings(list):
+    """The findings of one file, with the candidates its checksums rejected
+    as {identifier_type: {pattern_name: count}}, and whether it is an
+    archive that was not read in full."""
+    rejected: dict = {}
+    archive_incomplete: bool = False
 
 
 @dataclass
 class ScanResult:
-    """Container for scan results."""
+    """Container for scan results.
+
+    Summary counts are kept as findings are added, so a streamed (NDJSON
+    only) scan can set retain_findings to False and still report them.
+    """
     findings: list = field(default_factory=list)
     files_scanned: int = 0
+    files_streamed: int = 0
+    skipped_for_size: list = field(default_factory=list)
+    archives_incomplete: list = field(default_factory=list)
     scan_timestamp: str = ''
     scan_duration: float = 0.0
     errors: list = field(default_factory=list)
+    cache_enabled: bool = False
+    cache_hits: int = 0
+    cache_misses: int = 0
+    retain_findings: bool = True
+    total_findings: int = 0
+    by_severity: dict = field(default_factory=lambda: {
+        'critical': 0, 'high': 0, 'medium': 0, 'low': 0, 'informational': 0})
+    by_type: dict = field(default_factory=dict)
+    by_classification: dict = field(default_factory=lambda: {
+        'PHI': 0, 'PII': 0, 'sensitive_nonPHI': 0})
+    rejected_candidates: dict = field(default_factory=dict)
 
     def add_finding(self, finding: Finding):
-        self.findings.append(finding)
+        if self.retain_findings:
+            self.findings.append(finding)
+        self.total_findings += 1
+        self.by_severity[finding.severity] = self.by_severity.get(finding.severity, 0) + 1
+        self.by_type[finding.identifier_type] = self.by_type.get(finding.identifier_type, 0) + 1
+        self.by_classification[finding.classification] = (
+            self.by_classification.get(finding.classification, 0) + 1)
+
+    def add_rejections(self, rejected: dict):
+        for identifier_type, counts in rejected.items():
+            totals = self.rejected_candidates.setdefault(identifier_type, {})
+            for pattern_name, count in counts.items():
+                totals[pattern_name] = totals.get(pattern_name, 0) + count
+
+    def summary(self) -> dict:
+        return {
+            'scan_timestamp': self.scan_timestamp,
+            'scan_duration_seconds': self.scan_duration,
+            'files_scanned': self.files_scanned,
+            'files_streamed': self.files_streamed,
+            'files_skipped_for_size': self.skipped_for_size,
+            'archives_incomplete': self.archives_incomplete,
+            'cache': {
+                'enabled': self.cache_enabled,
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+            },
+            'total_findings': self.total_findings,
+            'by_severity': dict(self.by_severity),
+            'by_type': dict(self.by_type),
+            'by_classification': dict(self.by_classification),
+            'rejected_candidates': {t: dict(sorted(counts.items())) for t, counts
+                                    in sorted(self.rejected_candidates.items())},
+        }
 
     def to_dict(self) -> dict:
         return {
-            'findings': [asdict(f) for f in self.findings],
-            'summary': {
-                'scan_timestamp': self.scan_timestamp,
-                'scan_duration_seconds': self.scan_duration,
-                'files_scanned': self.files_scanned,
-                'total_findings': len(self.findings),
-                'by_severity': self._count_by_severity(),
-                'by_type': self._count_by_type(),
-                'by_classification': self._count_by_classification(),
-            },
+            'findings': [f.to_dict() for f in self.findings],
+            'summary': self.summary(),
             'errors': self.errors,
         }
 
-    def _count_by_severity(self) -> dict:
-        counts = {'critical': 0, 'high': 0, 'medium': 0, 'low': 0, 'informational': 0}
-        for f in self.findings:
-            counts[f.severity] = counts.get(f.severity, 0) + 1
-        return counts
-
-    def _count_by_type(self) -> dict:
-        counts = {}
-        for f in self.findings:
-            counts[f.identifier_type] = counts.get(f.identifier_type, 0) + 1
-        return counts
-
-    def _count_by_classification(self) -> dict:
-        counts = {'PHI': 0, 'PII': 0, 'sensitive_nonPHI': 0}
-        for f in self.findings:
-            counts[f.classification] = counts.get(f.classification, 0) + 1
-        return counts
-
 
 # =============================================================================
 # Detection Functions
@@ -471,7 +1224,12 @@ def redact_value(value: str, show_chars: int = 4) -> str:
     return f"[REDACTED]...{value[-show_chars:]}"
 
 
-def get_context(content: str, match_start: int, match_end: int, context_chars: int = 30) -> str:
+def as_text(value) -> str:
+    """Return value as str; bytes come from ASCII-only content."""
+    return value if isinstance(value, str) else value.decode('ascii')
+
+
+def get_context(content, match_start: int, match_end: int, context_chars: int = 30) -> str:
     """Extract context around a match with redacted value.
 
     Output is sanitized to strip control characters that could be used for
@@ -480,9 +1238,9 @@ def get_context(content: str, match_start: int, match_end: int, context_chars: i
     start = max(0, match_start - context_chars)
     end = min(len(content), match_end + context_chars)
 
-    before = content[start:match_start]
-    matched = content[match_start:match_end]
-    after = content[match_end:end]
+    before = as_text(content[start:match_start])
+    matched = as_text(content[match_start:match_end])
+    after = as_text(content[match_end:end])
 
     # Redact the matched value in context
     redacted = redact_value(matched)
@@ -491,15 +1249,12 @@ def get_context(content: str, match_start: int, match_end: int, context_chars: i
 
 
 def is_excluded(value: str, identifier_type: str) -> bool:
-    """Check if value matches an exclusion pattern."""
-    exclusions = EXCLUSIONS.get(identifier_type, [])
-    for pattern in exclusions:
-        if re.search(pattern, value, re.IGNORECASE):
-            return True
-    return False
+    """Check if value is a known non-PHI value for its identifier type."""
+    validator = EXCLUSION_VALIDATORS.get(identifier_type)
+    return validator is not None and validator(value)
 
 
-def calculate_confidence(pattern_name: str, has_label: bool, context: str) -> float:
+def calculate_confidence(pattern_name: str, has_label: bool, near_keyword: bool) -> float:
     """Calculate confidence score for a detection."""
     base = 0.70
 
@@ -508,110 +1263,1277 @@ def calculate_confidence(pattern_name: str, has_label: bool, context: str) -> fl
         base += 0.20
 
     # Boost for healthcare context
-    healthcare_keywords = ['patient', 'medical', 'health', 'hospital', 'clinic', 'diagnosis']
-    for keyword in healthcare_keywords:
-        if keyword in context.lower():
-            base += 0.05
-            break
+    if near_keyword:
+        base += 0.05
 
     return min(0.99, base)
 
 
-def scan_content(content: str, file_path: str, finding_counter: list) -> list:
-    """Scan content for PHI/PII patterns."""
-    findings = []
-    lines = content.split('\n')
+def build_candidate(content, start: int, end: int, value: str, identifier_type: str,
+                    pattern_name: str, line_index: LineIndex, field: Optional[str] = None,
+                    has_label: bool = False) -> Candidate:
+    """Locate and score content[start:end], whose text is value.
 
-    for identifier_type, config in PATTERNS.items():
-        for pattern, pattern_name in config['patterns']:
-            for match in re.finditer(pattern, content):
-                value = match.group()
+    has_label marks a value whose meaning is known from where it sits, such
+    as a positional HL7 field, which scores like a labeled pattern.
+    """
+    line_num, column = line_index.position(start)
+    confidence = calculate_confidence(pattern_name, has_label or 'labeled' in pattern_name,
+                                      NEARBY_KEYWORDS.near(content, start, end))
+    return Candidate(content, start, end, value, identifier_type, pattern_name, line_num,
+                     column, confidence, severity_for(risk_score(identifier_type, confidence)),
+                     field)
+
+
+def add_findings(findings: list, candidates, file_path: str, timestamp: str,
+                 limit: int = MAX_FINDINGS_PER_FILE) -> list:
+    """Append a Finding for each candidate at or above SEVERITY_FLOOR until
+    findings holds limit entries. candidates may be lazy; none is taken
+    from it once the limit is reached."""
+    if len(findings) >= limit:
+        return findings
+    admits = SEVERITY_FLOOR.admits
+    for candidate in candidates:
+        if admits(candidate):
+            findings.append(candidate.finding(file_path, timestamp))
+            if len(findings) >= limit:
+                break
+    return findings
 
-                # Check exclusions
-                if is_excluded(value, identifier_type):
-                    continue
 
-                # Calculate position
-                line_num = content[:match.start()].count('\n') + 1
-                line_start = content.rfind('\n', 0, match.start()) + 1
-                column = match.start() - line_start + 1
-
-                # Generate finding
-                finding_counter[0] += 1
-                finding_id = f"F-{datetime.now().strftime('%Y%m%d')}-{finding_counter[0]:04d}"
-
-                context = get_context(content, match.start(), match.end())
-                confidence = calculate_confidence(pattern_name, 'labeled' in pattern_name, context)
-
-                finding = Finding(
-                    id=finding_id,
-                    timestamp=datetime.now().isoformat() + 'Z',
-                    file=file_path,
-                    line=line_num,
-                    column=column,
-                    identifier_type=identifier_type,
-                    identifier_name=config['name'],
-                    pattern_name=pattern_name,
-                    value_hash=hash_value(value),
-                    context=context,
-                    classification=config['classification'],
-                    confidence=confidence,
-                    sensitivity=config['sensitivity'],
-                )
-
-                findings.append(finding)
+def match_content(content, line_index: LineIndex, verbose: bool = False,
+                  file_path: str = '', owned: Optional[tuple] = None,
+                  exclude_families: frozenset = frozenset(),
+                  field_of: Optional[Callable[[int], str]] = None) -> Iterator[Candidate]:
+    """Yield a candidate for each pattern match in content, pattern by
+    pattern. See scan_content for the arguments."""
+    engine = PATTERN_ENGINE if isinstance(content, str) else BYTES_PATTERN_ENGINE
+
+    families = engine.active_families(content) - exclude_families
+    if verbose:
+        skipped = len(engine.families) - len(families)
+        print(f"  {file_path}: skipped {skipped} of {len(engine.families)} "
+              "pattern families (anchors absent)", file=sys.stderr)
+
+    for index, start, end in engine.scan(content, families):
+        entry = engine.entries[index]
+        identifier_type, pattern_name = entry
+        if owned is not None and not owned[0] <= start < owned[1]:
+            continue
+        value = as_text(content[start:end])
+
+        validator = CHECKSUM_VALIDATORS.get(entry)
+        if validator is not None and not validator(value):
+            CHECKSUM_REJECTIONS[entry] += 1
+            continue
+
+        # Check exclusions
+        if is_excluded(value, identifier_type):
+            continue
+
+        yield build_candidate(content, start, end, value, identifier_type, pattern_name,
+                              line_index, field_of(start) if field_of else None)
+
+
+def scan_content(content, file_path: str, verbose: bool = False,
+                 line_index: Optional[LineIndex] = None,
+                 owned: Optional[tuple] = None,
+                 exclude_families: frozenset = frozenset(),
+                 field_of: Optional[Callable[[int], str]] = None,
+                 findings: Optional[list] = None,
+                 reported: frozenset = frozenset(),
+                 limit: int = MAX_FINDINGS_PER_FILE) -> list:
+    """Scan content for PHI/PII patterns, appending to findings.
+
+    content is a str, or bytes-like (bytes or an mmap) holding plain ASCII
+    text, which is matched without decoding. Findings are returned without
+    an id; main() numbers them once every file's results have been merged
+    in path order. When content is a window of a streamed file, line_index
+    maps it to file positions and only matches starting in the owned
+    (start, end) range are reported. Families in exclude_families are not
+    searched for, and field_of, if given, names the element holding the
+    match starting at an offset. A match at a (line, field) in reported is
+    taken to be PHI already reported from a file's structure and skipped.
+    Matches failing a check digit are counted in CHECKSUM_REJECTIONS
+    instead of reported. No findings are built past limit or below
+    SEVERITY_FLOOR.
+    """
+    if findings is None:
+        findings = []
+    if line_index is None:
+        line_index = LineIndex(content)
+    # One detection time per file, shared by its findings
+    timestamp = datetime.now().isoformat() + 'Z'
+    candidates = match_content(content, line_index, verbose, file_path, owned,
+                               exclude_families, field_of)
+    if reported:
+        candidates = (c for c in candidates if (c.line, c.field) not in reported)
+    return add_findings(findings, candidates, file_path, timestamp, limit)
+
+
+def scan_windows(windows, file_path: str, verbose: bool = False,
+                 findings: Optional[list] = None) -> list:
+    """Scan a sequence of stream windows, appending to findings."""
+    if findings is None:
+        findings = []
+    for window in windows:
+        scan_content(window.text, file_path, verbose, window.line_index,
+                     (window.own_start, window.own_end), findings=findings)
+        if len(findings) >= MAX_FINDINGS_PER_FILE:
+            break
+    return findings
+
+
+def scan_stream(file_path: Path, verbose: bool = False, encoding: str = 'utf-8') -> list:
+    """Scan a file too large to load whole, one bounded window at a time."""
+    return scan_windows(iter_windows(file_path, encoding=encoding), str(file_path), verbose)
+
+
+# Reasons the archive being scanned was not read in full: a member over
+# its size limit, an archive-wide limit or corruption. Reset for each file
+# by scan_counted.
+ARCHIVE_SHORTFALLS = []
+
 
+def scan_archive(file_path: Path, verbose: bool = False) -> list:
+    """Scan each member of a compressed file or archive as a stream.
+
+    Members are decompressed in memory and never extracted to disk. Each is
+    sniffed and dispatched like a file and reported as
+    "archive.zip!/inner/path"; FHIR JSON or CDA that does not parse is
+    scanned again as plain text, as it would be on disk. A member over the
+    size limit is passed over; reading stops at the first archive-wide
+    limit hit (a likely zip bomb) or corrupt block, keeping the findings
+    made so far. Either way the archive is noted in ARCHIVE_SHORTFALLS.
+    """
+    findings = []
+    try:
+        for name, raw in iter_members(file_path):
+            name = sanitize_output_string(name)
+            member_findings = []
+            try:
+                member = io.BufferedReader(raw, SNIFF_BYTES)
+                head = member.peek(SNIFF_BYTES)[:SNIFF_BYTES]
+                encoding, reason = sniff(head)
+                if encoding is None:
+                    if verbose:
+                        print(f"  {name}: skipped ({reason})", file=sys.stderr)
+                    continue
+                open_text = member_opener(member, encoding,
+                                          replay=is_fhir_json(name, head) or is_cda(name, head))
+                if scan_structured(open_text, name, head, encoding, verbose,
+                                   member_findings) is None:
+                    scan_windows(iter_text_windows(open_text()), name, verbose, member_findings)
+            except MemberLimitError as error:
+                ARCHIVE_SHORTFALLS.append(str(error))
+                print(f"Warning: {sanitize_output_string(str(error))}; "
+                      "rest of member not scanned", file=sys.stderr)
+            finally:
+                findings.extend(member_findings[:MAX_FINDINGS_PER_FILE])
+    except ArchiveLimitError as error:
+        ARCHIVE_SHORTFALLS.append(str(error))
+        print(f"Warning: {sanitize_output_string(str(error))}; rest of archive not scanned",
+              file=sys.stderr)
+    except CorruptArchiveError as error:
+        ARCHIVE_SHORTFALLS.append(str(error))
+        if verbose:
+            print(f"  {file_path}: unreadable archive ({error})", file=sys.stderr)
     return findings
 
 
-def scan_file(file_path: Path, finding_counter: list) -> list:
+def scan_plain_ascii(handle, head: bytes, file_path: str, verbose: bool = False) -> Optional[list]:
+    """Scan an open file as bytes, without decoding it.
+
+    Small files are matched from the sniffed first block, larger ones
+    through a read-only mmap. Returns None, without scanning, if the file is
+    not plain ASCII and has to be decoded instead.
+    """
+    if len(head) < SNIFF_BYTES:
+        # The first block is the whole file
+        if NOT_PLAIN_ASCII.search(head):
+            return None
+        return scan_content(head, file_path, verbose)
+    with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if NOT_PLAIN_ASCII.search(mapped):
+            return None
+        return scan_content(mapped, file_path, verbose)
+
+
+def scan_file(file_path: Path, verbose: bool = False, stream: bool = True) -> list:
     """Scan a single file for PHI/PII.
 
     Includes input validation and size checks to guard against adversarial
-    or oversized inputs (Indirect Prompt Injection mitigation).
+    or oversized inputs (Indirect Prompt Injection mitigation). Files over
+    MAX_FILE_SIZE_BYTES are streamed when stream is set and skipped otherwise.
+    The first block decides how the file is read: binaries and compressed
+    or encrypted data are skipped, a BOM selects the decoder, and plain
+    ASCII is matched as bytes. Compressed files and archives are scanned
+    member by member, and FHIR JSON, CDA, HL7 v2, X12 and NCPDP are tokenized
+    so findings name the element or field they were found in. CSV columns are
+    classified from a sample of rows and reported once each.
     """
     try:
         # Validate file safety before reading
-        if not is_safe_file(file_path):
+        if is_safe_file(file_path):
+            oversized = False
+        elif stream and is_safe_file(file_path, max_size=None):
+            oversized = True
+        else:
             return []
-        content = file_path.read_text(encoding='utf-8', errors='ignore')
+
+        if is_archive(file_path):
+            return scan_archive(file_path, verbose)
+
+        with open(file_path, 'rb') as handle:
+            head = handle.read(SNIFF_BYTES)
+            encoding, reason = sniff(head)
+            if encoding is None:
+                if verbose:
+                    print(f"  {file_path}: skipped ({reason})", file=sys.stderr)
+                return []
+            findings = scan_structured(
+                partial(open, file_path, encoding=encoding, errors='ignore'),
+                str(file_path), head, encoding, verbose)
+            if findings is None:
+                if oversized:
+                    findings = scan_stream(file_path, verbose, encoding)
+                elif encoding == 'utf-8':
+                    findings = scan_plain_ascii(handle, head, str(file_path), verbose)
+        if findings is None:
+            content = file_path.read_text(encoding=encoding, errors='ignore')
+            findings = scan_content(content, str(file_path), verbose)
         # Enforce per-file finding limit
-        findings = scan_content(content, str(file_path), finding_counter)
         return findings[:MAX_FINDINGS_PER_FILE]
     except (OSError, UnicodeDecodeError, ValueError):
         return []
 
 
-def get_files_to_scan(path: Path, include: Optional[list], exclude: Optional[list]) -> list:
-    """Get list of files to scan based on patterns."""
-    files = []
+def scan_structured(open_text: Callable[[], TextIO], file_path: str, head: bytes,
+                    encoding: str, verbose: bool = False,
+                    findings: Optional[list] = None) -> Optional[list]:
+    """Scan a file in one of the formats tokenized by structure, judged by
+    its name and first block, with the text stream open_text opens,
+    appending to findings.
+
+    Returns None if the file is in none of them, or is FHIR JSON or CDA
+    that does not parse, so it is scanned as plain text instead; findings
+    made before the parse failed are dropped.
+    """
+    if findings is None:
+        findings = []
+    start = len(findings)
+    try:
+        if is_fhir_json(file_path, head):
+            with open_text() as text:
+                return scan_fhir(text, file_path, verbose, findings)
+        if is_cda(file_path, head):
+            with open_text() as text:
+                return scan_cda(text, file_path, verbose, findings)
+    except JsonSyntaxError as error:
+        if verbose:
+            print(f"  {file_path}: not parsed as FHIR JSON ({error})", file=sys.stderr)
+        del findings[start:]
+        return None
+    except CdaSyntaxError as error:
+        if verbose:
+            print(f"  {file_path}: not parsed as CDA ({error})", file=sys.stderr)
+        del findings[start:]
+        return None
+    if is_hl7(file_path, head):
+        scanner = scan_hl7
+    elif is_x12(file_path, head):
+        scanner = scan_x12
+    elif is_ncpdp(head):
+        scanner = scan_ncpdp
+    elif is_csv(file_path):
+        with open_text() as text:
+            return scan_csv(text, file_path, *csv_layout(file_path, head, encoding), verbose,
+                            findings)
+    else:
+        return None
+    with open_text() as text:
+        return scanner(text, file_path, verbose, findings)
+
+
+def scan_source(source: SourceFile, verbose: bool = False) -> list:
+    """Scan a file already read by the scan-all pipeline.
+
+    The file is tokenized from memory when it is in a structured format,
+    plain ASCII is matched as bytes, and other text is matched with the
+    line index the pipeline shares between scanners. Archives and files too
+    large to read whole come without data and are scanned from disk with
+    scan_file.
+    """
+    if source.data is None:
+        return scan_file(source.path, verbose)
+    file_path = str(source.path)
+    try:
+        findings = scan_structured(lambda: io.StringIO(source.text), file_path,
+                                   source.head, source.encoding, verbose)
+        if findings is None:
+            if source.encoding == 'utf-8' and not NOT_PLAIN_ASCII.search(source.data):
+                findings = scan_content(source.data, file_path, verbose)
+            else:
+                findings = scan_content(source.text, file_path, verbose, source.line_index)
+        return findings[:MAX_FINDINGS_PER_FILE]
+    except (OSError, UnicodeDecodeError, ValueError):
+        return []
+
+
+def scan_counted(scan: Callable[[], list],
+                 keyword_window: int = DEFAULT_KEYWORD_WINDOW,
+                 min_severity: Optional[str] = None) -> FileFindings:
+    """Run one file's scan, recording on the result how many candidates
+    each checksum rejected. keyword_window sets how near a healthcare
+    keyword must be to raise a finding's confidence; findings less severe
+    than min_severity are never built, and do not count towards the file's
+    limit."""
+    CHECKSUM_REJECTIONS.clear()
+    ARCHIVE_SHORTFALLS.clear()
+    NEARBY_KEYWORDS.window = keyword_window
+    SEVERITY_FLOOR.rank = SEVERITY_RANK[min_severity] if min_severity else 0
+    findings = FileFindings(scan())
+    NEARBY_KEYWORDS.clear()
+    rejected = {}
+    for (identifier_type, pattern_name), count in CHECKSUM_REJECTIONS.items():
+        rejected.setdefault(identifier_type, {})[pattern_name] = count
+    findings.rejected = rejected
+    if ARCHIVE_SHORTFALLS:
+        findings.archive_incomplete = True
+    return findings
 
-    # Default patterns
-    default_include = ['**/*.py', '**/*.js', '**/*.ts', '**/*.json', '**/*.yaml',
-                       '**/*.yml', '**/*.xml', '**/*.csv', '**/*.txt', '**/*.log',
-                       '**/*.env', '**/*.sql', '**/*.md']
-    default_exclude = ['**/node_modules/**', '**/.git/**', '**/venv/**',
-                       '**/__pycache__/**', '**/vendor/**', '**/.idea/**']
 
-    include_patterns = include or default_include
-    exclude_patterns = exclude or default_exclude
+def scan_file_counted(file_path: Path, verbose: bool = False, stream: bool = True,
+                      keyword_window: int = DEFAULT_KEYWORD_WINDOW,
+                      min_severity: Optional[str] = None) -> FileFindings:
+    """Scan a file with scan_file, counting checksum rejections with
+    scan_counted."""
+    return scan_counted(partial(scan_file, file_path, verbose, stream),
+                        keyword_window, min_severity)
+
+
+# Default patterns
+DEFAULT_INCLUDE = ['**/*.py', '**/*.js', '**/*.ts', '**/*.json', '**/*.yaml',
+                   '**/*.yml', '**/*.xml', '**/*.csv', '**/*.txt', '**/*.log',
+                   '**/*.env', '**/*.sql', '**/*.md', '**/*.hl7',
+                   '**/*.cda', '**/*.ccda', '**/*.ccd',
+                   '**/*.x12', '**/*.edi', '**/*.837', '**/*.835',
+                   '**/*.gz', '**/*.tgz', '**/*.tar', '**/*.zip']
+DEFAULT_EXCLUDE = ['**/node_modules/**', '**/.git/**', '**/venv/**',
+                   '**/__pycache__/**', '**/vendor/**', '**/.idea/**']
+
+
+def get_files_to_scan(path: Path, include: Optional[list], exclude: Optional[list]) -> list:
+    """Get list of files to scan based on patterns.
 
+    The tree is walked once; directories excluded as '**/<name>/**' are never
+    entered, and any other exclude pattern is tested per file.
+    """
     if path.is_file():
         return [path]
 
-    for pattern in include_patterns:
-        for file_path in path.glob(pattern):
-            if file_path.is_file():
-                # Check exclusions
-                excluded = False
-                for exc_pattern in exclude_patterns:
-                    if file_path.match(exc_pattern):
-                        excluded = True
-                        break
-                if not excluded:
-                    files.append(file_path)
+    return walk_files(path, *file_selection(path, include, exclude))
+
+
+def file_selection(path: Path, include: Optional[list],
+                   exclude: Optional[list]) -> Tuple[Callable[[str], bool], set]:
+    """Return the test for the root-relative paths of files to scan under
+    path, and the names of the directories never entered."""
+    matches_include = GlobMatcher(include or DEFAULT_INCLUDE)
+    prune_dirs, file_excludes = split_excludes(exclude or DEFAULT_EXCLUDE)
+    if not file_excludes:
+        return matches_include, prune_dirs
+
+    def selected(relative_path: str) -> bool:
+        return matches_include(relative_path) and not any(
+            (path / relative_path).match(pattern) for pattern in file_excludes)
+    return selected, prune_dirs
+
+
+# =============================================================================
+# FHIR JSON Scanning
+# =============================================================================
+
+# Families found from the structure of a FHIR document instead of by regex
+FHIR_FAMILIES = frozenset({'fhir_patient', 'fhir_identifier'})
+
+# resourceType values reported as fhir_patient findings, by pattern name
+FHIR_RESOURCE_TYPES = {
+    'Patient': 'fhir_patient',
+    'Condition': 'fhir_clinical',
+    'Observation': 'fhir_clinical',
+    'MedicationRequest': 'fhir_clinical',
+    'DiagnosticReport': 'fhir_clinical',
+}
+
+# identifier.system values that mark a patient identifier
+FHIR_PATIENT_SYSTEM = re.compile(r'ssn|mrn|patient')
+
+FHIR_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def is_fhir_json(name: str, head: bytes) -> bool:
+    """Return True if a file is read as FHIR JSON, judged by its name and first block."""
+    return name.lower().endswith(('.json', '.ndjson')) and b'"resourceType"' in head
+
+
+def fhir_path(root: str, path: tuple) -> str:
+    """Format a JSON path as a FHIR element path, e.g. 'Bundle.entry[3].resource.id'."""
+    parts = [root]
+    for component in path:
+        if isinstance(component, int):
+            parts[-1] += f'[{component}]'
+        else:
+            parts.append(component)
+    return sanitize_output_string('.'.join(parts))
+
+
+def scan_fhir(handle, file_path: str, verbose: bool = False,
+              findings: Optional[list] = None) -> list:
+    """Scan a FHIR JSON text stream, attributing findings to element paths.
 
-    return list(set(files))
+    The stream is tokenized a region at a time, so a large Bundle is held
+    in memory about one region of entries at once. Regex patterns run over
+    each region and every match is given the path of the element it falls
+    in. Patient and clinical resources, patient identifiers and birth dates
+    are found from the structure instead of by regex. Raises
+    JsonSyntaxError if the stream is not JSON, appending to findings up to
+    that point.
+    """
+    if findings is None:
+        findings = []
+    timestamp = datetime.now().isoformat() + 'Z'
+    root = '$'
+    identifier = None  # [element path, system, pending finding]
+    for region in iter_json_regions(handle):
+        text = region.text
+        # (offset, resourceType) wherever a top-level document names its type
+        roots = [(-1, root)]
+        region_candidates = []
+        for start, end, path, is_key in zip(region.starts, region.ends,
+                                            region.paths, region.is_key):
+            if is_key or not path:
+                continue
+            element = path[-1]
+            if element == 'resourceType':
+                value = text[start:end]
+                if len(path) == 1:
+                    root = value
+                    roots.append((start, root))
+                pattern_name = FHIR_RESOURCE_TYPES.get(value)
+                if pattern_name:
+                    region_candidates.append(build_candidate(
+                        text, start, end, value, 'fhir_patient', pattern_name,
+                        region.line_index, fhir_path(root, path)))
+            elif element == 'birthDate':
+                value = text[start:end]
+                if FHIR_DATE.fullmatch(value):
+                    region_candidates.append(build_candidate(
+                        text, start, end, value, 'fhir_identifier', 'fhir_dob',
+                        region.line_index, fhir_path(root, path)))
+            elif (element in ('system', 'value') and len(path) >= 3
+                  and path[-3] == 'identifier' and isinstance(path[-2], int)):
+                # system usually precedes value, but JSON does not promise it
+                if identifier is None or identifier[0] != path[:-1]:
+                    identifier = [path[:-1], None, None]
+                value = text[start:end]
+                if element == 'system':
+                    identifier[1] = value
+                else:
+                    identifier[2] = build_candidate(
+                        text, start, end, value, 'fhir_identifier', 'fhir_id',
+                        region.line_index, fhir_path(root, path))
+                if identifier[1] is not None and identifier[2] is not None:
+                    if FHIR_PATIENT_SYSTEM.search(identifier[1]):
+                        region_candidates.append(identifier[2])
+                    identifier[2] = None
+
+        root_starts = [offset for offset, _ in roots]
+
+        def field_of(offset: int) -> str:
+            name = roots[bisect.bisect_right(root_starts, offset) - 1][1]
+            index = bisect.bisect_right(region.starts, offset) - 1
+            return fhir_path(name, region.paths[index] if index >= 0 else ())
+
+        scan_content(text, file_path, verbose, region.line_index,
+                     exclude_families=FHIR_FAMILIES, field_of=field_of, findings=findings)
+        add_findings(findings, region_candidates, file_path, timestamp)
+        if len(findings) >= MAX_FINDINGS_PER_FILE:
+            break
+    return findings
+
+
+# =============================================================================
+# HL7 v2 Scanning
+# =============================================================================
+
+# Families found from HL7 segment structure instead of by regex in HL7 files
+HL7_FAMILIES = frozenset({'hl7_segment', 'hl7_ssn'})
+
+# MSH-9 message types reported as hl7_header findings
+HL7_MESSAGE_TYPES = ('ADT', 'ORU', 'ORM')
+
+# Segments whose presence is reported, by pattern name
+HL7_SEGMENT_PATTERNS = {
+    'PID': 'hl7_patient',
+    'DG1': 'hl7_diagnosis',
+    'OBX': 'hl7_observation',
+}
+
+# PHI fields by segment and field number, from "HL7 Field Positions for
+# PHI" in references/healthcare-formats.md: (identifier_type, pattern_name)
+HL7_PHI_FIELDS = {
+    'PID': {
+        3: ('mrn', 'hl7_patient_id'),
+        5: ('person_name', 'hl7_patient_name'),
+        7: ('dob', 'hl7_dob'),
+        11: ('address', 'hl7_address'),
+        13: ('phone', 'hl7_phone_home'),
+        19: ('hl7_ssn', 'hl7_pid_ssn'),
+    },
+    'NK1': {
+        2: ('person_name', 'hl7_nok_name'),
+        4: ('address', 'hl7_nok_address'),
+        5: ('phone', 'hl7_nok_phone'),
+    },
+    'IN1': {
+        2: ('health_plan_id', 'hl7_insurance_id'),
+        3: ('health_plan_id', 'hl7_insurance_company'),
+        16: ('person_name', 'hl7_insured_name'),
+        19: ('health_plan_id', 'hl7_group_number'),
+    },
+}
+
+HL7_SEGMENTS = frozenset(HL7_SEGMENT_PATTERNS) | frozenset(HL7_PHI_FIELDS)
+
+
+def is_hl7(name: str, head: bytes) -> bool:
+    """Return True if a file is read as HL7 v2, judged by its name and first block."""
+    if name.lower().endswith('.hl7'):
+        return True
+    head = head.lstrip(b'\xef\xbb\xbf\x0b\r\n\t ')
+    return head.startswith(b'MSH') and len(head) > 3 and not head[3:4].isalnum()
+
+
+def hl7_field_name(text: str, line_index: LineIndex, offset: int) -> str:
+    """Name the HL7 field holding offset, e.g. 'PID-19'."""
+    start, end = line_index.line_span(offset)
+    segment = text[start:end].lstrip('\x0b\x1c')
+    start = end - len(segment)
+    if len(segment) < 4 or offset < start + 3:
+        return sanitize_output_string(segment[:3])
+    number = text.count(segment[3], start, offset)
+    if segment.startswith('MSH'):
+        number += 1
+    return sanitize_output_string(f'{segment[:3]}-{number}')
+
+
+def scan_hl7(handle, file_path: str, verbose: bool = False,
+             findings: Optional[list] = None) -> list:
+    """Scan an HL7 v2 text stream, reporting PHI fields by position.
+
+    Segments are split on the delimiters declared by each message's MSH.
+    Listed fields of PID, NK1 and IN1 are reported whatever their content,
+    each repetition separately, with the field named (e.g. 'PID-19').
+    Message headers and PID, DG1 and OBX segments are reported as HL7
+    content. Regex patterns still run over the text for PHI in other
+    fields, and each match is given the field it falls in.
+    """
+    if findings is None:
+        findings = []
+    timestamp = datetime.now().isoformat() + 'Z'
+    for block in iter_hl7_blocks(handle, HL7_SEGMENTS):
+        text = block.text
+        block_candidates = []
+        for segment in block.segments:
+            spans = field_spans(text, segment)
+            name = segment.name
+            if name == 'MSH':
+                if len(spans) > 9:
+                    start, end = spans[9]
+                    value = text[start:end]
+                    if value.startswith(HL7_MESSAGE_TYPES):
+                        block_candidates.append(build_candidate(
+                            text, start, end, value, 'hl7_segment', 'hl7_header',
+                            block.line_index, 'MSH-9'))
+                continue
+            pattern_name = HL7_SEGMENT_PATTERNS.get(name)
+            if pattern_name:
+                start, end = spans[0]
+                block_candidates.append(build_candidate(
+                    text, start, end, name, 'hl7_segment', pattern_name,
+                    block.line_index, name))
+            for number, (identifier_type, pattern_name) in HL7_PHI_FIELDS.get(name, {}).items():
+                if number >= len(spans):
+                    continue
+                for start, end in repetition_spans(text, spans[number], segment.delimiters):
+                    value = text[start:end]
+                    # An empty field, or HL7's explicit null
+                    if not value or value == '""':
+                        continue
+                    block_candidates.append(build_candidate(
+                        text, start, end, value, identifier_type, pattern_name,
+                        block.line_index, f'{name}-{number}', has_label=True))
+
+        # A regex match inside a field already reported by position is
+        # the same PHI twice
+        scan_content(text, file_path, verbose, block.line_index, exclude_families=HL7_FAMILIES,
+                     field_of=partial(hl7_field_name, text, block.line_index),
+                     findings=findings,
+                     reported=frozenset((c.line, c.field) for c in block_candidates))
+        add_findings(findings, block_candidates, file_path, timestamp)
+        if len(findings) >= MAX_FINDINGS_PER_FILE:
+            break
+    return findings
+
+
+# =============================================================================
+# X12 and NCPDP Scanning
+# =============================================================================
+
+# Families found from X12 and NCPDP structure instead of by regex in those files
+X12_FAMILIES = frozenset({'x12_transaction'})
+NCPDP_FAMILIES = frozenset({'ncpdp_transaction'})
+
+# Transaction sets (ST-01) reported as x12_transaction findings
+X12_TRANSACTIONS = frozenset({'270', '271', '276', '277', '278', '834', '835', '837'})
+
+X12_SUFFIXES = ('.x12', '.edi', '.837', '.835')
+
+# Loop opened by an NM1 segment, by transaction set and NM1-01 entity code
+X12_NAME_LOOPS = {
+    '837': {'41': '1000A', '40': '1000B', '85': '2010AA', '87': '2010AB', 'IL': '2010BA',
+            'PR': '2010BB', 'QC': '2010CA', 'DN': '2310A', '82': '2310B', '77': '2310C'},
+    '835': {'PR': '1000A', 'PE': '1000B', 'QC': '2100', 'IL': '2100', '74': '2100',
+            '82': '2100'},
+    '270': {'PR': '2100A', '1P': '2100B', 'IL': '2100C', '03': '2100D'},
+    '276': {'PR': '2100A', '41': '2100B', '1P': '2100C', 'IL': '2100D', 'QC': '2100E'},
+    '278': {'X3': '2010A', '1P': '2010B', 'IL': '2010C', 'QC': '2010D'},
+    '834': {'P5': '1000A', 'IN': '1000B', 'IL': '2100A', '70': '2100B', '31': '2100C'},
+}
+X12_NAME_LOOPS['271'] = X12_NAME_LOOPS['270']
+X12_NAME_LOOPS['277'] = X12_NAME_LOOPS['276']
+
+# NM1-01 entity codes of a patient, subscriber, dependent or member. Names,
+# addresses and IDs in their loops are PHI; those of providers and payers
+# are not.
+X12_PERSON_ENTITIES = frozenset({'IL', 'QC', '03', '74', '70', '31'})
+
+# (identifier_type, pattern_name) of an NM1-09 ID, by its NM1-08 qualifier,
+# and of a REF-02 reference, by its REF-01 qualifier
+X12_NM1_IDS = {
+    'MI': ('health_plan_id', 'x12_member_id'),
+    'II': ('health_plan_id', 'x12_member_id'),
+    '34': ('ssn', 'x12_ssn'),
+}
+X12_REF_IDS = {
+    'SY': ('ssn', 'x12_ssn'),
+    '0F': ('health_plan_id', 'x12_subscriber_id'),
+    '1W': ('health_plan_id', 'x12_member_id'),
+    'IG': ('health_plan_id', 'x12_policy_number'),
+    '1L': ('health_plan_id', 'x12_group_number'),
+    '6P': ('health_plan_id', 'x12_group_number'),
+    'EA': ('mrn', 'x12_medical_record'),
+}
+
+# PER communication number qualifiers
+X12_CONTACTS = {'TE': 'phone', 'CP': 'phone', 'HP': 'phone', 'WP': 'phone', 'EM': 'email'}
+
+# Segments whose free text is searched with the regex patterns, by element
+X12_FREE_TEXT = {'NTE': 2, 'MSG': 1, 'K3': 1}
+
+X12_SEGMENTS = frozenset({'ST', 'HL', 'NM1', 'DMG', 'N3', 'N4', 'REF', 'PER', 'CLM'}
+                         | set(X12_FREE_TEXT))
+
+# PHI fields by NCPDP segment ID and field ID: (identifier_type, pattern_name)
+NCPDP_PHI_FIELDS = {
+    '01': {  # Patient
+        'CA': ('person_name', 'ncpdp_patient_first_name'),
+        'CB': ('person_name', 'ncpdp_patient_last_name'),
+        'C4': ('dob', 'ncpdp_dob'),
+        'CM': ('address', 'ncpdp_address'),
+        'CN': ('address', 'ncpdp_city'),
+        'CP': ('zip', 'ncpdp_zip'),
+        'CQ': ('phone', 'ncpdp_phone'),
+        'CY': ('mrn', 'ncpdp_patient_id'),
+        'HN': ('email', 'ncpdp_email'),
+    },
+    '04': {  # Insurance
+        'C2': ('health_plan_id', 'ncpdp_cardholder_id'),
+        'C1': ('health_plan_id', 'ncpdp_group_id'),
+        'CC': ('person_name', 'ncpdp_cardholder_first_name'),
+        'CD': ('person_name', 'ncpdp_cardholder_last_name'),
+    },
+}
+
+NCPDP_HEAD = re.compile(rb'\x1cAM\d\d\x1c')
+
+
+def is_x12(name: str, head: bytes) -> bool:
+    """Return True if a file is read as X12, judged by its name and first block."""
+    if name.lower().endswith(X12_SUFFIXES):
+        return True
+    head = head.lstrip(b'\xef\xbb\xbf\r\n\t ')
+    return head.startswith(b'ISA') and len(head) > 3 and not head[3:4].isalnum()
+
+
+def is_ncpdp(head: bytes) -> bool:
+    """Return True if a file's first block holds NCPDP segments."""
+    return NCPDP_HEAD.search(head) is not None
+
+
+def scan_x12(handle, file_path: str, verbose: bool = False,
+             findings: Optional[list] = None) -> list:
+    """Scan an X12 text stream, reporting PHI by loop and element.
+
+    Transaction sets, loops and hierarchical levels are followed from the
+    ST, HL, NM1 and CLM segments. Names and IDs in NM1, DMG birth dates,
+    N3/N4 addresses, PER contact numbers and REF identifiers are reported
+    for patients, subscribers and members only, with the field named by
+    loop and element (e.g. '2010BA NM103'); patient account numbers come
+    from CLM-01. Regex patterns run only over free-text NTE, MSG and K3
+    segments.
+    """
+    if findings is None:
+        findings = []
+    timestamp = datetime.now().isoformat() + 'Z'
+    transaction = loop = None
+    person = False
+    for block in iter_x12_blocks(handle, X12_SEGMENTS):
+        text = block.text
+        block_candidates = []
+        free_text = []  # (start, end, field) of free-text elements
+
+        def report(spans, number, identifier_type, pattern_name):
+            if number >= len(spans):
+                return
+            start, end = spans[number]
+            value = text[start:end].strip()
+            if not value:
+                return
+            field = f'{name}{number:02d}'
+            block_candidates.append(build_candidate(
+                text, start, end, value, identifier_type, pattern_name, block.line_index,
+                f'{loop} {field}' if loop else field, has_label=True))
+
+        for segment in block.segments:
+            name = segment.name
+            if name == 'ISA':
+                continue
+            spans = element_spans(text, segment)
+            element = [text[start:end] for start, end in spans[1:3]] + ['', '']
+            if name == 'ST':
+                transaction, loop, person = element[0], None, False
+                if transaction in X12_TRANSACTIONS:
+                    report(spans, 1, 'x12_transaction', 'x12_transaction')
+            elif name == 'HL':
+                loop, person = None, False
+            elif name == 'CLM':
+                loop, person = '2300', False
+                report(spans, 1, 'account_number', 'x12_patient_account')
+            elif name == 'NM1':
+                loop = X12_NAME_LOOPS.get(transaction, {}).get(element[0])
+                person = element[0] in X12_PERSON_ENTITIES and element[1] != '2'
+                if person:
+                    for number in (3, 4, 5):
+                        report(spans, number, 'person_name', 'x12_name')
+                    qualifier = text[spans[8][0]:spans[8][1]] if len(spans) > 9 else ''
+                    if qualifier in X12_NM1_IDS:
+                        report(spans, 9, *X12_NM1_IDS[qualifier])
+            elif name in X12_FREE_TEXT:
+                number = X12_FREE_TEXT[name]
+                if number < len(spans):
+                    field = f'{name}{number:02d}'
+                    free_text.append((*spans[number], f'{loop} {field}' if loop else field))
+            elif name == 'REF':
+                # A medical record number is the patient's wherever it appears
+                if element[0] in X12_REF_IDS and (person or element[0] == 'EA'):
+                    report(spans, 2, *X12_REF_IDS[element[0]])
+            elif not person:
+                continue
+            elif name == 'DMG':
+                if element[0] == 'D8':
+                    report(spans, 2, 'dob', 'x12_dob')
+            elif name == 'N3':
+                report(spans, 1, 'address', 'x12_address')
+                report(spans, 2, 'address', 'x12_address')
+            elif name == 'N4':
+                report(spans, 1, 'address', 'x12_address')
+                report(spans, 3, 'zip', 'x12_zip')
+            elif name == 'PER':
+                for number in (4, 6, 8):
+                    if number < len(spans):
+                        start, end = spans[number - 1]
+                        identifier_type = X12_CONTACTS.get(text[start:end])
+                        if identifier_type:
+                            report(spans, number, identifier_type, 'x12_contact')
+
+        if free_text:
+            scan_free_text(text, free_text, file_path, verbose, block.line_index,
+                           X12_FAMILIES, findings)
+        add_findings(findings, block_candidates, file_path, timestamp)
+        if len(findings) >= MAX_FINDINGS_PER_FILE:
+            break
+    return findings
+
+
+def scan_free_text(text: str, spans: list, file_path: str, verbose: bool,
+                   line_index: LineIndex, exclude_families: frozenset,
+                   findings: list) -> list:
+    """Run the regex patterns over the (start, end, field) spans of text
+    only, appending to findings. Everything else is blanked out, so
+    offsets are unchanged."""
+    pieces = []
+    done = 0
+    for start, end, _ in spans:
+        pieces.append(' ' * (start - done))
+        pieces.append(text[start:end])
+        done = end
+    pieces.append(' ' * (len(text) - done))
+    starts = [start for start, _, _ in spans]
+
+    def field_of(offset: int) -> str:
+        return spans[bisect.bisect_right(starts, offset) - 1][2]
+
+    return scan_content(''.join(pieces), file_path, verbose, line_index,
+                        exclude_families=exclude_families, field_of=field_of,
+                        findings=findings)
+
+
+def scan_ncpdp(handle, file_path: str, verbose: bool = False,
+               findings: Optional[list] = None) -> list:
+    """Scan an NCPDP Telecommunication text stream, reporting PHI fields
+    of the patient and insurance segments by field ID (e.g. 'AM01-CB').
+
+    NCPDP has no free-text fields that carry patient data, so no regex
+    pass is made.
+    """
+    if findings is None:
+        findings = []
+    timestamp = datetime.now().isoformat() + 'Z'
+    for block in iter_ncpdp_blocks(handle, NCPDP_PHI_FIELDS):
+        text = block.text
+        block_candidates = []
+        for segment in block.segments:
+            segment_name = f'AM{segment.segment_id}'
+            if segment.segment_id == '01':
+                block_candidates.append(build_candidate(
+                    text, segment.start + 1, segment.start + 5, segment_name,
+                    'ncpdp_transaction', 'ncpdp_patient', block.line_index, segment_name))
+            fields = NCPDP_PHI_FIELDS[segment.segment_id]
+            for field_id, start, end in field_values(text, segment):
+                if field_id not in fields:
+                    continue
+                value = text[start:end].strip()
+                if value:
+                    block_candidates.append(build_candidate(
+                        text, start, end, value, *fields[field_id], block.line_index,
+                        f'{segment_name}-{field_id}', has_label=True))
+        add_findings(findings, block_candidates, file_path, timestamp)
+        if len(findings) >= MAX_FINDINGS_PER_FILE:
+            break
+    return findings
+
+
+# =============================================================================
+# CDA Scanning
+# =============================================================================
+
+# Families found from CDA document structure instead of by regex in CDA files
+CDA_FAMILIES = frozenset({'cda_document'})
+
+# Values read under recordTarget/patientRole: attributes of an element, or
+# its text when none are listed
+CDA_VALUES = {
+    'id': ('extension',),
+    'telecom': ('value',),
+    'birthTime': ('value',),
+    'given': (),
+    'family': (),
+    'streetAddressLine': (),
+    'city': (),
+    'county': (),
+    'postalCode': (),
+}
+
+# (identifier_type, pattern_name) of element text
+CDA_TEXT_TYPES = {
+    'given': ('person_name', 'cda_name'),
+    'family': ('person_name', 'cda_name'),
+    'streetAddressLine': ('address', 'cda_address'),
+    'city': ('address', 'cda_address'),
+    'county': ('address', 'cda_address'),
+    'postalCode': ('zip', 'cda_zip'),
+}
+
+# telecom/@value URL schemes
+CDA_TELECOM_TYPES = {'tel': 'phone', 'fax': 'fax', 'mailto': 'email',
+                     'http': 'url', 'https': 'url'}
+
+# id/@root of a US Social Security Number
+CDA_SSN_ROOT = '2.16.840.1.113883.4.1'
+
+# Start tag patterns, as reported by the regex pass outside CDA files
+CDA_TAG_PATTERNS = {'ClinicalDocument': 'cda_root', 'patientRole': 'cda_patient'}
+
+CDA_SUFFIXES = ('.xml', '.cda', '.ccda', '.ccd')
+
+CDA_HEAD = re.compile(rb'<(?:[\w.-]+:)?ClinicalDocument[\s>]')
+
+
+def is_cda(name: str, head: bytes) -> bool:
+    """Return True if a file is read as CDA, judged by its name and first block."""
+    return name.lower().endswith(CDA_SUFFIXES) and CDA_HEAD.search(head) is not None
+
+
+def cda_finding_type(value: CdaValue) -> Optional[Tuple[str, str]]:
+    """Return (identifier_type, pattern_name) of a patientRole value, or
+    None if it is not the patient's."""
+    if '/providerOrganization' in value.path:
+        # The provider's own address and numbers
+        return None
+    if value.element == 'id':
+        if value.attributes.get('root') == CDA_SSN_ROOT:
+            return 'ssn', 'cda_ssn'
+        return 'mrn', 'cda_patient_id'
+    if value.element == 'telecom':
+        scheme = value.value.partition(':')[0].lower()
+        identifier_type = CDA_TELECOM_TYPES.get(scheme)
+        return (identifier_type, 'cda_telecom') if identifier_type else None
+    if value.element == 'birthTime':
+        return 'dob', 'cda_birth_time'
+    return CDA_TEXT_TYPES.get(value.element)
+
+
+def scan_cda(handle, file_path: str, verbose: bool = False,
+             findings: Optional[list] = None) -> list:
+    """Scan a CDA text stream, reporting the patient from its header.
+
+    The document is parsed incrementally up to the start of its body.
+    Identifiers, names, addresses, telecoms and the birth time under
+    recordTarget/patientRole are reported whatever their content, with the
+    field set to an XPath-like path (e.g.
+    '/ClinicalDocument/recordTarget/patientRole/addr/city'); an id whose
+    root is the SSN OID is reported as an SSN. Regex patterns still run
+    over the whole text. Raises CdaSyntaxError if the stream is not XML up
+    to its root element, appending to findings up to that point.
+    """
+    if findings is None:
+        findings = []
+    timestamp = datetime.now().isoformat() + 'Z'
+    for block in iter_cda_blocks(handle, CDA_VALUES):
+        text = block.text
+        if block.error and verbose:
+            print(f"  {file_path}: CDA header not parsed past an error ({block.error})",
+                  file=sys.stderr)
+        block_candidates = []
+        for element, start, end in block.tags:
+            block_candidates.append(build_candidate(
+                text, start, end, element, 'cda_document', CDA_TAG_PATTERNS[element],
+                block.line_index))
+        spans = []
+        for value in block.values:
+            finding_type = cda_finding_type(value)
+            if finding_type is None:
+                continue
+            field = sanitize_output_string(value.path)
+            spans.append((value.start, value.end, field))
+            block_candidates.append(build_candidate(
+                text, value.start, value.end, value.value, *finding_type,
+                block.line_index, field, has_label=True))
+        starts = [start for start, _, _ in spans]
+
+        def field_of(offset: int) -> Optional[str]:
+            index = bisect.bisect_right(starts, offset) - 1
+            return spans[index][2] if index >= 0 and offset < spans[index][1] else None
+
+        # A regex match inside a value already reported from the structure
+        # is the same PHI twice
+        scan_content(text, file_path, verbose, block.line_index, exclude_families=CDA_FAMILIES,
+                     field_of=field_of if spans else None, findings=findings,
+                     reported=frozenset((c.line, c.field) for c in block_candidates))
+        add_findings(findings, block_candidates, file_path, timestamp)
+        if len(findings) >= MAX_FINDINGS_PER_FILE:
+            break
+    return findings
+
+
+# =============================================================================
+# CSV Column Scanning
+# =============================================================================
+
+# Rows read to classify columns, and as many again to confirm the result
+CSV_SAMPLE_ROWS = 1000
+
+# A column is classified when at least this fraction of its non-empty
+# sampled values fit a type, and there are at least CSV_MIN_VALUES of them
+CSV_MATCH_FRACTION = 0.9
+CSV_MIN_VALUES = 5
+
+# Characters of free-text records gathered for one regex pass
+CSV_BLOCK_CHARS = 1024 * 1024
+
+# Column types by identifier type: (header pattern, value pattern when the
+# header names the type, value pattern that is enough without it). Headers
+# are matched lowercased with runs of other characters turned into '_';
+# values are matched whole, with surrounding space stripped.
+CSV_COLUMN_TYPES = {
+    'ssn': (
+        re.compile(r'(^|_)(ssn|social_security(_number|_no)?)(_|$)'),
+        re.compile(r'\d{3}-\d{2}-\d{4}|\d{9}'),
+        re.compile(r'\d{3}-\d{2}-\d{4}'),
+    ),
+    'dob': (
+        re.compile(r'(^|_)(dob|birth_?date|date_of_birth|birthday)(_|$)'),
+        re.compile(r'\d{4}-\d{2}-\d{2}|\d{8}|\d{1,2}/\d{1,2}/(\d{2}|\d{4})'),
+        None,
+    ),
+    'mrn': (
+        re.compile(r'(^|_)(mrn|medical_record(_number|_no)?|patient_id)(_|$)'),
+        re.compile(r'[A-Za-z0-9][A-Za-z0-9-]{3,19}'),
+        None,
+    ),
+    'person_name': (
+        re.compile(r'(^|_)((first|last|middle|given|family|full|sur)_?name|[fl]name)$'
+                   r'|^((patient|member|subscriber|insured)_)?name$'),
+        re.compile(r"[^\W\d_][^\d@]{0,79}"),
+        None,
+    ),
+    'phone': (
+        re.compile(r'(^|_)(phone|telephone|mobile|cell)(_|$)'),
+        re.compile(r'(\+?1[-. ]?)?\(?\d{3}\)?[-. ]?\d{3}[-. ]?\d{4}'),
+        None,
+    ),
+    'email': (
+        re.compile(r'(^|_)e_?mail(_|$)'),
+        re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}'),
+        re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}'),
+    ),
+}
+
+CSV_HEADER_SEPARATORS = re.compile(r'[^a-z0-9]+')
+
+# A plausible column name: a short label without a run of digits
+CSV_HEADER_NAME = re.compile(r'(?!.*\d{3})[^\W\d][\w .#/()-]{0,63}')
+
+
+def is_csv(name: str) -> bool:
+    """Return True if a file is read as CSV, judged by its name."""
+    return name.lower().endswith(('.csv', '.tsv'))
+
+
+def csv_layout(name: str, head: bytes, encoding: str) -> Tuple[Dialect, bool]:
+    """Sniff the dialect of a CSV file, and whether it has a header, from
+    its first block."""
+    text = head.decode(encoding, errors='ignore')
+    default = '\t' if name.lower().endswith('.tsv') else ','
+    return sniff_dialect(text, default), sniff_header(text)
+
+
+def is_csv_header(record: str, cells: list) -> bool:
+    """Return True if a first record's cells read as column names.
+
+    Column names are reported unredacted as finding fields, so a record
+    that may be data (it holds a PHI match, or a cell that is not
+    label-like) is never taken as the header.
+    """
+    if not all(not cell.strip() or CSV_HEADER_NAME.fullmatch(cell.strip()) for cell in cells):
+        return False
+    return not PATTERN_ENGINE.scan(record, PATTERN_ENGINE.active_families(record))
+
+
+def csv_cells(record: str, dialect: Dialect) -> list:
+    """Return the (start, end) span of each cell of a record."""
+    return split_record(record, 0, len(record.rstrip('\r\n')), dialect)
+
+
+def classify_columns(headers: list, width: int, sample: list, confirm: list) -> dict:
+    """Classify width columns from sampled rows of cell values.
+
+    Returns {column: (identifier_type, header_named, value pattern)} for
+    each column that fits a type in the sample and still fits it in the
+    confirming rows, if there are any. Columns past the end of headers
+    are classified by their values alone.
+    """
+    def fraction(pattern, rows, column):
+        values = [row[column].strip() for row in rows if column < len(row)]
+        values = [value for value in values if value]
+        if not values:
+            return 0, 0.0
+        return len(values), sum(1 for v in values if pattern.fullmatch(v)) / len(values)
+
+    columns = {}
+    for column in range(width):
+        header = headers[column] if column < len(headers) else ''
+        normalized = CSV_HEADER_SEPARATORS.sub('_', header.lower()).strip('_')
+        for identifier_type, (header_pattern, named, alone) in CSV_COLUMN_TYPES.items():
+            header_named = bool(header_pattern.search(normalized))
+            pattern = named if header_named else alone
+            if pattern is None:
+                continue
+            count, fit = fraction(pattern, sample, column)
+            if count < CSV_MIN_VALUES or fit < CSV_MATCH_FRACTION:
+                continue
+            count, fit = fraction(pattern, confirm, column)
+            if count and fit < CSV_MATCH_FRACTION:
+                continue
+            columns[column] = (identifier_type, header_named, pattern)
+            break
+    return columns
+
+
+def csv_field_name(text: str, starts: list, headers: list, dialect: Dialect,
+                   offset: int) -> str:
+    """Name the column of the cell holding offset, from the record starts
+    of a block of CSV text."""
+    index = bisect.bisect_right(starts, offset) - 1
+    end = starts[index + 1] if index + 1 < len(starts) else len(text)
+    start = starts[index]
+    spans = split_record(text, start, start + len(text[start:end].rstrip('\r\n')), dialect)
+    column = next((i for i, (_, cell_end) in enumerate(spans) if offset <= cell_end),
+                  len(spans) - 1)
+    return csv_column_name(headers, column)
+
+
+def csv_column_name(headers: list, column: int) -> str:
+    """Name a column by its header, or by number if it has none."""
+    header = headers[column] if column < len(headers) else ''
+    return sanitize_output_string(header or f'column {column + 1}')
+
+
+def scan_csv(handle, file_path: str, dialect: Dialect, has_header: bool = True,
+             verbose: bool = False, findings: Optional[list] = None) -> list:
+    """Scan a CSV text stream by column.
+
+    The header and a sample of rows classify each column as SSN, date of
+    birth, MRN, name, phone or email, and a further sample must agree.
+    Each classified column is reported once, at its first value, with the
+    number of values of that type as match_count. Regex patterns run only
+    over the other, free-text columns: classified cells are blanked out of
+    the text first, so offsets, lines and columns are unchanged.
+    """
+    if findings is None:
+        findings = []
+    timestamp = datetime.now().isoformat() + 'Z'
+    records = iter_records(handle, dialect)
+    header = next(records, None)
+    if header is None:
+        return findings
+    headers = [cell_value(header, span, dialect).strip()
+               for span in csv_cells(header, dialect)]
+    if not (has_header and is_csv_header(header, headers)):
+        # The first record is data, and is sampled and scanned as such
+        records = chain([header], records)
+        header, headers = '', []
+    sample = list(islice(records, CSV_SAMPLE_ROWS))
+    confirm = list(islice(records, CSV_SAMPLE_ROWS))
+
+    def values(rows):
+        return [[cell_value(row, span, dialect) for span in csv_cells(row, dialect)]
+                for row in rows]
+
+    sample_values = values(sample)
+    width = max([len(headers)] + [len(row) for row in sample_values])
+    columns = classify_columns(headers, width, sample_values, values(confirm))
+    if verbose:
+        for column, (identifier_type, _, _) in columns.items():
+            print(f"  {file_path}: column {csv_column_name(headers, column)!r} classified as "
+                  f"{identifier_type}", file=sys.stderr)
+    # The regex pass runs while there are free-text columns and the file's
+    # finding limit, less one finding per classified column, is not reached
+    regex_pass = len(columns) < width
+    limit = len(findings) + MAX_FINDINGS_PER_FILE - len(columns)
+
+    counts = dict.fromkeys(columns, 0)
+    first = {}  # column -> candidate at its first value
+    checks = [(column, pattern.fullmatch, EXCLUSION_VALIDATORS.get(identifier_type))
+              for column, (identifier_type, _, pattern) in columns.items()]
+    base = len(findings)
+    delimiter, quote = dialect.delimiter, dialect.quotechar
+    pieces, starts = ([header], [0]) if header else ([], [])
+    size = len(header)
+    block_line = 1
+    line = 1 + header.count('\n')
+    try:
+        for record in chain(sample, confirm, records):
+            # Counted before blanking, which can remove a quoted newline
+            record_lines = record.count('\n') if quote in record else 1
+            if columns:
+                body = len(record.rstrip('\r\n'))
+                if quote in record:
+                    spans = split_record(record, 0, body, dialect)
+                    cells = [cell_value(record, span, dialect) for span in spans]
+                else:
+                    spans = None
+                    cells = record[:body].split(delimiter)
+                width = len(cells)
+                for column, fits, excluded in checks:
+                    if column >= width:
+                        continue
+                    value = cells[column].strip()
+                    if not value or not fits(value) or (excluded and excluded(value)):
+                        continue
+                    counts[column] += 1
+                    if column not in first:
+                        identifier_type, header_named, _ = columns[column]
+                        start, end = (spans or csv_cells(record, dialect))[column]
+                        first[column] = build_candidate(
+                            record, start, end, value, identifier_type, 'csv_column',
+                            LineIndex(record, line), csv_column_name(headers, column),
+                            has_label=header_named)
+                if regex_pass:
+                    # Blank classified cells out of the text the regex pass sees
+                    if spans is None:
+                        for column in columns:
+                            if column < width:
+                                cells[column] = ' ' * len(cells[column])
+                        record = delimiter.join(cells) + record[body:]
+                    else:
+                        parts = []
+                        done = 0
+                        for column in columns:
+                            if column < len(spans):
+                                start, end = spans[column]
+                                parts.append(record[done:start])
+                                parts.append(' ' * (end - start))
+                                done = end
+                        parts.append(record[done:])
+                        record = ''.join(parts)
+            line += record_lines
+            if not regex_pass:
+                continue
+            starts.append(size)
+            pieces.append(record)
+            size += len(record)
+            if size >= CSV_BLOCK_CHARS:
+                regex_pass = scan_csv_block(pieces, starts, headers, dialect, block_line,
+                                            file_path, verbose, findings, limit)
+                pieces, starts, size = [], [], 0
+                block_line = line
+        if regex_pass and pieces:
+            scan_csv_block(pieces, starts, headers, dialect, block_line,
+                           file_path, verbose, findings, limit)
+    finally:
+        column_findings = []
+        for column, candidate in sorted(first.items()):
+            if SEVERITY_FLOOR.admits(candidate):
+                finding = candidate.finding(file_path, timestamp)
+                finding.match_count = counts[column]
+                column_findings.append(finding)
+        findings[base:base] = column_findings
+    return findings
+
+
+def scan_csv_block(pieces: list, starts: list, headers: list, dialect: Dialect,
+                   first_line: int, file_path: str, verbose: bool, findings: list,
+                   limit: int) -> bool:
+    """Run the regex pass over a block of CSV records, appending to
+    findings. Returns False once findings holds limit or more entries."""
+    text = ''.join(pieces)
+    scan_content(text, file_path, verbose, LineIndex(text, first_line),
+                 field_of=partial(csv_field_name, text, starts, headers, dialect),
+                 findings=findings, limit=limit)
+    return len(findings) < limit
 
 
 # =============================================================================
@@ -623,21 +2545,39 @@ def output_json(result: ScanResult) -> str:
     return json.dumps(result.to_dict(), indent=2)
 
 
+def write_ndjson_record(stream, record: str, data: dict):
+    """Write one NDJSON line: a 'finding' or the closing 'summary' record."""
+    stream.write(json.dumps({'record': record, **data}) + '\n')
+
+
 def output_markdown(result: ScanResult) -> str:
     """Format results as Markdown."""
     lines = [
         '# PHI/PII Detection Results\n',
         f'**Scan Time:** {result.scan_timestamp}',
         f'**Files Scanned:** {result.files_scanned}',
-        f'**Total Findings:** {len(result.findings)}\n',
+        f'**Files Streamed:** {result.files_streamed}',
+        f'**Skipped (over size limit):** {len(result.skipped_for_size)}',
+        f'**Archives Not Read in Full:** {len(result.archives_incomplete)}',
+        f'**Cache Hits/Misses:** {result.cache_hits}/{result.cache_misses}',
+        f'**Total Findings:** {result.total_findings}\n',
         '## Summary by Severity\n',
         '| Severity | Count |',
         '|----------|-------|',
     ]
 
-    for sev, count in result.to_dict()['summary']['by_severity'].items():
+    for sev, count in result.by_severity.items():
         lines.append(f'| {sev.capitalize()} | {count} |')
 
+    rejected = result.summary()['rejected_candidates']
+    if rejected:
+        lines.extend(['\n## Candidates Rejected by Checksum\n',
+                      '| Type | Pattern | Count |',
+                      '|------|---------|-------|'])
+        for identifier_type, counts in rejected.items():
+            for pattern_name, count in counts.items():
+                lines.append(f'| {identifier_type} | {pattern_name} | {count} |')
+
     lines.append('\n## Findings\n')
 
     for f in result.findings:
@@ -646,6 +2586,8 @@ def output_markdown(result: ScanResult) -> str:
             f'- **Severity:** {f.severity.upper()}',
             f'- **Risk Score:** {f.risk_score}',
             f'- **File:** {f.file}:{f.line}',
+            *([f'- **Field:** `{f.field}`'] if f.field else []),
+            *([f'- **Matches:** {f.match_count}'] if f.match_count is not None else []),
             f'- **Context:** `{f.context}`',
             '',
         ])
@@ -661,6 +2603,42 @@ def output_csv(result: ScanResult) -> str:
     return '\n'.join(lines)
 
 
+# Whole-result formatters; 'ndjson' is written incrementally by main()
+FORMATTERS = {
+    'json': output_json,
+    'markdown': output_markdown,
+    'csv': output_csv,
+}
+
+FORMAT_EXTENSIONS = {
+    'json': '.json',
+    'markdown': '.md',
+    'csv': '.csv',
+    'ndjson': '.ndjson',
+}
+
+
+def parse_formats(value: str) -> list:
+    """Parse a comma-separated --format value such as 'ndjson,markdown'."""
+    formats = []
+    for fmt in value.split(','):
+        fmt = fmt.strip()
+        if fmt not in FORMAT_EXTENSIONS:
+            raise argparse.ArgumentTypeError(
+                f"invalid format '{fmt}' (choose from {', '.join(FORMAT_EXTENSIONS)})")
+        if fmt not in formats:
+            formats.append(fmt)
+    return formats
+
+
+def output_path(output: str, fmt: str, formats: list) -> Path:
+    """Return the file for one format; with several formats, --output is a
+    base name that gets each format's extension."""
+    if len(formats) == 1:
+        return Path(output)
+    return Path(output).with_suffix(FORMAT_EXTENSIONS[fmt])
+
+
 # =============================================================================
 # Main
 # =============================================================================
@@ -669,8 +2647,9 @@ def main():
     parser = argparse.ArgumentParser(description='Scan files for PHI/PII')
     parser.add_argument('path', help='File or directory to scan')
     parser.add_argument('--output', '-o', help='Output file path')
-    parser.add_argument('--format', '-f', choices=['json', 'markdown', 'csv'],
-                        default='json', help='Output format')
+    parser.add_argument('--format', '-f', type=parse_formats, default=['json'],
+                        help='Output format: json, markdown, csv or ndjson, or several '
+                             'separated by commas (e.g. ndjson,markdown,csv)')
     parser.add_argument('--severity', '-s', choices=['low', 'medium', 'high', 'critical'],
                         help='Minimum severity to report')
     parser.add_argument('--include', nargs='+', help='File patterns to include')
@@ -678,15 +2657,39 @@ def main():
     parser.add_argument('--synthetic', action='store_true',
                         help='Treat findings as synthetic test data')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Worker processes (0 = one per available CPU)')
+    parser.add_argument('--no-stream', action='store_true',
+                        help='Skip files over the size limit instead of streaming them')
+    parser.add_argument('--keyword-window', type=int, default=DEFAULT_KEYWORD_WINDOW,
+                        metavar='CHARS',
+                        help='Characters either side of a match searched for healthcare '
+                             f'keywords that raise its confidence (default: {DEFAULT_KEYWORD_WINDOW})')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_DIR, metavar='DIR',
+                        help='Reuse findings for unchanged files from an on-disk cache '
+                             f'(default directory: {DEFAULT_CACHE_DIR})')
+    add_fail_fast_argument(parser)
+    add_watch_argument(parser)
 
     args = parser.parse_args()
+    if len(args.format) > 1 and not args.output and not args.fail_fast and not args.watch:
+        parser.error('several formats need --output, used as the base file name')
+    if args.watch and (args.output or args.cache or args.fail_fast
+                       or args.format not in (['json'], ['ndjson'], ['markdown'])):
+        parser.error('--watch prints json or markdown changes to stdout, and cannot be '
+                     'combined with --output, --cache or --fail-fast')
 
     # Initialize
     start_time = datetime.now()
     path = Path(args.path)
     result = ScanResult()
     result.scan_timestamp = start_time.isoformat() + 'Z'
-    finding_counter = [0]
+    # A fail-fast scan reports a verdict instead of its findings
+    gate = FailFastGate(args.fail_fast) if args.fail_fast else None
+    # Findings only need to be kept in memory for the whole-result formats
+    result.retain_findings = gate is None and any(fmt in FORMATTERS for fmt in args.format)
+    finding_number = 0
+    id_prefix = f"F-{start_time.strftime('%Y%m%d')}-"
 
     # Sanitize and validate input path
     sanitized_path = sanitize_path(str(path))
@@ -696,57 +2699,132 @@ def main():
         print(f"Error: Path does not exist: {path}", file=sys.stderr)
         sys.exit(1)
 
+    # The severity filter is applied as files are scanned, before findings
+    # are built
+    scan = partial(scan_file_counted, verbose=args.verbose, stream=not args.no_stream,
+                   keyword_window=args.keyword_window, min_severity=args.severity)
+
+    if args.watch:
+        # Findings of one file are told apart by what matched, not where
+        tree = WatchedTree(path, *file_selection(path, args.include, args.exclude))
+        sys.exit(watch_tree(tree, scan, ('identifier_type', 'pattern_name', 'value_hash', 'field'),
+                            id_prefix, 'identifier_type',
+                            fmt='markdown' if args.format == ['markdown'] else 'json',
+                            boundaries=(BOUNDARY_BEGIN, BOUNDARY_END), jobs=args.jobs,
+                            debounce=args.debounce, verbose=args.verbose))
+
     # Get files
     files = get_files_to_scan(path, args.include, args.exclude)
     result.files_scanned = len(files)
+    oversized = [f for f in files if is_oversized(f)]
+    if args.no_stream:
+        result.skipped_for_size = [sanitize_output_string(str(f)) for f in oversized]
+    else:
+        result.files_streamed = len(oversized)
 
     if args.verbose:
         print(f"Scanning {len(files)} files...", file=sys.stderr)
 
+    # NDJSON findings are written as they are produced, not at the end
+    ndjson = None
+    if 'ndjson' in args.format and gate is None:
+        if args.output:
+            ndjson = open(output_path(args.output, 'ndjson', args.format), 'w',
+                          encoding='utf-8')
+        else:
+            print(BOUNDARY_BEGIN)
+            ndjson = sys.stdout
+
     # Scan files with total findings limit to prevent output flooding
     total_findings_count = 0
-    for file_path in files:
+    cache = None
+    if args.cache:
+        # Options that change a file's findings get a cache of their own,
+        # kept alongside the others of the same ruleset
+        fingerprint = ruleset_fingerprint(__file__, PATTERNS, EXCLUSIONS)
+        cache = ScanCache(args.cache, 'detect-phi', fingerprint, Finding, FileFindings,
+                          options={'stream': not args.no_stream,
+                                   'keyword_window': args.keyword_window,
+                                   'severity': args.severity})
+        cache.prepare()
+        scan = partial(cache.scan, scan)
+        result.cache_enabled = True
+
+    # A gate takes results as they come in, and stopping early cancels the rest
+    outcomes = scan_files(scan, files, args.jobs, ordered=gate is None)
+    for file_path, outcome in outcomes:
+        if cache is not None:
+            findings, cache_hit = outcome
+            if cache_hit:
+                result.cache_hits += 1
+            else:
+                result.cache_misses += 1
+        else:
+            findings = outcome
+        if gate is not None:
+            if gate.check(findings):
+                break
+            continue
         if total_findings_count >= MAX_TOTAL_FINDINGS:
             if args.verbose:
                 print(f"Warning: Reached maximum findings limit ({MAX_TOTAL_FINDINGS}). "
                       "Stopping scan.", file=sys.stderr)
             break
-        findings = scan_file(file_path, finding_counter)
+        result.add_rejections(findings.rejected)
+        if findings.archive_incomplete:
+            result.archives_incomplete.append(sanitize_output_string(str(file_path)))
         for f in findings:
-            # Filter by severity if specified
-            if args.severity:
-                severity_order = {'informational': 0, 'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
-                if severity_order.get(f.severity, 0) < severity_order.get(args.severity, 0):
-                    continue
+            # Number findings in path order so IDs match across runs and --jobs
+            finding_number += 1
+            f.id = f"{id_prefix}{finding_number:04d}"
             result.add_finding(f)
             total_findings_count += 1
+            if ndjson is not None:
+                write_ndjson_record(ndjson, 'finding', f.to_dict())
+    outcomes.close()
+
+    if gate is not None:
+        if args.output:
+            Path(args.output).write_text(gate.to_json())
+        else:
+            print(BOUNDARY_BEGIN)
+            print(gate.to_json())
+            print(BOUNDARY_END)
+        sys.exit(gate.exit_code)
 
     # Calculate duration
     result.scan_duration = (datetime.now() - start_time).total_seconds()
 
-    # Format output
-    if args.format == 'json':
-        output = output_json(result)
-    elif args.format == 'markdown':
-        output = output_markdown(result)
-    else:
-        output = output_csv(result)
+    if ndjson is not None:
+        write_ndjson_record(ndjson, 'summary', {'summary': result.summary(),
+                                                'errors': result.errors})
+        if args.output:
+            ndjson.close()
+            if args.verbose:
+                print(f"Results written to {ndjson.name}", file=sys.stderr)
+        else:
+            print(BOUNDARY_END)
 
     # Write output with boundary markers so downstream consumers (including
     # LLMs) can distinguish tool output from ingested file content
-    if args.output:
-        Path(args.output).write_text(output)
-        if args.verbose:
-            print(f"Results written to {args.output}", file=sys.stderr)
-    else:
-        print(BOUNDARY_BEGIN)
-        print(output)
-        print(BOUNDARY_END)
+    for fmt in args.format:
+        if fmt not in FORMATTERS:
+            continue
+        output = FORMATTERS[fmt](result)
+        if args.output:
+            destination = output_path(args.output, fmt, args.format)
+            destination.write_text(output)
+            if args.verbose:
+                print(f"Results written to {destination}", file=sys.stderr)
+        else:
+            print(BOUNDARY_BEGIN)
+            print(output)
+            print(BOUNDARY_END)
 
     # Exit with error code if critical findings
-    if any(f.severity == 'critical' for f in result.findings):
+    if result.by_severity['critical']:
         sys.exit(2)
-    elif any(f.severity == 'high' for f in result.findings):
+    elif result.by_severity['high']:
         sys.exit(1)
     sys.exit(0)
 
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+HIPAA Guardian - Scanner Daemon
+
+Keeps every scanner loaded, with its rules compiled, and answers scan
+requests over a Unix domain socket. While it runs, detect-phi.py and the
+scan-*.py scripts hand their runs to it instead of starting from scratch,
+with the same output and exit code. Editors can also send it unsaved
+buffers to scan; see hipaa_core/daemon.py for the protocol.
+
+The daemon exits when a script or module in this directory changes, so it
+never serves an old ruleset; restart it after editing the scanners.
+
+Usage:
+    python hipaa-guardiand.py [options]
+
+Options:
+    --socket         Socket path, in a directory only you can write to
+                     (default: $HIPAA_GUARDIAN_SOCKET, or daemon.sock in
+                     a per-user directory under $XDG_RUNTIME_DIR or /tmp)
+    --idle-timeout   Seconds without a request before exiting (default: 1800)
+    --detach         Run in the background once the socket is ready
+    --status         Report whether a daemon is running
+    --stop           Stop a running daemon
+"""
+
+import argparse
+import io
+import os
+import sys
+import traceback
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+from hipaa_core import (DEFAULT_FILE_TIMEOUT, DEFAULT_IDLE_TIMEOUT, DaemonRunning, LocalOnly,
+                        analyze_source, buffer_source, load_scanner, request, scan_source_file,
+                        serve, walk_sources)
+
+# Scripts the daemon runs for a client
+SCRIPTS = ['detect-phi', 'scan-code', 'scan-logs', 'scan-auth', 'scan-response', 'scan-all']
+
+# Scanned once at startup, so patterns compiled on first use are compiled
+# before the first request rather than during it
+WARMUP_SOURCES = {
+    'warmup/patient.py': (
+        "import logging\n"
+        "logger = logging.getLogger(__name__)\n"
+        "patient = {'ssn': '123-45-6789', 'mrn': 'MRN-0012345', 'dob': '01/02/1980'}\n"
+        "logger.info(f'Loaded patient {patient}')\n"
+        "@app.route('/patients/<id>')\n"
+        "def get_patient(id):\n"
+        "    return jsonify(patient)\n"
+    ),
+    'warmup/patient.json': (
+        '{"resourceType": "Patient", "name": [{"given": ["Jane"], "family": "Doe"}],\n'
+        ' "birthDate": "1980-01-02", "telecom": [{"value": "555-123-4567"}]}\n'
+    ),
+    'warmup/notes.txt': (
+        "Patient Jane Doe, DOB 01/02/1980, SSN 123-45-6789, MRN: 12345678\n"
+        "Email jane.doe@example.com, phone (555) 123-4567, NPI 1234567893\n"
+    ),
+}
+
+
+# =============================================================================
+# Requests
+# =============================================================================
+
+def exit_status(code, stderr) -> int:
+    """The exit status of a SystemExit with this code, as the interpreter
+    would report it."""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=stderr)
+    return 1
+
+
+def run_script(payload: dict) -> dict:
+    """Run a scanner script's main() with the client's arguments and return
+    what it printed and its exit code."""
+    script = payload.get('script')
+    if script not in SCRIPTS:
+        return {'error': f'unknown script: {script!r}'}
+    module = load_scanner(script)
+    sys.argv = [module.__file__, *payload.get('argv', [])]
+    stdout, stderr = io.StringIO(), io.StringIO()
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        module.main()
+        exit_code = 0
+    except SystemExit as exc:
+        exit_code = exit_status(exc.code, stderr)
+    except LocalOnly:
+        return {'error': 'run in the client'}
+    except Exception:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    return {'exit_code': exit_code, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+def scan_request(payload: dict) -> dict:
+    """Scan files and buffers with the named scanners (default: all) and
+    return the combined report of scan-all.py, with its exit code.
+
+    Buffers are {"name": path, "text": contents}; the name decides which
+    scanners apply, as a path would.
+    """
+    scan_all = load_scanner('scan-all')
+    detect_phi = load_scanner('detect-phi')
+    try:
+        names = scan_all.parse_scanners(','.join(payload.get('scanners') or scan_all.SCANNERS))
+    except argparse.ArgumentTypeError as e:
+        return {'error': str(e)}
+    timeout = payload.get('file_timeout', DEFAULT_FILE_TIMEOUT)
+
+    start_time = datetime.now()
+    result = scan_all.CombinedScanResult(
+        scanners=[name for name in scan_all.SCANNERS if name in names],
+        scan_timestamp=start_time.isoformat() + 'Z')
+    analyzers = scan_all.build_analyzers(result.scanners, False, timeout)
+    date = start_time.strftime('%Y%m%d')
+
+    outcomes = []
+    for buffer in payload.get('buffers', []):
+        name = detect_phi.sanitize_output_string(str(buffer.get('name', 'buffer')))
+        source = buffer_source(Path(name), str(buffer.get('text', '')).encode('utf-8'))
+        result.files_scanned += 1
+        if source is not None:
+            outcomes.append((name, analyze_source(analyzers, Path(name).as_posix(), source)))
+    for path in payload.get('paths', []):
+        root = Path(detect_phi.sanitize_path(str(path)))
+        if not root.exists():
+            return {'error': f'Path does not exist: {detect_phi.sanitize_output_string(path)}'}
+        files = walk_sources(root, analyzers)
+        result.files_scanned += len(files)
+        for file_path in files:
+            outcomes.append((str(file_path), scan_source_file(analyzers, root, file_path)))
+
+    for name, outcome in outcomes:
+        name = detect_phi.sanitize_output_string(name)
+        if scan_all.timed_out_scanners(outcome):
+            result.timed_out.append(name)
+        result.add_file(name, outcome, date)
+    result.scan_duration = (datetime.now() - start_time).total_seconds()
+    return dict(result.to_dict(), exit_code=result.exit_code)
+
+
+def handle(payload: dict) -> dict:
+    """Answer a run or scan request, from the client's working directory."""
+    try:
+        os.chdir(payload.get('cwd') or '/')
+    except (OSError, TypeError) as e:
+        return {'error': f'cannot enter working directory: {e}'}
+    if payload.get('op') == 'run':
+        return run_script(payload)
+    if payload.get('op') == 'scan':
+        return scan_request(payload)
+    return {'error': f"unknown op: {payload.get('op')!r}"}
+
+
+def warm_up():
+    """Load every scanner and run each over small samples."""
+    for script in SCRIPTS:
+        load_scanner(script)
+    scan_all = load_scanner('scan-all')
+    analyzers = scan_all.build_analyzers(list(scan_all.SCANNERS), False)
+    for name, text in WARMUP_SOURCES.items():
+        analyze_source(analyzers, name, buffer_source(Path(name), text.encode('utf-8')))
+
+
+# =============================================================================
+# Main
+# =============================================================================
+
+def detach():
+    """Fork into the background. Returns the function that reports the
+    socket ready, after which the parent exits 0; it exits 1 if the child
+    fails first."""
+    read_fd, write_fd = os.pipe()
+    if os.fork() > 0:
+        os.close(write_fd)
+        sys.exit(0 if os.read(read_fd, 1) else 1)
+    os.close(read_fd)
+    os.setsid()
+
+    def ready():
+        # Errors up to here still reach the terminal
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        os.close(devnull)
+        os.write(write_fd, b'1')
+        os.close(write_fd)
+    return ready
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Keep the HIPAA Guardian scanners warm and answer scan requests')
+    parser.add_argument('--socket', help='Socket path')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        metavar='SECONDS',
+                        help=f'Exit after this long without a request '
+                             f'(default: {DEFAULT_IDLE_TIMEOUT}; 0 = never)')
+    parser.add_argument('--detach', action='store_true',
+                        help='Run in the background once the socket is ready')
+    parser.add_argument('--status', action='store_true', help='Report whether a daemon is running')
+    parser.add_argument('--stop', action='store_true', help='Stop a running daemon')
+
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        response = request({'op': 'shutdown' if args.stop else 'ping'}, args.socket)
+        if response is None or 'error' in response:
+            print('hipaa-guardiand is not running', file=sys.stderr)
+            sys.exit(1)
+        if args.stop:
+            print('hipaa-guardiand stopped')
+        else:
+            print(f"hipaa-guardiand is running (pid {response['pid']})")
+        sys.exit(0)
+
+    if not hasattr(os, 'fork'):
+        print('Error: hipaa-guardiand needs a platform with fork and Unix sockets',
+              file=sys.stderr)
+        sys.exit(1)
+
+    warm_up()
+    ready = detach() if args.detach else None
+    try:
+        serve(handle, args.socket, args.idle_timeout, ready)
+    except DaemonRunning as e:
+        print(f"Error: hipaa-guardiand is already running on {e}", file=sys.stderr)
+        sys.exit(1)
+    except OSError as e:
+        print(f"Error: cannot listen on socket: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+HIPAA Guardian - Shared scanner helpers
+
+Code used by more than one of the scanner scripts in this directory. Python
+puts a script's own directory on sys.path when running it, so the scripts can
+import this package without it being installed.
+"""
+
+import importlib
+
+# Imported up front: the function shares its submodule's name, and importing
+# the submodule binds that name to the module
+from hipaa_core.sniff import SNIFF_BYTES, sniff
+
+# Submodule defining each exported name. Names are imported on first use, so
+# the daemon client, which needs one small submodule before it can hand a
+# run over, does not pay for importing every parser first.
+_SUBMODULES = {
+    'archive': ('ARCHIVE_ERRORS', 'ArchiveLimitError', 'CorruptArchiveError', 'MemberLimitError',
+                'is_archive', 'iter_members', 'member_opener'),
+    'budget': ('DEFAULT_FILE_TIMEOUT', 'FileTimeout', 'TimedOut', 'add_file_timeout_argument',
+               'scan_within_budget'),
+    'cache': ('DEFAULT_CACHE_DIR', 'ScanCache', 'ruleset_fingerprint'),
+    'cda': ('CdaBlock', 'CdaSyntaxError', 'CdaValue', 'iter_cda_blocks'),
+    'csvstream': ('Dialect', 'cell_value', 'iter_records', 'sniff_dialect', 'sniff_header',
+                  'split_record'),
+    'daemon': ('DEFAULT_IDLE_TIMEOUT', 'DaemonRunning', 'LocalOnly', 'default_socket_path',
+               'request', 'run_in_daemon', 'serve'),
+    'gate': ('FailFastGate', 'add_fail_fast_argument'),
+    'hl7': ('Delimiters', 'Hl7Block', 'Segment', 'field_spans', 'iter_hl7_blocks',
+            'repetition_spans'),
+    'jsonstream': ('JsonRegion', 'JsonSyntaxError', 'iter_json_regions'),
+    'lines': ('LineIndex',),
+    'ncpdp': ('NcpdpBlock', 'NcpdpSegment', 'field_values', 'iter_ncpdp_blocks'),
+    'parallel': ('available_cpus', 'scan_files'),
+    'pipeline': ('Analyzer', 'SourceFile', 'analyze_source', 'buffer_source', 'load_scanner',
+                 'read_source', 'scan_source_file', 'walk_sources'),
+    'stream': ('Window', 'iter_text_windows', 'iter_windows'),
+    'walk': ('GlobMatcher', 'split_excludes', 'walk_files'),
+    'watch': ('DEFAULT_DEBOUNCE', 'InotifyWatcher', 'LiveFindings', 'PollingWatcher',
+              'WatchedTree', 'add_watch_argument', 'open_watcher', 'watch_tree'),
+    'x12': ('X12Block', 'X12Delimiters', 'X12Segment', 'element_spans', 'iter_x12_blocks'),
+}
+_EXPORTS = {name: module for module, names in _SUBMODULES.items() for name in names}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'{__name__}.{module}'), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+__all__ = [
+    'ARCHIVE_ERRORS',
+    'Analyzer',
+    'ArchiveLimitError',
+    'CdaBlock',
+    'CdaSyntaxError',
+    'CdaValue',
+    'CorruptArchiveError',
+    'DEFAULT_CACHE_DIR',
+    'DEFAULT_DEBOUNCE',
+    'DEFAULT_FILE_TIMEOUT',
+    'DEFAULT_IDLE_TIMEOUT',
+    'DaemonRunning',
+    'Delimiters',
+    'Dialect',
+    'FailFastGate',
+    'FileTimeout',
+    'GlobMatcher',
+    'Hl7Block',
+    'InotifyWatcher',
+    'JsonRegion',
+    'JsonSyntaxError',
+    'LineIndex',
+    'LiveFindings',
+    'LocalOnly',
+    'MemberLimitError',
+    'NcpdpBlock',
+    'NcpdpSegment',
+    'PollingWatcher',
+    'SNIFF_BYTES',
+    'ScanCache',
+    'Segment',
+    'SourceFile',
+    'TimedOut',
+    'WatchedTree',
+    'Window',
+    'X12Block',
+    'X12Delimiters',
+    'X12Segment',
+    'add_fail_fast_argument',
+    'add_file_timeout_argument',
+    'add_watch_argument',
+    'analyze_source',
+    'available_cpus',
+    'buffer_source',
+    'cell_value',
+    'default_socket_path',
+    'element_spans',
+    'field_spans',
+    'field_values',
+    'is_archive',
+    'iter_cda_blocks',
+    'iter_hl7_blocks',
+    'iter_json_regions',
+    'iter_members',
+    'iter_ncpdp_blocks',
+    'iter_records',
+    'iter_text_windows',
+    'iter_windows',
+    'iter_x12_blocks',
+    'load_scanner',
+    'member_opener',
+    'open_watcher',
+    'read_source',
+    'repetition_spans',
+    'request',
+    'ruleset_fingerprint',
+    'run_in_daemon',
+    'scan_files',
+    'scan_source_file',
+    'scan_within_budget',
+    'serve',
+    'sniff',
+    'sniff_dialect',
+    'sniff_header',
+    'split_excludes',
+    'split_record',
+    'walk_files',
+    'walk_sources',
+    'watch_tree',
+]
@@ -0,0 +1,230 @@
+"""
+Streaming reads of compressed files and archives.
+
+Rotated logs arrive as .log.gz and data handoffs as .zip or .tar.gz. Their
+members are decompressed as streams and handed to the scanner one at a
+time, so nothing is extracted to disk and memory stays bounded. A member is
+reported as "archive.zip!/inner/path.csv".
+
+Archives are untrusted input, and a few kilobytes can decompress to
+terabytes. Every read is counted against a per-member limit and a limit for
+the archive as a whole, and the number of members is capped. A member over
+its limit raises MemberLimitError when read, and the caller moves on to the
+next one; hitting an archive-wide limit raises ArchiveLimitError, and the
+caller stops reading that archive. A corrupt archive raises
+CorruptArchiveError, so errors of the code reading the members are not
+mistaken for it.
+"""
+
+import gzip
+import io
+import tarfile
+import zipfile
+import zlib
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Callable, Iterator, Optional, TextIO, Tuple
+
+# Suffixes read as archives. A bare .gz is a single compressed file.
+TAR_SUFFIXES = ('.tar', '.tgz', '.tar.gz', '.tar.bz2', '.tar.xz')
+ARCHIVE_SUFFIXES = TAR_SUFFIXES + ('.zip', '.gz')
+
+# Uncompressed bytes read from any one member
+MAX_MEMBER_BYTES = 256 * 1024 * 1024
+
+# Uncompressed bytes read from all members of one archive together
+MAX_ARCHIVE_BYTES = 1024 * 1024 * 1024
+
+# Members read from one archive
+MAX_ARCHIVE_MEMBERS = 10000
+
+# Bytes read at a time when passing over a tar member too large to scan
+_SKIP_BLOCK = 1024 * 1024
+
+# Errors raised by a corrupt or truncated archive, reported as
+# CorruptArchiveError
+ARCHIVE_ERRORS = (tarfile.TarError, zipfile.BadZipFile, gzip.BadGzipFile,
+                  EOFError, OSError, RuntimeError, ValueError, zlib.error)
+
+
+class ArchiveLimitError(Exception):
+    """An archive exceeded one of the decompression limits."""
+
+
+class MemberLimitError(ArchiveLimitError):
+    """One member exceeded the per-member limit; the others can still be
+    read."""
+
+
+class CorruptArchiveError(Exception):
+    """An archive or one of its members could not be decompressed."""
+
+
+def is_archive(file_path: Path) -> bool:
+    """Return True if file_path is read as an archive."""
+    return file_path.name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+class _LimitedReader(io.RawIOBase):
+    """Raw stream over a decompressing reader that enforces the byte limits."""
+
+    def __init__(self, stream: BinaryIO, name: str, budget: list):
+        self._stream = stream
+        self._name = name
+        self._read = 0
+        self._budget = budget  # [bytes left for the whole archive]
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        try:
+            data = self._stream.read(len(buffer))
+        except ARCHIVE_ERRORS as error:
+            raise CorruptArchiveError(f"{self._name}: {error}") from error
+        count = len(data)
+        self._read += count
+        self._budget[0] -= count
+        if self._read > MAX_MEMBER_BYTES:
+            raise MemberLimitError(
+                f"{self._name}: member exceeds {MAX_MEMBER_BYTES} bytes uncompressed")
+        if self._budget[0] < 0:
+            raise ArchiveLimitError(
+                f"{self._name}: archive exceeds {MAX_ARCHIVE_BYTES} bytes uncompressed")
+        buffer[:count] = data
+        return count
+
+
+class _Oversized:
+    """Stands in for a member that declares more than MAX_MEMBER_BYTES, so
+    it is reported when read instead of being decompressed."""
+
+    def __init__(self, reason: str):
+        self._reason = reason
+
+    def read(self, size: int = -1) -> bytes:
+        raise MemberLimitError(self._reason)
+
+
+class _MemberView(io.RawIOBase):
+    """Raw stream over a member that reads recorded bytes first, then
+    continues the member, recording what it reads when asked to."""
+
+    def __init__(self, member: BinaryIO, recorded: Optional[bytearray]):
+        self._member = member
+        self._recorded = recorded
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        recorded = self._recorded
+        if recorded is not None and self._position < len(recorded):
+            data = recorded[self._position:self._position + len(buffer)]
+        else:
+            data = self._member.read(len(buffer))
+            if recorded is not None:
+                recorded += data
+        count = len(data)
+        self._position += count
+        buffer[:count] = data
+        return count
+
+
+def member_opener(member: BinaryIO, encoding: str, replay: bool = False) -> Callable[[], TextIO]:
+    """Return a function opening a member as text, for callers that may open
+    a file more than once.
+
+    A member can only be read once, so with replay set the bytes read are
+    kept in memory and every call starts again from the member's first byte;
+    set it only for formats a parser may give up on part way. Otherwise each
+    call continues where the last one stopped. Closing the text stream
+    leaves the member open.
+    """
+    recorded = bytearray() if replay else None
+
+    def open_text() -> TextIO:
+        return io.TextIOWrapper(io.BufferedReader(_MemberView(member, recorded)),
+                                encoding=encoding, errors='ignore')
+    return open_text
+
+
+def _display(file_path: Path, member_name: str) -> str:
+    """Path a member is reported under: "archive.zip!/inner/path"."""
+    return f"{file_path}!/{PurePosixPath(member_name.lstrip('/'))}"
+
+
+def _zip_members(file_path: Path) -> Iterator[Tuple[str, BinaryIO]]:
+    with zipfile.ZipFile(file_path) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            # The declared size can lie, so reads are still counted.
+            # Members are read by offset, so one too large costs nothing
+            # to pass over.
+            if info.file_size > MAX_MEMBER_BYTES:
+                yield _display(file_path, info.filename), _Oversized(
+                    f"{_display(file_path, info.filename)}: "
+                    f"member declares {info.file_size} bytes uncompressed")
+                continue
+            with archive.open(info) as member:
+                yield _display(file_path, info.filename), member
+
+
+def _tar_members(file_path: Path, budget: list) -> Iterator[Tuple[str, BinaryIO]]:
+    # Stream mode reads the archive front to back, without seeking
+    with tarfile.open(file_path, mode='r|*') as archive:
+        for info in archive:
+            if not info.isfile():
+                continue
+            if info.size > MAX_MEMBER_BYTES:
+                # Passing over it still decompresses it, so it counts
+                # against the archive's limit
+                budget[0] -= info.size
+                if budget[0] < 0:
+                    raise ArchiveLimitError(
+                        f"{file_path}: archive exceeds {MAX_ARCHIVE_BYTES} bytes uncompressed")
+                yield _display(file_path, info.name), _Oversized(
+                    f"{_display(file_path, info.name)}: member declares {info.size} bytes")
+                # Drained in large reads: tarfile passes over it in small ones
+                member = archive.extractfile(info)
+                while member is not None and member.read(_SKIP_BLOCK):
+                    pass
+                continue
+            member = archive.extractfile(info)
+            if member is not None:
+                yield _display(file_path, info.name), member
+
+
+def iter_members(file_path: Path) -> Iterator[Tuple[str, BinaryIO]]:
+    """Yield (display path, stream) for each regular member of an archive.
+
+    Streams are only valid until the next member is requested. Reading one
+    raises MemberLimitError once the member is over its limit, at the first
+    read if it declares so, and ArchiveLimitError once the archive is.
+    A bare .gz yields one stream under the archive's own path. Corrupt
+    archives raise CorruptArchiveError, from the iteration or a read.
+    """
+    try:
+        yield from _iter_members(file_path)
+    except ARCHIVE_ERRORS as error:
+        raise CorruptArchiveError(f"{file_path}: {error}") from error
+
+
+def _iter_members(file_path: Path) -> Iterator[Tuple[str, BinaryIO]]:
+    name = file_path.name.lower()
+    budget = [MAX_ARCHIVE_BYTES]
+    if name.endswith(TAR_SUFFIXES):
+        members = _tar_members(file_path, budget)
+    elif name.endswith('.zip'):
+        members = _zip_members(file_path)
+    else:
+        with gzip.open(file_path, 'rb') as member:
+            yield str(file_path), _LimitedReader(member, str(file_path), budget)
+        return
+
+    for count, (display, member) in enumerate(members, 1):
+        if count > MAX_ARCHIVE_MEMBERS:
+            raise ArchiveLimitError(
+                f"{file_path}: more than {MAX_ARCHIVE_MEMBERS} members")
+        yield display, _LimitedReader(member, display, budget)
@@ -0,0 +1,71 @@
+"""
+Per-file CPU time budgets.
+
+The scanners' patterns are written to run in linear time, but a scan still
+runs third-party regexes and parsers over files nobody has looked at, and
+one pathological file should not hang a CI job. scan_within_budget runs one
+file's scan under a CPU-time limit (ITIMER_PROF, so time spent waiting on
+I/O or on other processes does not count) and hands back a TimedOut marker
+instead of findings when the limit is hit. The limit is reset per file and
+works the same in a worker process as in a serial run.
+"""
+
+import argparse
+import signal
+import threading
+from pathlib import Path
+from typing import Callable
+
+# CPU seconds one file may take before it is reported as timed out
+DEFAULT_FILE_TIMEOUT = 30.0
+
+
+class FileTimeout(Exception):
+    """Raised in a scan when its file runs out of CPU time."""
+
+
+class TimedOut(list):
+    """Result of a scan that ran out of CPU time: no findings.
+
+    An empty list, so code that counts findings or caches them sees nothing
+    to report; check isinstance(result, TimedOut) to tell it apart from a
+    file with no findings.
+    """
+    timed_out = True
+
+
+def add_file_timeout_argument(parser: argparse.ArgumentParser):
+    """Add --file-timeout SECONDS to a scanner's arguments."""
+    parser.add_argument('--file-timeout', type=float, default=DEFAULT_FILE_TIMEOUT,
+                        metavar='SECONDS',
+                        help='CPU seconds one file may take before it is reported '
+                             f'as timed out (default: {DEFAULT_FILE_TIMEOUT:g}; 0 = no limit)')
+
+
+def _expired(signum, frame):
+    raise FileTimeout()
+
+
+def scan_within_budget(scan: Callable, seconds: float, file_path: Path):
+    """Return scan(file_path), or a TimedOut if it takes more than seconds
+    of CPU time.
+
+    The limit only applies on the main thread of a platform with setitimer;
+    elsewhere, or when seconds is 0, the scan runs unlimited.
+    """
+    if (seconds <= 0 or not hasattr(signal, 'setitimer')
+            or threading.current_thread() is not threading.main_thread()):
+        return scan(file_path)
+    previous = signal.signal(signal.SIGPROF, _expired)
+    try:
+        try:
+            signal.setitimer(signal.ITIMER_PROF, seconds)
+            return scan(file_path)
+        finally:
+            # Stop the timer before leaving, so it cannot fire past the
+            # handler below
+            signal.setitimer(signal.ITIMER_PROF, 0)
+    except FileTimeout:
+        return TimedOut()
+    finally:
+        signal.signal(signal.SIGPROF, previous)
@@ -0,0 +1,149 @@
+"""
+Incremental scan cache.
+
+Most files are unchanged between two scans of the same tree, so their
+findings can be replayed instead of recomputed. Each file's findings are
+stored on disk keyed by its path. They are reused when the file's size and
+mtime still match or, if only the mtime moved (a fresh checkout, a touch),
+when its SHA-256 still matches.
+
+Entries live under a directory named after a fingerprint of the scanner's
+rules and source code, this package's included. Editing a pattern, an
+exclusion, the scanner itself or one of the shared parsers therefore starts
+a fresh cache, and directories of older rulesets are removed. Options that
+change a file's findings add a second part to the name, so runs with
+different options keep separate caches side by side instead of wiping each
+other's. Cached findings include redacted context, so the cache is created readable
+by the owner only.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+DEFAULT_CACHE_DIR = '.hipaa-guardian/cache'
+
+_HASH_BLOCK = 1024 * 1024
+
+
+def _canonical(value):
+    # Sets have no stable iteration order across runs
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    return repr(value)
+
+
+def ruleset_fingerprint(source_file: str, *rule_tables) -> str:
+    """Fingerprint a scanner's rule tables, its own source code and that of
+    this package, whose readers and tokenizers findings also depend on."""
+    digest = hashlib.sha256(Path(source_file).read_bytes())
+    for module in sorted(Path(__file__).parent.glob('*.py')):
+        digest.update(module.name.encode('utf-8') + b'\0' + module.read_bytes())
+    for table in rule_tables:
+        digest.update(json.dumps(table, sort_keys=True, default=_canonical).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def file_digest(file_path: Path) -> str:
+    """SHA-256 of a file, read in blocks so large files are not loaded whole."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as handle:
+        for block in iter(lambda: handle.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ScanCache:
+    """Per-file findings cache for one scanner and ruleset."""
+
+    def __init__(self, directory: str, scanner: str, fingerprint: str, finding_class: type,
+                 list_class: type = list, options: Optional[dict] = None):
+        self.root = Path(directory)
+        self.scanner = scanner
+        # Directories of this ruleset, whatever the options, are named
+        # "<scanner>-<fingerprint>" or "<scanner>-<fingerprint>-<options>"
+        self.ruleset = f'{scanner}-{fingerprint}'
+        name = self.ruleset
+        if options:
+            options_json = json.dumps(options, sort_keys=True, default=_canonical)
+            name += '-' + hashlib.sha256(options_json.encode('utf-8')).hexdigest()[:8]
+        self.directory = self.root / name
+        self.finding_class = finding_class
+        # A list subclass may carry per-file attributes, cached alongside
+        self.list_class = list_class
+
+    def prepare(self):
+        """Create the cache directory and drop caches of older rulesets,
+        keeping those of this ruleset with other options."""
+        self.directory.mkdir(parents=True, exist_ok=True, mode=0o700)
+        for stale in self.root.glob(f'{self.scanner}-*'):
+            if stale.name == self.ruleset or stale.name.startswith(self.ruleset + '-'):
+                continue
+            if stale.is_dir():
+                shutil.rmtree(stale, ignore_errors=True)
+
+    def _entry_path(self, file_path: Path) -> Path:
+        key = hashlib.sha256(str(file_path).encode('utf-8')).hexdigest()
+        return self.directory / key[:2] / f'{key}.json'
+
+    def _load(self, entry_path: Path) -> Optional[dict]:
+        try:
+            return json.loads(entry_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, entry_path: Path, entry: dict):
+        # Written to a temporary file and renamed, so a concurrent reader or
+        # an interrupted run never sees a partial entry
+        try:
+            entry_path.parent.mkdir(exist_ok=True, mode=0o700)
+            fd, tmp = tempfile.mkstemp(dir=entry_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+                json.dump(entry, handle)
+            os.replace(tmp, entry_path)
+        except OSError:
+            pass
+
+    def scan(self, scan: Callable, file_path: Path) -> Tuple[list, bool]:
+        """Return (findings, cache_hit) for file_path, calling scan on a miss."""
+        try:
+            stat = file_path.stat()
+            entry_path = self._entry_path(file_path)
+            entry = self._load(entry_path)
+            if entry is not None and entry['size'] == stat.st_size:
+                if entry['mtime_ns'] == stat.st_mtime_ns:
+                    return self._decode(entry), True
+                digest = file_digest(file_path)
+                if digest == entry['sha256']:
+                    entry['mtime_ns'] = stat.st_mtime_ns
+                    self._save(entry_path, entry)
+                    return self._decode(entry), True
+            else:
+                digest = file_digest(file_path)
+        except (OSError, KeyError, TypeError, ValueError):
+            return scan(file_path), False
+
+        findings = scan(file_path)
+        if getattr(findings, 'timed_out', False):
+            # Not a result: the next run should try the file again
+            return findings, False
+        self._save(entry_path, {
+            'path': str(file_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': digest,
+            'findings': [asdict(f) for f in findings],
+            'attributes': getattr(findings, '__dict__', {}),
+        })
+        return findings, False
+
+    def _decode(self, entry: dict) -> list:
+        findings = self.list_class(self.finding_class(**data) for data in entry['findings'])
+        if self.list_class is not list:
+            findings.__dict__.update(entry.get('attributes', {}))
+        return findings
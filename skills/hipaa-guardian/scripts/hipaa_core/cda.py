@@ -0,0 +1,240 @@
+"""
+Streaming CDA (HL7 Clinical Document Architecture) tokenizing.
+
+A C-CDA document puts its patient in the header, under
+ClinicalDocument/recordTarget/patientRole: identifiers in id/@extension,
+addr and telecom, and name and birthTime under patient. The header comes
+before the structuredBody, which may run to many megabytes of sections and
+narrative. iter_cda_blocks reads a stream in large blocks ending on a tag,
+feeds them to expat and hands back the requested values under patientRole
+with their offsets in the block and an XPath-like path. Only the stack of
+open elements is kept, and once the body starts the parser is not fed any
+more, so a document costs about one block of memory however long it is.
+
+Entity declarations are refused: a document that declares them is not
+parsed, so entity expansion cannot amplify it.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+from xml.parsers import expat
+
+from hipaa_core.lines import LineIndex
+
+# Characters read per block. Blocks end just after a tag.
+BLOCK_CHARS = 4 * 1024 * 1024
+
+# Longest run without a '>' held whole; a longer one is cut at this length
+MAX_TAG_CHARS = 64 * 1024 * 1024
+
+CDA_NAMESPACE = 'urn:hl7-org:v3'
+
+# Start tags reported wherever they are, as well as the values asked for
+MARKED_ELEMENTS = ('ClinicalDocument', 'patientRole')
+
+_NAME = re.compile(r'[^\s/>]+')
+
+
+class CdaSyntaxError(ValueError):
+    """The stream is not well-formed XML up to its root element, or
+    declares entities."""
+
+
+@dataclass(slots=True)
+class CdaValue:
+    """One requested value under recordTarget/patientRole."""
+    path: str                 # e.g. '/ClinicalDocument/recordTarget/patientRole/addr/city'
+    element: str              # local name of the element holding the value
+    attribute: Optional[str]  # attribute name, or None for the element's text
+    value: str                # with entities and character references undone
+    start: int                # offset of the value in the block text
+    end: int
+    attributes: Dict[str, str]  # all attributes of the element
+
+
+@dataclass
+class CdaBlock:
+    """A run of whole tags and the text between them."""
+    text: str
+    line_index: LineIndex  # resolves offsets in text to stream line/column
+    values: List[CdaValue]
+    # (local name, start, end) of each marked start tag's name in text
+    tags: List[Tuple[str, int, int]]
+    error: Optional[str] = None  # why the rest of the stream is not parsed
+
+
+class _Header:
+    """Expat callbacks that follow the document header, collecting events
+    by byte offset until the block they fall in is handed back."""
+
+    def __init__(self, wanted: Dict[str, Tuple[str, ...]]):
+        self.wanted = wanted
+        self.parser = expat.ParserCreate('utf-8', ' ')
+        self.parser.StartElementHandler = self.start
+        self.parser.EndElementHandler = self.end
+        self.parser.CharacterDataHandler = self.data
+        self.parser.EntityDeclHandler = self.entity
+        self.stack: List[Tuple[str, Dict[str, int]]] = [('', {})]
+        self.patient_depth = 0  # stack depth of the open patientRole, if any
+        # [depth, element, path, byte offset of the text, pieces] while in a
+        # text element
+        self.text: Optional[List] = None
+        self.done = False
+        self.rooted = False
+        # (byte offset, kind, path, element, attributes, text)
+        self.events: List[tuple] = []
+
+    def feed(self, data: bytes):
+        self.parser.Parse(data, False)
+
+    def start(self, name: str, attributes: Dict[str, str]):
+        if self.done:
+            return
+        namespace, _, local = name.rpartition(' ')
+        depth = len(self.stack)
+        counts = self.stack[-1][1]
+        counts[local] = index = counts.get(local, 0) + 1
+        parent = self.stack[-1][0]
+        path = f'{parent}/{local}' if index == 1 else f'{parent}/{local}[{index}]'
+        self.stack.append((path, {}))
+        if depth == 1:
+            self.rooted = True
+            self.done = local != 'ClinicalDocument'
+        elif depth == 2 and local == 'component':
+            # The body follows the header, which holds every recordTarget
+            self.done = True
+        if self.done or namespace not in ('', CDA_NAMESPACE):
+            return
+        offset = self.parser.CurrentByteIndex
+        if local == 'patientRole':
+            if not parent.rpartition('/')[2].startswith('recordTarget'):
+                return
+            self.patient_depth = depth
+        if local in MARKED_ELEMENTS:
+            self.events.append((offset, 'tag', path, local, attributes, None))
+        elif self.patient_depth and local in self.wanted:
+            if self.wanted[local]:
+                self.events.append((offset, 'attributes', path, local, attributes, None))
+            elif self.text is None:
+                self.text = [depth, local, path, None, []]
+
+    def end(self, name: str):
+        if self.done:
+            return
+        self.stack.pop()
+        depth = len(self.stack)
+        if depth == self.patient_depth:
+            self.patient_depth = 0
+        if self.text is not None and self.text[0] == depth:
+            _, element, path, offset, pieces = self.text
+            self.text = None
+            if offset is not None:
+                self.events.append((offset, 'text', path, element,
+                                    self.parser.CurrentByteIndex, ''.join(pieces)))
+
+    def data(self, text: str):
+        if self.text is not None:
+            if self.text[3] is None:
+                self.text[3] = self.parser.CurrentByteIndex
+            self.text[4].append(text)
+
+    def entity(self, *args):
+        raise CdaSyntaxError('entity declarations are not allowed')
+
+
+def _char_offsets(text: str, data: bytes):
+    # Expat reports byte offsets in the UTF-8 encoding of a block
+    if len(data) == len(text):
+        return lambda offset: offset
+    return lambda offset: len(data[:offset].decode('utf-8', 'ignore'))
+
+
+def _attribute_span(text: str, tag_start: int, name: str) -> Optional[Tuple[int, int]]:
+    tag_end = text.find('>', tag_start)
+    match = re.compile(rf'\s{re.escape(name)}\s*=\s*(["\'])(.*?)\1', re.DOTALL).search(
+        text, tag_start, tag_end if tag_end != -1 else len(text))
+    return match.span(2) if match else None
+
+
+def iter_cda_blocks(handle: TextIO, wanted: Dict[str, Tuple[str, ...]],
+                    block_chars: int = BLOCK_CHARS) -> Iterator[CdaBlock]:
+    """Yield consecutive blocks covering a CDA text stream, each listing
+    the values under recordTarget/patientRole of the elements in wanted.
+
+    wanted maps an element's local name to the attributes to report, or to
+    an empty tuple to report its text. Raises CdaSyntaxError if the stream
+    is not XML up to its root element; a later error stops the parsing,
+    is given on the block it falls in, and the remaining blocks are handed
+    back without values.
+    """
+    header = _Header(wanted)
+    first_line, first_column = 1, 1
+    byte_start = 0
+    pending = ''
+    while True:
+        chunk = handle.read(block_chars)
+        text = pending + chunk
+        if not text:
+            return
+        if chunk:
+            cut = text.rfind('>') + 1
+            if cut == 0:
+                if len(text) < MAX_TAG_CHARS:
+                    pending = text
+                    continue
+                cut = len(text)
+            text, pending = text[:cut], text[cut:]
+        else:
+            pending = ''
+
+        values, tags, error = [], [], None
+        if not header.done:
+            data = text.encode('utf-8')
+            try:
+                header.feed(data)
+                if not chunk:
+                    header.parser.Parse(b'', True)
+            except expat.ExpatError as exc:
+                if not header.rooted:
+                    raise CdaSyntaxError(str(exc)) from None
+                # An error past the header does not matter
+                if not header.done:
+                    error = str(exc)
+                    header.done = True
+            to_char = _char_offsets(text, data)
+            for offset, kind, path, element, extra, value in header.events:
+                start = to_char(offset - byte_start)
+                if start < 0:
+                    continue  # began in an earlier block
+                if kind == 'tag':
+                    name = _NAME.match(text, start + 1)
+                    if name:
+                        tags.append((element, name.start(), name.end()))
+                elif kind == 'attributes':
+                    for attribute in wanted[element]:
+                        span = extra.get(attribute) and _attribute_span(text, start, attribute)
+                        if span:
+                            values.append(CdaValue(f'{path}/@{attribute}', element, attribute,
+                                                   extra[attribute], *span, extra))
+                else:
+                    end = to_char(extra - byte_start)
+                    raw = text[start:end]
+                    if value.strip():
+                        values.append(CdaValue(path, element, None, value.strip(),
+                                               start + len(raw) - len(raw.lstrip()),
+                                               end - len(raw) + len(raw.rstrip()), {}))
+            header.events.clear()
+            byte_start += len(data)
+            if header.done:
+                # Let go of the parser's buffers and the open elements
+                header.parser = header.stack = None
+        yield CdaBlock(text, LineIndex(text, first_line, first_column), values, tags, error)
+        newlines = text.count('\n')
+        if newlines:
+            first_line += newlines
+            first_column = len(text) - text.rfind('\n')
+        else:
+            first_column += len(text)
+        if not chunk:
+            return
@@ -0,0 +1,108 @@
+"""
+Streaming CSV records with cell offsets.
+
+The csv module hands back cell values but not where they sit in the line,
+and scanners report findings by line and column. iter_records reads a text
+stream a line at a time, joining the lines of a record whose quoted cell
+holds a newline, and split_record finds the span of each cell in a
+record's text. Memory stays at about one record.
+"""
+
+import csv
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterator, List, TextIO, Tuple
+
+# Delimiters tried when sniffing a file's dialect
+DELIMITERS = ',\t;|'
+
+# Longest record held whole. An unbalanced quote would otherwise join the
+# rest of the file into one record.
+MAX_RECORD_CHARS = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Dialect:
+    """Cell delimiter and quote character of a CSV file."""
+    delimiter: str = ','
+    quotechar: str = '"'
+
+
+def _whole_records(sample: str) -> str:
+    # A block usually ends part way through a record
+    cut = sample.rfind('\n')
+    return sample[:cut] if cut > 0 else sample
+
+
+def sniff_dialect(sample: str, default_delimiter: str = ',') -> Dialect:
+    """Guess the dialect from the first block of a file, falling back to
+    default_delimiter and double quotes."""
+    try:
+        sniffed = csv.Sniffer().sniff(_whole_records(sample), DELIMITERS)
+    except csv.Error:
+        return Dialect(default_delimiter)
+    return Dialect(sniffed.delimiter, sniffed.quotechar or '"')
+
+
+def sniff_header(sample: str) -> bool:
+    """Guess whether the first record of a block is a header. The guess
+    is rough, and True when there is too little to go on."""
+    try:
+        return csv.Sniffer().has_header(_whole_records(sample))
+    except csv.Error:
+        return True
+
+
+@lru_cache(maxsize=16)
+def _cell_pattern(dialect: Dialect) -> re.Pattern:
+    # A quoted cell, in which a doubled quote stands for one, or a bare one
+    delimiter, quote = re.escape(dialect.delimiter), re.escape(dialect.quotechar)
+    return re.compile(rf'{quote}((?:[^{quote}]|{quote}{quote})*){quote}|([^{delimiter}\n]*)')
+
+
+def split_record(text: str, start: int, end: int, dialect: Dialect) -> List[Tuple[int, int]]:
+    """Return the (start, end) offsets of each cell of the record in
+    text[start:end], which excludes its line ending. A quoted cell's span
+    leaves out the quotes."""
+    match = _cell_pattern(dialect).match
+    spans = []
+    pos = start
+    while True:
+        cell = match(text, pos, end)
+        spans.append(cell.span(1) if cell.group(1) is not None else cell.span(2))
+        pos = cell.end()
+        # Anything but a delimiter after a cell is malformed; the record
+        # ends there
+        if pos >= end or text[pos] != dialect.delimiter:
+            return spans
+        pos += 1
+
+
+def cell_value(text: str, span: Tuple[int, int], dialect: Dialect) -> str:
+    """Return the value of the cell at span, with doubled quotes undone."""
+    value = text[span[0]:span[1]]
+    doubled = dialect.quotechar * 2
+    return value.replace(doubled, dialect.quotechar) if doubled in value else value
+
+
+def iter_records(handle: TextIO, dialect: Dialect) -> Iterator[str]:
+    """Yield the text of each record in a stream, with its line ending.
+
+    A record continues onto the next line while it has an unbalanced quote.
+    """
+    quote = dialect.quotechar
+    record = ''
+    for line in handle:
+        if record:
+            record += line
+        elif quote not in line:
+            yield line
+            continue
+        else:
+            record = line
+        if record.count(quote) % 2 == 0 or len(record) > MAX_RECORD_CHARS:
+            yield record
+            record = ''
+    if record:
+        yield record
@@ -0,0 +1,302 @@
+"""
+Warm scanner daemon: socket protocol, server loop and client.
+
+A scan run from a pre-commit hook or an editor spends most of its time
+before it reads a byte: starting Python, importing the parsers and
+compiling every rule. hipaa-guardiand does that once and then answers
+requests over a Unix domain socket, one JSON object per line each way and
+one request per connection:
+
+    {"op": "ping"}
+    {"op": "run", "script": "scan-code", "argv": [...], "cwd": "..."}
+    {"op": "scan", "paths": [...], "buffers": [{"name": ..., "text": ...}]}
+    {"op": "shutdown"}
+
+Each connection is answered in a forked child, so it starts from the warm
+state and whatever a scan changes is thrown away with the child. The socket
+is only accessible to its owner, and connections from any other user are
+refused. Clients, which send their arguments and working directory, only
+use a socket that they own in a directory only they can write to, and
+only talk to a daemon running as themselves; otherwise they scan on their
+own. A daemon whose scripts have been edited since it started answers
+"stale" and exits, so an old ruleset is never served.
+
+This module is imported by every scanner script before anything else, so
+it uses nothing beyond what the interpreter loads at startup anyway.
+"""
+
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+from typing import Callable, Optional
+
+# Seconds without a connection before the daemon exits (0 = never)
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+
+# Largest request accepted, buffers included
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+
+# Seconds a client waits to connect before running the scan itself
+CONNECT_TIMEOUT = 1.0
+
+# Set to any value to keep the scripts from using a running daemon
+NO_DAEMON_ENV = 'HIPAA_GUARDIAN_NO_DAEMON'
+SOCKET_ENV = 'HIPAA_GUARDIAN_SOCKET'
+
+# Directory holding the scanner scripts and this package
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def default_socket_path() -> str:
+    """$HIPAA_GUARDIAN_SOCKET, or a socket in a per-user directory under
+    $XDG_RUNTIME_DIR or /tmp."""
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    directory = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(directory, f'hipaa-guardiand-{os.getuid()}', 'daemon.sock')
+
+
+def _private(path: str, follow_symlinks: bool = True) -> bool:
+    """Return True if path is owned by this user and no one else can write
+    to it."""
+    try:
+        st = os.stat(path, follow_symlinks=follow_symlinks)
+    except OSError:
+        return False
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def code_version() -> list:
+    """Number of scripts and modules, and the newest modification time
+    among them; changes whenever one is edited, added or removed."""
+    count, newest = 0, 0
+    for directory in (SCRIPTS_DIR, os.path.join(SCRIPTS_DIR, 'hipaa_core')):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.py') and entry.is_file():
+                    count += 1
+                    newest = max(newest, entry.stat().st_mtime_ns)
+    return [count, newest]
+
+
+# =============================================================================
+# Client
+# =============================================================================
+
+def request(payload: dict, socket_path: Optional[str] = None,
+            timeout: Optional[float] = None) -> Optional[dict]:
+    """Send one request to the daemon and return its response, or None if
+    no daemon is listening or it did not answer. timeout bounds the wait
+    for the response (default: no limit).
+
+    Also returns None, without sending anything, unless the socket and its
+    directory belong to this user and are writable by no one else, or if
+    the process listening runs as another user. Anyone who could bind the
+    socket first would otherwise receive every run's arguments and choose
+    its exit code.
+    """
+    socket_path = socket_path or default_socket_path()
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    if not (_private(os.path.dirname(socket_path) or '.')
+            and _private(socket_path, follow_symlinks=False)):
+        return None
+    payload = dict(payload, scripts=SCRIPTS_DIR)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(socket_path)
+            # Where the platform cannot say, the checks on the path suffice
+            if _peer_uid(sock) not in (os.getuid(), None):
+                return None
+            sock.settimeout(timeout)
+            sock.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+            sock.shutdown(socket.SHUT_WR)
+            chunks = []
+            while True:
+                chunk = sock.recv(1 << 16)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+    except OSError:
+        return None
+    try:
+        response = json.loads(b''.join(chunks))
+    except ValueError:
+        return None
+    return response if isinstance(response, dict) else None
+
+
+def run_in_daemon(script: str):
+    """Hand this run of a scanner script to a running daemon, if there is
+    one, and exit with its exit code. Returns, so the script runs itself,
+    when there is no daemon, it refused the run or it failed.
+
+    Called by each script before its imports, so a run the daemon answers
+    costs little more than starting the interpreter.
+    """
+    if os.environ.get(NO_DAEMON_ENV):
+        return
+    response = request({'op': 'run', 'script': script, 'argv': sys.argv[1:],
+                        'cwd': os.getcwd()})
+    if response is None or 'exit_code' not in response:
+        return
+    sys.stdout.write(response.get('stdout', ''))
+    sys.stderr.write(response.get('stderr', ''))
+    sys.stdout.flush()
+    sys.exit(response['exit_code'])
+
+
+# =============================================================================
+# Server
+# =============================================================================
+
+class DaemonRunning(Exception):
+    """Raised by serve when another daemon already answers on the socket."""
+
+
+class LocalOnly(Exception):
+    """Raised by a run in the daemon that has to happen in the client's own
+    process, such as one that never ends; the client then runs it itself."""
+
+
+# True in the daemon's child while it answers a connection
+serving = False
+
+
+def _peer_uid(conn: socket.socket) -> Optional[int]:
+    """User ID of the process at the other end, where the platform says."""
+    if hasattr(socket, 'SO_PEERCRED'):
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        return struct.unpack('3i', creds)[1]
+    if hasattr(os, 'getpeereid'):
+        return os.getpeereid(conn.fileno())[0]
+    return None
+
+
+def _read_request(conn: socket.socket) -> Optional[dict]:
+    """Read one request line, or return None if it is too large or not a
+    JSON object."""
+    chunks, size = [], 0
+    while True:
+        chunk = conn.recv(1 << 16)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_REQUEST_BYTES:
+            return None
+        chunks.append(chunk)
+        if b'\n' in chunk:
+            break
+    try:
+        payload = json.loads(b''.join(chunks))
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def _answer(conn: socket.socket, handle: Callable[[dict], dict], version: list) -> bool:
+    """Answer one connection. Returns True if the daemon should stop."""
+    stop = False
+    payload = _read_request(conn)
+    if payload is None:
+        response = {'error': 'bad request'}
+    elif payload.get('scripts', SCRIPTS_DIR) != SCRIPTS_DIR:
+        # A client from another checkout runs its own copy of the scanners
+        response = {'error': 'different scripts', 'scripts': SCRIPTS_DIR}
+    elif code_version() != version:
+        response, stop = {'error': 'stale'}, True
+    elif payload.get('op') == 'ping':
+        response = {'pid': os.getppid(), 'scripts': SCRIPTS_DIR, 'version': version}
+    elif payload.get('op') == 'shutdown':
+        response, stop = {'stopping': True}, True
+    else:
+        response = handle(payload)
+    conn.sendall(json.dumps(response).encode('utf-8') + b'\n')
+    return stop
+
+
+def _reap(signum, frame):
+    try:
+        while os.waitpid(-1, os.WNOHANG)[0]:
+            pass
+    except ChildProcessError:
+        pass
+
+
+def _terminate(signum, frame):
+    raise SystemExit(0)
+
+
+def _listen(socket_path: str) -> socket.socket:
+    """Bind the socket, readable and writable by its owner only, in a
+    directory no one else can write to. A socket left behind by a daemon
+    that died is replaced; a live one is not."""
+    directory = os.path.dirname(socket_path) or '.'
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not _private(directory):
+        raise PermissionError(f'{directory} is not owned by this user or is writable by others')
+    if os.path.exists(socket_path):
+        if request({'op': 'ping'}, socket_path, timeout=CONNECT_TIMEOUT) is not None:
+            raise DaemonRunning(socket_path)
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(umask)
+    server.listen(16)
+    return server
+
+
+def serve(handle: Callable[[dict], dict], socket_path: Optional[str] = None,
+          idle_timeout: float = DEFAULT_IDLE_TIMEOUT, ready: Optional[Callable] = None):
+    """Answer requests on socket_path until shut down, sent SIGTERM or idle
+    for idle_timeout seconds. handle(payload) answers every op other than
+    ping and shutdown and returns the response; it runs in a child forked
+    for the connection. ready() is called once the socket is listening."""
+    global serving
+    socket_path = socket_path or default_socket_path()
+    version = code_version()
+    server = _listen(socket_path)
+    uid = os.getuid()
+    previous_chld = signal.signal(signal.SIGCHLD, _reap)
+    previous_term = signal.signal(signal.SIGTERM, _terminate)
+    try:
+        server.settimeout(idle_timeout or None)
+        if ready is not None:
+            ready()
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                break
+            with conn:
+                conn.setblocking(True)
+                if _peer_uid(conn) not in (uid, None):
+                    continue
+                if os.fork() == 0:
+                    serving = True
+                    status = 1
+                    try:
+                        server.close()
+                        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                        if _answer(conn, handle, version):
+                            os.kill(os.getppid(), signal.SIGTERM)
+                        status = 0
+                    finally:
+                        os._exit(status)
+    finally:
+        signal.signal(signal.SIGCHLD, previous_chld)
+        signal.signal(signal.SIGTERM, previous_term)
+        server.close()
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
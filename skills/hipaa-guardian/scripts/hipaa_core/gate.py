@@ -0,0 +1,90 @@
+"""
+Fail-fast CI gating.
+
+In CI and in the pre-commit hook only a scan's exit code matters: 2 for a
+critical finding, 1 for a high one. With --fail-fast a scanner checks each
+file's findings as they come in and stops at the first one at or above the
+gate's severity, cancelling the files still to be scanned (parallel workers
+included). Instead of the report it prints one short verdict record, which
+names where the blocking finding is but holds nothing of its value.
+
+A file that ran out of CPU time was not fully scanned, so a gate with no
+blocking finding but such a file does not pass: its verdict is
+"incomplete", with exit code 3.
+"""
+
+import argparse
+import json
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+# Severities a gate can fail on, and the exit code for each
+EXIT_CODES = {'critical': 2, 'high': 1}
+
+# Exit code when nothing blocked but a file timed out before it was scanned
+EXIT_INCOMPLETE = 3
+
+
+def add_fail_fast_argument(parser: argparse.ArgumentParser):
+    """Add --fail-fast[=critical|high] to a scanner's arguments."""
+    parser.add_argument('--fail-fast', nargs='?', const='high', choices=sorted(EXIT_CODES),
+                        metavar='critical|high',
+                        help='Stop at the first finding of this severity or above '
+                             '(default: high) and print only a verdict; the exit code '
+                             'is that finding\'s (2 critical, 1 high), else 3 if a file '
+                             'timed out, or 0')
+
+
+@dataclass
+class FailFastGate:
+    """Verdict of a fail-fast scan, built up file by file."""
+    fail_on: str  # 'critical' or 'high'
+    files_scanned: int = 0
+    files_timed_out: int = 0  # scanned files that ran out of CPU time
+    by_severity: dict = field(default_factory=dict)  # findings seen, blocking or not
+    blocking: Optional[dict] = None  # file, line and severity of the finding that failed
+
+    def check(self, findings: Iterable, timed_out: bool = False) -> bool:
+        """Count one file's findings, each with file, line and severity
+        attributes, and whether its scan (or part of it) ran out of CPU
+        time. Returns True once one of them fails the gate; the verdict
+        names the file's first finding of its worst severity."""
+        self.files_scanned += 1
+        if timed_out or getattr(findings, 'timed_out', False):
+            self.files_timed_out += 1
+        worst = EXIT_CODES[self.fail_on] - 1
+        for finding in findings:
+            severity = finding.severity
+            self.by_severity[severity] = self.by_severity.get(severity, 0) + 1
+            if self.blocking is None and EXIT_CODES.get(severity, 0) > worst:
+                worst = EXIT_CODES[severity]
+                blocking = {'file': finding.file, 'line': finding.line, 'severity': severity}
+        if self.blocking is None and worst >= EXIT_CODES[self.fail_on]:
+            self.blocking = blocking
+        return self.blocking is not None
+
+    @property
+    def verdict(self) -> str:
+        if self.blocking:
+            return 'blocked'
+        return 'incomplete' if self.files_timed_out else 'passed'
+
+    @property
+    def exit_code(self) -> int:
+        if self.blocking:
+            return EXIT_CODES[self.blocking['severity']]
+        return EXIT_INCOMPLETE if self.files_timed_out else 0
+
+    def to_dict(self) -> dict:
+        return {
+            'verdict': self.verdict,
+            'fail_on': self.fail_on,
+            'exit_code': self.exit_code,
+            'blocking_finding': self.blocking,
+            'files_scanned': self.files_scanned,
+            'files_timed_out': self.files_timed_out,
+            'by_severity': dict(self.by_severity),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
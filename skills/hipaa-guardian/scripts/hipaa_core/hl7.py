@@ -0,0 +1,155 @@
+"""
+Streaming HL7 v2 segment tokenizing.
+
+An HL7 v2 message is a run of segments separated by carriage returns. It
+starts with an MSH segment whose fourth character (MSH-1) is the field
+separator and whose second field (MSH-2) lists the component, repetition,
+escape and subcomponent separators; both can change from one message to
+the next. iter_hl7_blocks reads a stream in large blocks and picks out the
+segments a scanner asks for with one regex search per block, so segments
+it does not need are skipped without a Python-level step each.
+
+Streams must be opened in text mode with universal newlines (the default),
+so \\r, \\n and \\r\\n segment endings all arrive as \\n and line numbers
+count segments.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Tuple
+
+from hipaa_core.lines import LineIndex
+
+# Characters read per block. Blocks end on a segment boundary.
+BLOCK_CHARS = 4 * 1024 * 1024
+
+# Longest segment held whole; a longer one (an embedded document, say) is
+# cut at this length
+MAX_SEGMENT_CHARS = 64 * 1024 * 1024
+
+# MLLP framing bytes that may precede a segment name
+_FRAMING = '\x0b\x1c'
+
+
+@dataclass(frozen=True)
+class Delimiters:
+    """Separators declared by an MSH segment."""
+    field: str = '|'
+    component: str = '^'
+    repetition: str = '~'
+    escape: str = '\\'
+    subcomponent: str = '&'
+
+    @classmethod
+    @lru_cache(maxsize=64)
+    def from_header(cls, header: str) -> 'Delimiters':
+        """Read MSH-1 and MSH-2 from the text that follows 'MSH', up to the
+        field separator that ends MSH-2 (e.g. '|^~\\&')."""
+        if not header:
+            return cls()
+        defaults = cls()
+        encoding = header[1:]
+        chars = [encoding[i] if i < len(encoding) else default
+                 for i, default in enumerate((defaults.component, defaults.repetition,
+                                              defaults.escape, defaults.subcomponent))]
+        return cls(header[0], *chars)
+
+
+@dataclass(slots=True)
+class Segment:
+    """One requested segment within a block."""
+    name: str
+    start: int  # offset of the segment name in the block text
+    end: int    # offset of the end of the segment
+    delimiters: Delimiters
+
+
+@dataclass
+class Hl7Block:
+    """A run of whole segments."""
+    text: str
+    line_index: LineIndex   # resolves offsets in text to stream line/column
+    segments: List[Segment]  # requested segments, and every MSH, in order
+
+
+def field_spans(text: str, segment: Segment) -> List[Tuple[int, int]]:
+    """Return (start, end) offsets of each field of segment, indexed by
+    field number. Index 0 is the segment name; for MSH, index 1 is the field
+    separator itself, as MSH-1 is numbered."""
+    separator = segment.delimiters.field
+    spans = []
+    start = segment.start
+    if segment.name == 'MSH':
+        spans.append((start, start + 3))
+        spans.append((start + 3, start + 4))
+        start += 4
+    while True:
+        end = text.find(separator, start, segment.end)
+        if end == -1:
+            spans.append((start, segment.end))
+            return spans
+        spans.append((start, end))
+        start = end + 1
+
+
+def repetition_spans(text: str, span: Tuple[int, int],
+                     delimiters: Delimiters) -> List[Tuple[int, int]]:
+    """Split a field's (start, end) span into the spans of its repetitions."""
+    start, end = span
+    spans = []
+    while True:
+        cut = text.find(delimiters.repetition, start, end)
+        if cut == -1:
+            spans.append((start, end))
+            return spans
+        spans.append((start, cut))
+        start = cut + 1
+
+
+def iter_hl7_blocks(handle, segment_names: Iterable[str],
+                    block_chars: int = BLOCK_CHARS) -> Iterator[Hl7Block]:
+    """Yield consecutive blocks covering an HL7 v2 text stream, each listing
+    its segments named in segment_names and its MSH segments."""
+    names = sorted(set(segment_names) | {'MSH'})
+    # A segment name at the start of a line, after any MLLP framing, and
+    # followed by a separator rather than more of a word
+    finder = re.compile(rf'^[{_FRAMING}]*({"|".join(map(re.escape, names))})(?=[^\w\n]|$)',
+                        re.MULTILINE)
+    delimiters = Delimiters()
+    first_line = 1
+    pending = ''
+    while True:
+        chunk = handle.read(block_chars)
+        text = pending + chunk
+        if not text:
+            return
+        if chunk:
+            cut = text.rfind('\n') + 1
+            if cut == 0:
+                if len(text) < MAX_SEGMENT_CHARS:
+                    pending = text
+                    continue
+                cut = len(text)
+            text, pending = text[:cut], text[cut:]
+        else:
+            pending = ''
+
+        segments = []
+        for match in finder.finditer(text):
+            start = match.start(1)
+            end = text.find('\n', start)
+            if end == -1:
+                end = len(text)
+            name = match.group(1)
+            if name == 'MSH':
+                # Messages in one stream nearly always share their delimiters,
+                # so they are parsed once per distinct header
+                header_end = text.find(text[start + 3], start + 4, end) if end > start + 3 else end
+                delimiters = Delimiters.from_header(
+                    text[start + 3:header_end if header_end != -1 else end])
+            segments.append(Segment(name, start, end, delimiters))
+        yield Hl7Block(text, LineIndex(text, first_line), segments)
+        first_line += text.count('\n')
+        if not chunk:
+            return
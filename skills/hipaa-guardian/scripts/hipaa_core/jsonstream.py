@@ -0,0 +1,166 @@
+"""
+Incremental JSON tokenizing with element paths.
+
+A regex pass over JSON can say that a value looks like PHI but not which
+element holds it. iter_json_regions reads a JSON document (or a stream of
+concatenated or newline-delimited documents, as in FHIR bulk exports) a
+block at a time and keeps only the stack of open containers between blocks.
+It hands back the text in regions that end on a token boundary, each with
+every scalar it contains and that scalar's path, so a scanner can attribute
+a match to an element such as ('entry', 412, 'resource', 'identifier', 0,
+'value'). Memory stays at about one region plus the longest single token.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Iterator, List, TextIO, Tuple
+
+from hipaa_core.lines import LineIndex
+
+# Characters handed back per region. Regions end at the first token
+# boundary after this many characters.
+REGION_CHARS = 1024 * 1024
+
+# Characters read from the stream at a time
+READ_CHARS = 256 * 1024
+
+# Longest single token, such as a base64 attachment, held in memory
+MAX_TOKEN_CHARS = 64 * 1024 * 1024
+
+# One token, after any whitespace, commas and colons. Commas and colons
+# carry no information once containers are tracked: inside an object,
+# keys and values simply alternate.
+_TOKEN = re.compile(r'[\s,:]*(?:([{\[])|([}\]])|"([^"\\]*(?:\\.[^"\\]*)*)"|([^\s,:{}\[\]"]+))')
+
+_SPACE = re.compile(r'[\s,:]*')
+
+
+class JsonSyntaxError(ValueError):
+    """The stream is not well-formed JSON."""
+
+
+@dataclass
+class JsonRegion:
+    """A stretch of the stream made of whole tokens.
+
+    Scalar i (a string, number, true, false or null) spans
+    text[starts[i]:ends[i]], without the quotes of a string. paths[i] holds
+    the keys and array indexes leading to it from its document's root, and
+    is_key[i] is set for object keys, whose path ends in the key itself.
+    """
+    text: str
+    line_index: LineIndex  # resolves offsets in text to stream line/column
+    starts: List[int]
+    ends: List[int]
+    paths: List[Tuple]
+    is_key: List[bool]
+
+
+def _decode_key(raw: str) -> str:
+    return json.loads(f'"{raw}"') if '\\' in raw else raw
+
+
+def _line(buffer: str, pos: int, first_line: int) -> int:
+    return first_line + buffer.count('\n', 0, pos)
+
+
+def iter_json_regions(handle: TextIO, region_chars: int = REGION_CHARS,
+                      read_chars: int = READ_CHARS) -> Iterator[JsonRegion]:
+    """Yield consecutive regions covering a JSON text stream.
+
+    Raises JsonSyntaxError when the stream is not JSON; regions already
+    yielded stay valid. Top-level values may follow one another, and each
+    starts again from an empty path.
+    """
+    buffer = ''
+    pos = 0
+    at_eof = False
+    first_line, first_column = 1, 1
+    starts, ends, paths, is_key = [], [], [], []
+    # The innermost open container is described by in_object, expect_key
+    # and next_index (for arrays); enclosing ones are saved on frames.
+    # path holds the key or index of the current child of each container.
+    frames = []
+    path = []
+    in_object = expect_key = False
+    next_index = 0
+    depth = 0
+    token = _TOKEN.match
+
+    while True:
+        match = token(buffer, pos)
+        if match is None or (match.end() == len(buffer) and not at_eof):
+            if at_eof:
+                if _SPACE.match(buffer, pos).end() != len(buffer):
+                    raise JsonSyntaxError(
+                        f"unexpected character at line {_line(buffer, pos, first_line)}")
+                break
+            if len(buffer) - pos > MAX_TOKEN_CHARS:
+                raise JsonSyntaxError(f"token longer than {MAX_TOKEN_CHARS} characters")
+            chunk = handle.read(read_chars)
+            at_eof = not chunk
+            if pos >= region_chars:
+                text = buffer[:pos]
+                yield JsonRegion(text, LineIndex(text, first_line, first_column),
+                                 starts, ends, paths, is_key)
+                newlines = text.count('\n')
+                if newlines:
+                    first_line += newlines
+                    first_column = len(text) - text.rfind('\n')
+                else:
+                    first_column += len(text)
+                buffer = buffer[pos:]
+                pos = 0
+                starts, ends, paths, is_key = [], [], [], []
+            buffer += chunk
+            continue
+        pos = match.end()
+        kind = match.lastindex
+
+        if kind == 2:
+            # A closing bracket, which must match and may not follow a key
+            if not depth or in_object != (match.group(2) == '}') or (in_object and not expect_key):
+                raise JsonSyntaxError(
+                    f"unbalanced '{match.group(2)}' at line {_line(buffer, pos, first_line)}")
+            depth -= 1
+            path.pop()
+            if depth:
+                in_object, expect_key, next_index = frames.pop()
+            continue
+
+        if depth:
+            if in_object:
+                if expect_key:
+                    if kind != 3:
+                        raise JsonSyntaxError(
+                            f"object key expected at line {_line(buffer, pos, first_line)}")
+                    path[-1] = _decode_key(match.group(3))
+                    starts.append(match.start(3))
+                    ends.append(match.end(3))
+                    paths.append(tuple(path))
+                    is_key.append(True)
+                    expect_key = False
+                    continue
+                expect_key = True
+            else:
+                path[-1] = next_index
+                next_index += 1
+
+        if kind == 1:
+            if depth:
+                frames.append((in_object, expect_key, next_index))
+            depth += 1
+            in_object = expect_key = match.group(1) == '{'
+            next_index = 0
+            path.append(None)
+        else:
+            starts.append(match.start(kind))
+            ends.append(match.end(kind))
+            paths.append(tuple(path))
+            is_key.append(False)
+
+    if depth:
+        raise JsonSyntaxError("unexpected end of stream")
+    text = buffer[:pos]
+    yield JsonRegion(text, LineIndex(text, first_line, first_column), starts, ends, paths, is_key)
@@ -0,0 +1,56 @@
+"""
+Line and column resolution for scanned buffers.
+
+Scanners used to compute the line of every match with
+``content[:pos].count('\\n')``, which re-reads the file up to the match each
+time and is quadratic in file size. LineIndex records each line's start
+offset once per buffer and answers lookups with a binary search.
+"""
+
+import re
+from bisect import bisect_right
+from typing import Tuple
+
+NEWLINE = re.compile('\n')
+NEWLINE_BYTES = re.compile(b'\n')
+
+
+class LineIndex:
+    """Newline offsets for one buffer, built once per file.
+
+    A buffer that is a window into a larger file passes the file line and
+    column of its first character, so lookups report file positions. The
+    buffer may also be bytes (or an mmap) of ASCII text.
+    """
+
+    def __init__(self, content, first_line: int = 1, first_column: int = 1):
+        newline = NEWLINE if isinstance(content, str) else NEWLINE_BYTES
+        # starts[i] is the offset of the first character of line i + 1
+        self.starts = [0]
+        self.starts.extend(m.end() for m in newline.finditer(content))
+        self.length = len(content)
+        self.first_line = first_line
+        self.first_column = first_column
+
+    def line_of(self, pos: int) -> int:
+        """Return the 1-based line number containing offset pos."""
+        return bisect_right(self.starts, pos) + self.first_line - 1
+
+    def position(self, pos: int) -> Tuple[int, int]:
+        """Return the 1-based (line, column) of offset pos."""
+        line = bisect_right(self.starts, pos)
+        column = pos - self.starts[line - 1] + 1
+        if line == 1:
+            column += self.first_column - 1
+        return line + self.first_line - 1, column
+
+    def line_span(self, pos: int) -> Tuple[int, int]:
+        """Return (start, end) offsets of the line containing pos.
+
+        The end offset excludes the trailing newline, so
+        ``content[start:end]`` is the text of the line.
+        """
+        line = bisect_right(self.starts, pos)
+        start = self.starts[line - 1]
+        end = self.starts[line] - 1 if line < len(self.starts) else self.length
+        return start, end
@@ -0,0 +1,107 @@
+"""
+Streaming NCPDP Telecommunication segment tokenizing.
+
+An NCPDP D.0 pharmacy transaction is a fixed-length header followed by
+segments. Unlike X12 and HL7 the separators are fixed by the standard: a
+segment starts after a segment separator (0x1E) and groups of segments
+after a group separator (0x1D); every field starts with a field separator
+(0x1C) and a two-character field ID, so a field is found by its ID rather
+than its position. The segment ID is the field "AM", e.g. "AM01" for the
+patient segment. Batch files wrap each transaction in STX/ETX and may add
+newlines between them. iter_ncpdp_blocks reads a stream in large blocks
+ending on a separator and picks out the requested segments with one regex
+search per block.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, TextIO, Tuple
+
+from hipaa_core.lines import LineIndex
+
+SEGMENT_SEPARATOR = '\x1e'
+GROUP_SEPARATOR = '\x1d'
+FIELD_SEPARATOR = '\x1c'
+
+# Characters that end a segment: the separators, batch ETX/STX framing and
+# newlines between batch records
+_SEGMENT_END = re.compile('[\x1d\x1e\x02\x03\n]')
+
+# Characters read per block. Blocks end just after a segment.
+BLOCK_CHARS = 4 * 1024 * 1024
+
+# Longest segment held whole; a longer one is cut at this length
+MAX_SEGMENT_CHARS = 64 * 1024 * 1024
+
+
+@dataclass(slots=True)
+class NcpdpSegment:
+    """One requested segment within a block."""
+    segment_id: str  # e.g. '01' for the patient segment
+    start: int       # offset of the field separator before 'AM'
+    end: int         # offset of the character that ends the segment
+
+
+@dataclass
+class NcpdpBlock:
+    """A run of whole segments."""
+    text: str
+    line_index: LineIndex  # resolves offsets in text to stream line/column
+    segments: List[NcpdpSegment]
+
+
+def field_values(text: str, segment: NcpdpSegment) -> List[Tuple[str, int, int]]:
+    """Return (field ID, start, end) for each field of segment after the
+    segment ID, where text[start:end] is the field's value."""
+    fields = []
+    start = text.find(FIELD_SEPARATOR, segment.start + 1, segment.end)
+    while start != -1:
+        end = text.find(FIELD_SEPARATOR, start + 1, segment.end)
+        field_end = segment.end if end == -1 else end
+        if field_end - start > 2:
+            fields.append((text[start + 1:start + 3], start + 3, field_end))
+        start = end
+    return fields
+
+
+def iter_ncpdp_blocks(handle: TextIO, segment_ids: Iterable[str],
+                      block_chars: int = BLOCK_CHARS) -> Iterator[NcpdpBlock]:
+    """Yield consecutive blocks covering an NCPDP text stream, each listing
+    its segments whose IDs are in segment_ids."""
+    ids = '|'.join(sorted(set(segment_ids)))
+    finder = re.compile(rf'{FIELD_SEPARATOR}AM({ids})(?=[{FIELD_SEPARATOR}\x1d\x1e]|$)')
+    first_line, first_column = 1, 1
+    pending = ''
+    while True:
+        chunk = handle.read(block_chars)
+        text = pending + chunk
+        if not text:
+            return
+        if chunk:
+            cut = max(text.rfind(SEGMENT_SEPARATOR), text.rfind(GROUP_SEPARATOR),
+                      text.rfind('\x03'), text.rfind('\n'))
+            if cut <= 0:
+                if len(text) < MAX_SEGMENT_CHARS:
+                    pending = text
+                    continue
+                cut = len(text)
+            # The separator stays with the next block, as the start of its
+            # first segment
+            text, pending = text[:cut], text[cut:]
+        else:
+            pending = ''
+
+        segments = []
+        for match in finder.finditer(text):
+            end = _SEGMENT_END.search(text, match.end())
+            segments.append(NcpdpSegment(match.group(1), match.start(),
+                                         end.start() if end else len(text)))
+        yield NcpdpBlock(text, LineIndex(text, first_line, first_column), segments)
+        newlines = text.count('\n')
+        if newlines:
+            first_line += newlines
+            first_column = len(text) - text.rfind('\n')
+        else:
+            first_column += len(text)
+        if not chunk:
+            return
@@ -0,0 +1,144 @@
+"""
+Multi-process file scanning.
+
+Each scanner's per-file function is independent of every other file, so a
+run can be spread over a process pool. Files are grouped into chunks of
+roughly equal total size, so one large file does not leave the other workers
+idle, and results are handed back in the original file order so the merged
+output is identical to a serial run. A caller that stops reading early, such
+as a fail-fast gate, gets the outstanding work cancelled.
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# Chunks per worker; more chunks balance better but cost more round trips
+CHUNKS_PER_JOB = 4
+
+# Placeholder for a file whose chunk has not come back yet
+_PENDING = object()
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """Return the CPU limit imposed by the cgroup, or None if unlimited."""
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()[:2]
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    # cgroup v1: quota of -1 means unlimited
+    try:
+        quota = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us').read_text())
+        period = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us').read_text())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    """Return the number of CPUs this process may actually use.
+
+    os.cpu_count() reports the host's CPUs; containers are usually limited
+    further by CPU affinity or a cgroup quota, and oversubscribing them
+    only adds context switches.
+    """
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        count = min(count, max(1, math.ceil(quota)))
+    return max(1, count)
+
+
+def resolve_jobs(jobs: int) -> int:
+    """Map a --jobs value to a worker count (0 means one per available CPU)."""
+    return available_cpus() if jobs <= 0 else jobs
+
+
+def _file_size(file_path: Path) -> int:
+    try:
+        return file_path.stat().st_size
+    except OSError:
+        return 0
+
+
+def balanced_chunks(files: List[Path], count: int) -> List[List[Tuple[int, Path]]]:
+    """Split files into at most count chunks of similar total size.
+
+    Largest files are placed first, each into the currently lightest chunk.
+    Entries are (position in files, path) so results can be put back in
+    order.
+    """
+    chunks = [[] for _ in range(min(count, len(files)))]
+    totals = [0] * len(chunks)
+    sizes = [_file_size(file_path) for file_path in files]
+    for position in sorted(range(len(files)), key=sizes.__getitem__, reverse=True):
+        lightest = totals.index(min(totals))
+        chunks[lightest].append((position, files[position]))
+        totals[lightest] += sizes[position]
+    return [chunk for chunk in chunks if chunk]
+
+
+def _scan_chunk(scan: Callable, chunk: List[Tuple[int, Path]]) -> list:
+    """Worker entry point: scan every file in one chunk."""
+    return [(position, scan(file_path)) for position, file_path in chunk]
+
+
+def _cancel(pool: ProcessPoolExecutor):
+    """Drop the chunks not yet started and stop the ones running."""
+    # The executor has no public way to stop a running call before
+    # Python 3.14; its workers are plain processes
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    # Waiting lets the executor see its workers gone and wind down before
+    # the interpreter's exit handlers run
+    pool.shutdown(wait=True, cancel_futures=True)
+
+
+def scan_files(scan: Callable, files: List[Path], jobs: int = 1,
+               ordered: bool = True) -> Iterator[Tuple[Path, object]]:
+    """Yield (file, scan(file)) for every file, in the order of files, or
+    as each result comes in if ordered is False.
+
+    scan must be picklable (a module-level function, or a functools.partial
+    of one) when jobs is greater than 1. Closing the iterator early cancels
+    the files not yet scanned.
+    """
+    jobs = min(resolve_jobs(jobs), len(files))
+    if jobs <= 1:
+        for file_path in files:
+            yield file_path, scan(file_path)
+        return
+
+    # Results are yielded as soon as every earlier file's result is in, so
+    # callers can stream output while later chunks are still running
+    results = [_PENDING] * len(files)
+    next_position = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(_scan_chunk, scan, chunk)
+                   for chunk in balanced_chunks(files, jobs * CHUNKS_PER_JOB)]
+        try:
+            for future in as_completed(futures):
+                for position, result in future.result():
+                    if not ordered:
+                        next_position += 1
+                        yield files[position], result
+                        continue
+                    results[position] = result
+                while next_position < len(files) and results[next_position] is not _PENDING:
+                    yield files[next_position], results[next_position]
+                    results[next_position] = None
+                    next_position += 1
+        finally:
+            if next_position < len(files):
+                _cancel(pool)
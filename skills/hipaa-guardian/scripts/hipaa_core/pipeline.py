@@ -0,0 +1,165 @@
+"""
+Single-pass scanning with several analyzers.
+
+Auditing a tree with every scanner used to mean five walks, five reads of
+each file and five line indexes built over the same text. The pipeline
+walks the tree once, reads each file once and sniffs it, and hands the
+same SourceFile to every analyzer whose file patterns it matches. Its text
+and LineIndex are built the first time an analyzer asks for them and then
+shared. Archives and files too large to read whole are handed over without
+data, to the analyzers that read such files themselves; the others skip
+them.
+"""
+
+import importlib.util
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import ModuleType
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from hipaa_core.archive import is_archive
+from hipaa_core.lines import LineIndex
+from hipaa_core.sniff import SNIFF_BYTES, sniff
+from hipaa_core.walk import GlobMatcher, walk_files
+
+# Largest file read whole (the scanners' own limit, 10 MB)
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+
+# Directory holding the scanner scripts
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+
+
+def load_scanner(name: str) -> ModuleType:
+    """Import a scanner script, e.g. 'scan-code', as a module.
+
+    Script names are not module names; each is registered in sys.modules
+    with '_' for '-', so what it defines can be pickled to worker processes.
+    """
+    module_name = name.replace('-', '_')
+    module = sys.modules.get(module_name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(module_name, SCRIPTS_DIR / f'{name}.py')
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[module_name]
+            raise
+    return module
+
+
+@dataclass
+class SourceFile:
+    """One file as read by the pipeline."""
+    path: Path
+    # The file's bytes, or None for an archive or a file over the size limit
+    data: Optional[bytes] = None
+    encoding: Optional[str] = None  # codec sniffed from the first block
+    _text: Optional[str] = field(default=None, repr=False)
+    _line_index: Optional[LineIndex] = field(default=None, repr=False)
+
+    @property
+    def head(self) -> bytes:
+        """The first block, as sniffed."""
+        return self.data[:SNIFF_BYTES]
+
+    @property
+    def text(self) -> str:
+        """The decoded text, with newlines translated as in text mode.
+        Decoded on first use and then shared."""
+        if self._text is None:
+            text = self.data.decode(self.encoding, errors='ignore')
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+            self._text = text
+        return self._text
+
+    @property
+    def line_index(self) -> LineIndex:
+        """Line starts of text, built on first use and then shared."""
+        if self._line_index is None:
+            self._line_index = LineIndex(self.text)
+        return self._line_index
+
+
+def read_source(file_path: Path, max_size: int = MAX_SOURCE_BYTES) -> Optional[SourceFile]:
+    """Read a file whole, or return None if it is not a regular file or
+    sniffs as binary. Archives and files over max_size are not read; they
+    come back without data."""
+    try:
+        if not file_path.is_file():
+            return None
+        resolved = file_path.resolve()
+        if not resolved.is_file():
+            return None
+        if resolved.stat().st_size > max_size or is_archive(file_path):
+            return SourceFile(file_path)
+        data = file_path.read_bytes()
+    except (OSError, ValueError):
+        return None
+    return buffer_source(file_path, data)
+
+
+def buffer_source(file_path: Path, data: bytes) -> Optional[SourceFile]:
+    """Wrap bytes already in memory, such as an editor's unsaved buffer sent
+    to the daemon, as the file at file_path. Returns None if they sniff as
+    binary."""
+    encoding, _ = sniff(data[:SNIFF_BYTES])
+    if encoding is None:
+        return None
+    return SourceFile(file_path, data, encoding)
+
+
+@dataclass
+class Analyzer:
+    """One scanner's part in a pipeline run."""
+    name: str
+    include: Tuple[str, ...]     # Path.glob patterns of the files it scans
+    skip_dirs: FrozenSet[str]    # directories under the root it never enters
+    scan: Callable[[SourceFile], object]
+    reads_files: bool = False    # also takes sources without data
+    matcher: GlobMatcher = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.matcher = GlobMatcher(self.include)
+
+    def applies(self, relative_path: str) -> bool:
+        """Return True if the file at this root-relative POSIX path is scanned."""
+        directories = relative_path.split('/')[:-1]
+        return self.matcher(relative_path) and self.skip_dirs.isdisjoint(directories)
+
+
+def walk_sources(root: Path, analyzers: List[Analyzer]) -> List[Path]:
+    """Return the sorted files under root that some analyzer scans. root
+    itself is returned if it is a file."""
+    if root.is_file():
+        return [root]
+    prune = frozenset.intersection(*(frozenset(a.skip_dirs) for a in analyzers))
+    return walk_files(root, lambda relative: any(a.applies(relative) for a in analyzers),
+                      prune)
+
+
+def analyze_source(analyzers: List[Analyzer], relative_path: str,
+                   source: SourceFile) -> Dict[str, object]:
+    """Return {analyzer name: result} for every analyzer that scans a file
+    at this root-relative POSIX path, in the order of analyzers."""
+    return {a.name: a.scan(source) for a in analyzers
+            if a.applies(relative_path) and (source.data is not None or a.reads_files)}
+
+
+def scan_source_file(analyzers: List[Analyzer], root: Path,
+                     file_path: Path) -> Dict[str, object]:
+    """Read file_path once and return {analyzer name: result} for every
+    analyzer that scans it, in the order of analyzers."""
+    if file_path == root:
+        relative = file_path.name
+    else:
+        relative = file_path.relative_to(root).as_posix()
+    if not any(a.applies(relative) for a in analyzers):
+        return {}
+    source = read_source(file_path)
+    if source is None:
+        return {}
+    return analyze_source(analyzers, relative, source)
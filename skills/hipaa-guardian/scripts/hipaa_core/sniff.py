@@ -0,0 +1,83 @@
+"""
+Content sniffing from a file's first block.
+
+Files used to be decoded as UTF-8 with errors ignored, whatever they held.
+Binaries turned into garbage text that was pattern-matched anyway, and
+UTF-16 exports (Excel's "Unicode Text" CSVs) lost every character, so PHI
+in them was never found. sniff() looks at the first block only and decides
+whether a file is text, and if so how to decode it.
+"""
+
+import codecs
+import math
+from typing import Optional, Tuple
+
+# Bytes read to decide what a file is
+SNIFF_BYTES = 8192
+
+# Bits per byte above which a block is taken to be compressed or encrypted.
+# Text, even non-Latin UTF-8, stays well below; zip, gzip and ciphertext
+# approach 8.
+ENTROPY_LIMIT = 7.5
+
+# Entropy is not meaningful on very small blocks
+ENTROPY_MIN_BYTES = 1024
+
+# Fraction of control bytes above which a NUL-free block is binary
+CONTROL_LIMIT = 0.1
+
+# Longer BOMs first: the UTF-32-LE BOM starts with the UTF-16-LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# Every byte except C0 controls that do not occur in text. Tab, newlines,
+# form feed, backspace and escape are kept, as are 0x1c-0x1f, which are
+# field and segment separators in NCPDP and MLLP-framed HL7.
+_TEXT_BYTES = bytes(b for b in range(256)
+                    if b >= 0x20 or b in b'\t\n\r\x0b\x0c\x08\x1b\x1c\x1d\x1e\x1f')
+
+
+def _entropy(block: bytes) -> float:
+    """Shannon entropy of block in bits per byte."""
+    total = len(block)
+    entropy = 0.0
+    for value in range(256):
+        count = block.count(value)
+        if count:
+            p = count / total
+            entropy -= p * math.log2(p)
+    return entropy
+
+
+def sniff(block: bytes) -> Tuple[Optional[str], str]:
+    """Classify a file from its first block.
+
+    Returns (encoding, reason). encoding is the codec to decode the file
+    with, or None if the file should be skipped. reason says why: 'empty',
+    'bom', 'utf-16' (no BOM), 'text', 'binary' or 'high-entropy'.
+    """
+    if not block:
+        return 'utf-8', 'empty'
+    for bom, encoding in _BOMS:
+        if block.startswith(bom):
+            return encoding, 'bom'
+
+    if 0 in block:
+        # BOM-less UTF-16 of mostly ASCII text has a NUL in every other byte
+        even, odd = block[0::2], block[1::2]
+        if even.count(0) == 0 and odd.count(0) >= len(odd) // 2:
+            return 'utf-16-le', 'utf-16'
+        if odd.count(0) == 0 and even.count(0) >= len(even) // 2:
+            return 'utf-16-be', 'utf-16'
+        return None, 'binary'
+
+    if len(block) >= ENTROPY_MIN_BYTES and _entropy(block) > ENTROPY_LIMIT:
+        return None, 'high-entropy'
+    if len(block.translate(None, _TEXT_BYTES)) > CONTROL_LIMIT * len(block):
+        return None, 'binary'
+    return 'utf-8', 'text'
@@ -0,0 +1,79 @@
+"""
+Windowed reading for files too large to load at once.
+
+A file is decoded in fixed-size windows. Consecutive windows overlap, so a
+match that crosses a window boundary is still whole in one of them. Each
+window "owns" a range of start offsets, and only matches starting in that
+range should be reported. Every position in the file is owned by exactly
+one window, so no match is lost or reported twice. Memory stays at about
+one window plus the overlap, whatever the size of the file.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, TextIO
+
+from hipaa_core.lines import LineIndex
+
+# Characters decoded per window
+WINDOW_CHARS = 4 * 1024 * 1024
+
+# Characters shared by consecutive windows. This must be longer than the
+# longest match plus the context a scanner reads around it.
+OVERLAP_CHARS = 4096
+
+
+@dataclass
+class Window:
+    """One slice of a streamed file."""
+    text: str
+    line_index: LineIndex  # resolves offsets in text to file line/column
+    own_start: int         # report matches with own_start <= start < own_end
+    own_end: int
+
+
+def iter_windows(file_path: Path, window_chars: int = WINDOW_CHARS,
+                 overlap_chars: int = OVERLAP_CHARS,
+                 encoding: str = 'utf-8') -> Iterator[Window]:
+    """Yield overlapping windows covering the whole of file_path.
+
+    The text is decoded the same way as Path.read_text(encoding=encoding,
+    errors='ignore'). Apart from the first window, each one starts with
+    overlap_chars of left context from the previous window and ends with
+    overlap_chars of right context that it does not own.
+    """
+    with open(file_path, encoding=encoding, errors='ignore') as handle:
+        yield from iter_text_windows(handle, window_chars, overlap_chars)
+
+
+def iter_text_windows(handle: TextIO, window_chars: int = WINDOW_CHARS,
+                      overlap_chars: int = OVERLAP_CHARS) -> Iterator[Window]:
+    """Yield overlapping windows covering an open text stream.
+
+    Like iter_windows, for streams that are not files on disk, such as
+    archive members being decompressed.
+    """
+    text = ''
+    own_start = 0
+    first_line, first_column = 1, 1
+    while True:
+        chunk = handle.read(window_chars)
+        at_eof = len(chunk) < window_chars
+        text += chunk
+        own_end = len(text) if at_eof else max(own_start, len(text) - overlap_chars)
+        yield Window(text, LineIndex(text, first_line, first_column),
+                     own_start, own_end)
+        if at_eof:
+            return
+
+        # Keep the unowned tail plus overlap_chars of left context
+        keep_from = max(0, own_end - overlap_chars)
+        dropped = text[:keep_from]
+        newlines = dropped.count('\n')
+        if newlines:
+            first_line += newlines
+            first_column = len(dropped) - dropped.rfind('\n')
+        else:
+            first_column += len(dropped)
+        text = text[keep_from:]
+        own_start = own_end - keep_from
@@ -0,0 +1,130 @@
+"""
+File discovery for the scanners.
+
+Scanners used to run one recursive Path.glob per include pattern and only
+then filter out excluded directories. That meant walking the tree once per
+pattern, including every file under node_modules and .git. walk_files makes
+a single os.scandir pass instead. It never enters a pruned directory, tests
+each file with one precompiled matcher, and, like Path.glob('**/*'),
+follows symlinked files but not symlinked directories.
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Callable, Iterable, List, Set, Tuple
+
+# "**/*.ext": the common include pattern, matched with str.endswith
+SUFFIX_GLOB = re.compile(r'\*\*/\*(\.[^*?\[\]/]+)')
+
+# "**/name/**": an exclude pattern that prunes every directory called name
+PRUNE_GLOB = re.compile(r'\*\*/([^*?\[\]/]+)/\*\*')
+
+
+def _translate_part(part: str) -> str:
+    """Translate one glob path component to a regex that cannot cross '/'."""
+    out = []
+    i = 0
+    while i < len(part):
+        ch = part[i]
+        if ch == '*':
+            out.append('[^/]*')
+        elif ch == '?':
+            out.append('[^/]')
+        elif ch == '[':
+            end = part.find(']', i + 2)
+            if end == -1:
+                out.append(re.escape(ch))
+            else:
+                body = part[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append(f'[{body}]')
+                i = end
+        else:
+            out.append(re.escape(ch))
+        i += 1
+    return ''.join(out)
+
+
+def translate_glob(pattern: str) -> str:
+    """Translate a Path.glob pattern to a regex over root-relative POSIX paths."""
+    parts = pattern.split('/')
+    out = []
+    for index, part in enumerate(parts):
+        last = index == len(parts) - 1
+        if part == '**':
+            # Zero or more whole directories (or anything, at the end)
+            out.append('.*' if last else '(?:[^/]+/)*')
+        else:
+            out.append(_translate_part(part) + ('' if last else '/'))
+    return ''.join(out)
+
+
+class GlobMatcher:
+    """Precompiled matcher for a list of Path.glob-style include patterns."""
+
+    def __init__(self, patterns: Iterable[str]):
+        suffixes = []
+        expressions = []
+        for pattern in patterns:
+            suffix = SUFFIX_GLOB.fullmatch(pattern)
+            if suffix:
+                suffixes.append(suffix.group(1))
+            else:
+                expressions.append(translate_glob(pattern))
+        self.suffixes = tuple(suffixes)
+        self.regex = re.compile('|'.join(expressions)) if expressions else None
+
+    def __call__(self, relative_path: str) -> bool:
+        if self.suffixes and relative_path.endswith(self.suffixes):
+            return True
+        return self.regex is not None and self.regex.fullmatch(relative_path) is not None
+
+
+def split_excludes(patterns: Iterable[str]) -> Tuple[Set[str], List[str]]:
+    """Split exclude patterns into prunable directory names and the rest.
+
+    '**/node_modules/**' becomes the directory name 'node_modules'. Other
+    patterns are returned unchanged and are checked per file with Path.match.
+    """
+    prune = set()
+    rest = []
+    for pattern in patterns:
+        match = PRUNE_GLOB.fullmatch(pattern)
+        if match:
+            prune.add(match.group(1))
+        else:
+            rest.append(pattern)
+    return prune, rest
+
+
+def walk_files(root: Path, match: Callable[[str], bool],
+               prune_dirs: Iterable[str] = ()) -> List[Path]:
+    """Return the sorted regular files under root whose root-relative POSIX
+    path satisfies match, never entering a directory named in prune_dirs.
+
+    Symlinked files are followed but symlinked directories are not entered,
+    as with Path.glob('**/*'); root itself may be a symlink.
+    """
+    prune_dirs = frozenset(prune_dirs)
+    files = []
+    pending = [(str(root), '')]
+    while pending:
+        directory, prefix = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    relative = prefix + entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in prune_dirs:
+                                pending.append((entry.path, relative + '/'))
+                        elif entry.is_file() and match(relative):
+                            files.append(Path(entry.path))
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    files.sort()
+    return files
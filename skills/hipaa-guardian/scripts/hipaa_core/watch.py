@@ -0,0 +1,454 @@
+"""
+Watch mode: rescan files as they change.
+
+While fixtures and seed scripts are being edited, rerunning a whole scan
+after every save is slow and the full report buries what changed. watch_tree
+scans the tree once and then waits for changes: inotify on Linux, or
+polling file sizes and modification times where inotify is unavailable.
+Saves arriving in a burst (an editor's write-and-rename, a checkout) are
+gathered until the tree has been quiet for the debounce interval, and only
+the files they touched are rescanned. Findings of a deleted file are
+retracted. Each rescan prints only the difference to the live finding set:
+findings new since the last one and findings resolved by it.
+
+A finding that survives an edit keeps its ID. Findings are matched by what
+they are and the value's hash, not by line, so moving code around does not
+report every finding below the edit as resolved and new again.
+"""
+
+import argparse
+import errno
+import json
+import os
+import select
+import struct
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from hipaa_core import daemon
+from hipaa_core.budget import TimedOut
+from hipaa_core.parallel import scan_files
+from hipaa_core.walk import walk_files
+
+# Seconds the tree must be quiet before a burst of changes is rescanned
+DEFAULT_DEBOUNCE = 0.3
+
+# Seconds between looks at the tree when polling
+POLL_INTERVAL = 1.0
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+# struct inotify_event: wd, mask, cookie, len, then len bytes of name
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def add_watch_argument(parser: argparse.ArgumentParser):
+    """Add --watch and --debounce SECONDS to a scanner's arguments."""
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running: rescan files as they change and print the '
+                             'findings new or resolved since the last scan')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE, metavar='SECONDS',
+                        help='With --watch, seconds the tree must be quiet before a burst '
+                             f'of changes is rescanned (default: {DEFAULT_DEBOUNCE:g})')
+
+
+# =============================================================================
+# Watched Files
+# =============================================================================
+
+class WatchedTree:
+    """The files a scanner scans under root: those whose root-relative POSIX
+    path satisfies matcher, outside directories named in prune_dirs. A root
+    that is a file is the one file watched."""
+
+    def __init__(self, root: Path, matcher: Callable[[str], bool],
+                 prune_dirs: Iterable[str] = ()):
+        self.root = root
+        self.matcher = matcher
+        self.prune_dirs = frozenset(prune_dirs)
+        self.single_file = root.is_file()
+
+    def selects(self, path: Path) -> bool:
+        """Return True if path is, or would be, scanned."""
+        if self.single_file:
+            return path == self.root
+        try:
+            relative = path.relative_to(self.root)
+        except ValueError:
+            return False
+        return (self.prune_dirs.isdisjoint(relative.parts[:-1])
+                and self.matcher(relative.as_posix()))
+
+    def files(self, top: Optional[Path] = None) -> List[Path]:
+        """The scanned files now under top (default: the whole tree)."""
+        if self.single_file:
+            return [self.root] if self.root.is_file() else []
+        top = top or self.root
+        if top == self.root:
+            return walk_files(top, self.matcher, self.prune_dirs)
+        # Symlinked directories under the root are not walked
+        if top.is_symlink():
+            return []
+        prefix = top.relative_to(self.root).as_posix() + '/'
+        if not self.prune_dirs.isdisjoint(prefix.split('/')):
+            return []
+        return walk_files(top, lambda relative: self.matcher(prefix + relative),
+                          self.prune_dirs)
+
+
+# =============================================================================
+# Change Notification
+# =============================================================================
+
+class PollingWatcher:
+    """Finds changes by listing the tree and comparing each file's size,
+    modification time and inode with the last look."""
+
+    def __init__(self, tree: WatchedTree, interval: float = POLL_INTERVAL):
+        self.tree = tree
+        self.interval = interval
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int, int]]:
+        snapshot = {}
+        for file_path in self.tree.files():
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            snapshot[file_path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        return snapshot
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        """Return the files changed, created or deleted, waiting up to
+        timeout seconds (None: until there is one)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = max(0.0, min(delay, deadline - time.monotonic()))
+            time.sleep(delay)
+            snapshot = self._snapshot()
+            changed = {file_path for file_path in snapshot.keys() | self.snapshot.keys()
+                       if snapshot.get(file_path) != self.snapshot.get(file_path)}
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Finds changes with Linux inotify: one watch per directory, added as
+    directories appear."""
+
+    def __init__(self, tree: WatchedTree):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._get_errno = ctypes.get_errno
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.tree = tree
+        self.directories = {}  # watch descriptor -> directory
+        try:
+            self.add_tree(tree.root.parent if tree.single_file else tree.root, strict=True)
+        except OSError:
+            self.close()
+            raise
+
+    def add_tree(self, top: Path, strict: bool = False):
+        """Watch top and every directory under it that is not pruned. With
+        strict, running out of watches raises OSError; otherwise the
+        directories left over go unwatched."""
+        visited = set()
+        pending = [top]
+        while pending:
+            directory = pending.pop()
+            try:
+                stat = directory.stat()
+            except OSError:
+                continue
+            if (stat.st_dev, stat.st_ino) in visited:
+                continue
+            visited.add((stat.st_dev, stat.st_ino))
+            descriptor = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if descriptor < 0:
+                error = self._get_errno()
+                if strict and error == errno.ENOSPC:
+                    raise OSError(error, 'out of inotify watches')
+                continue
+            self.directories[descriptor] = directory
+            if self.tree.single_file:
+                continue
+            try:
+                with os.scandir(directory) as entries:
+                    pending.extend(Path(entry.path) for entry in entries
+                                   if entry.is_dir(follow_symlinks=False)
+                                   and entry.name not in self.tree.prune_dirs)
+            except OSError:
+                continue
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        """Return the paths of files and directories changed, created or
+        deleted, waiting up to timeout seconds (None: until there is one).
+        The root is returned when events were lost."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = b''
+        while True:
+            try:
+                chunk = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            data += chunk
+        changed = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            descriptor, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length]
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                changed.add(self.tree.root)
+                continue
+            if mask & IN_IGNORED:
+                self.directories.pop(descriptor, None)
+                continue
+            directory = self.directories.get(descriptor)
+            if directory is None:
+                continue
+            name = name.rstrip(b'\0')
+            path = directory / os.fsdecode(name) if name else directory
+            if (mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO)
+                    and not self.tree.single_file and path.name not in self.tree.prune_dirs):
+                self.add_tree(path)
+            changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_watcher(tree: WatchedTree, verbose: bool = False):
+    """An InotifyWatcher where the platform has inotify, else a
+    PollingWatcher."""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(tree)
+        except (OSError, AttributeError) as e:
+            if verbose:
+                print(f"inotify unavailable ({e}); polling every {POLL_INTERVAL:g}s",
+                      file=sys.stderr)
+    return PollingWatcher(tree)
+
+
+def debounced(watcher, debounce: float) -> Iterator[Set[Path]]:
+    """Yield changes in bursts: each burst ends once nothing has changed for
+    debounce seconds."""
+    while True:
+        changed = watcher.wait(None)
+        while changed:
+            more = watcher.wait(debounce)
+            if not more:
+                yield changed
+                break
+            changed |= more
+
+
+# =============================================================================
+# Live Findings
+# =============================================================================
+
+def finding_record(finding) -> dict:
+    """The record a finding's scanner reports for it."""
+    if hasattr(finding, 'to_dict'):
+        return finding.to_dict()
+    from dataclasses import asdict
+    return asdict(finding)
+
+
+class LiveFindings:
+    """The current findings of every watched file, kept up to date file by
+    file."""
+
+    def __init__(self, identity: Tuple[str, ...], id_prefix: str):
+        self.identity = identity  # attributes naming a finding apart from its position
+        self.id_prefix = id_prefix
+        self.by_file: Dict[Path, list] = {}
+        self.number = 0
+
+    def _key(self, finding) -> tuple:
+        return tuple(getattr(finding, name) for name in self.identity)
+
+    def update(self, file_path: Path, findings: Optional[list]) -> Tuple[list, list]:
+        """Replace a file's findings (None: it is gone) and return the
+        findings (new, resolved). A finding that matches one the file
+        already had takes over its ID; the rest are numbered on from the
+        last new one."""
+        previous = {}
+        for finding in self.by_file.pop(file_path, []):
+            previous.setdefault(self._key(finding), []).append(finding)
+        new = []
+        for finding in findings or []:
+            matches = previous.get(self._key(finding))
+            if matches:
+                finding.id = matches.pop(0).id
+            else:
+                self.number += 1
+                finding.id = f"{self.id_prefix}{self.number:04d}"
+                new.append(finding)
+        if findings is not None:
+            self.by_file[file_path] = list(findings)
+        resolved = [finding for matches in previous.values() for finding in matches]
+        return new, resolved
+
+    def files_under(self, path: Path) -> List[Path]:
+        """Watched files at or under path."""
+        if path in self.by_file:
+            return [path]
+        prefix = str(path).rstrip(os.sep) + os.sep
+        return [file_path for file_path in self.by_file if str(file_path).startswith(prefix)]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {'critical': 0, 'high': 0, 'medium': 0, 'low': 0, 'informational': 0}
+        for findings in self.by_file.values():
+            for finding in findings:
+                counts[finding.severity] = counts.get(finding.severity, 0) + 1
+        return counts
+
+    @property
+    def exit_code(self) -> int:
+        """2 if a live finding is critical, 1 if one is high, else 0."""
+        counts = self.counts()
+        return 2 if counts['critical'] else 1 if counts['high'] else 0
+
+
+# =============================================================================
+# Output
+# =============================================================================
+
+def format_changes(new: list, resolved: list, live: LiveFindings, files_changed: int,
+                   fmt: str, kind: str) -> str:
+    """Format one rescan's difference: NDJSON records for json, a list for
+    markdown."""
+    counts = live.counts()
+    summary = {
+        'time': datetime.now().isoformat() + 'Z',
+        'files_changed': files_changed,
+        'new': len(new),
+        'resolved': len(resolved),
+        'open_findings': sum(counts.values()),
+        'by_severity': counts,
+    }
+    if fmt == 'json':
+        records = [{'record': 'new', **finding_record(f)} for f in new]
+        records += [{'record': 'resolved', **finding_record(f)} for f in resolved]
+        records.append({'record': 'summary', **summary})
+        return '\n'.join(json.dumps(record) for record in records)
+    lines = [f"## {summary['time']}: {len(new)} new, {len(resolved)} resolved, "
+             f"{summary['open_findings']} open\n"]
+    for label, findings in (('new', new), ('resolved', resolved)):
+        for f in findings:
+            lines.append(f'- **{label}** {f.severity.upper()} {getattr(f, kind)} '
+                         f'`{f.file}:{f.line}` ({f.id})')
+    return '\n'.join(lines)
+
+
+# =============================================================================
+# Watch Loop
+# =============================================================================
+
+def watch_tree(tree: WatchedTree, scan: Callable[[Path], list], identity: Tuple[str, ...],
+               id_prefix: str, kind: str, fmt: str = 'json',
+               boundaries: Tuple[str, str] = ('', ''), jobs: int = 1,
+               debounce: float = DEFAULT_DEBOUNCE, max_per_file: Optional[int] = None,
+               verbose: bool = False) -> int:
+    """Scan tree, print its findings, then print what changes as files are
+    edited, until interrupted. Returns the exit code for the findings live
+    at that point.
+
+    scan(file) returns one file's findings and must be picklable when jobs
+    is greater than 1. identity names the finding attributes that tell
+    findings apart regardless of position, kind the one shown as a
+    finding's type.
+    """
+    if daemon.serving:
+        # Watching never ends; a daemon's run has to
+        raise daemon.LocalOnly()
+    live = LiveFindings(identity, id_prefix)
+
+    def rescan(files: List[Path], gone: List[Path]) -> Tuple[list, list]:
+        new, resolved = [], []
+        for file_path in gone:
+            resolved.extend(live.update(file_path, None)[1])
+        for file_path, findings in scan_files(scan, files, jobs):
+            if isinstance(findings, TimedOut):
+                # Its findings are unknown; keep the last ones
+                if verbose:
+                    print(f"Warning: {file_path} timed out", file=sys.stderr)
+                continue
+            if max_per_file is not None:
+                findings = findings[:max_per_file]
+            added, removed = live.update(file_path, findings)
+            new.extend(added)
+            resolved.extend(removed)
+        return new, resolved
+
+    def report(new: list, resolved: list, files_changed: int):
+        print(boundaries[0])
+        print(format_changes(new, resolved, live, files_changed, fmt, kind))
+        print(boundaries[1], flush=True)
+
+    watcher = open_watcher(tree, verbose)
+    try:
+        files = tree.files()
+        if verbose:
+            print(f"Watching {len(files)} files...", file=sys.stderr)
+        # The first report lists every finding as new, even when there are none
+        report(*rescan(files, []), len(files))
+        for changed in debounced(watcher, debounce):
+            affected = set()
+            for path in changed:
+                affected.update(live.files_under(path))
+                if path.is_dir():
+                    affected.update(tree.files(path))
+                elif tree.selects(path):
+                    affected.add(path)
+            files = sorted(f for f in affected if f.is_file() and tree.selects(f))
+            gone = sorted(affected.difference(files))
+            new, resolved = rescan(files, gone)
+            if verbose:
+                print(f"Rescanned {len(files)} changed files, {len(gone)} removed",
+                      file=sys.stderr)
+            if new or resolved:
+                report(new, resolved, len(files) + len(gone))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return live.exit_code
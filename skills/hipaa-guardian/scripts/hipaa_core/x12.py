@@ -0,0 +1,179 @@
+"""
+Streaming X12 EDI segment tokenizing.
+
+An X12 interchange opens with a fixed-length ISA segment that declares its
+own delimiters: the character after "ISA" separates elements, ISA-11
+separates repetitions (from version 5010), ISA-16 separates components,
+and the character after ISA-16 ends every segment. Clearinghouse files
+may or may not put a newline after each segment terminator, and one file
+can hold many interchanges. iter_x12_blocks reads a stream in large
+blocks ending on a segment terminator and picks out the segments a scanner
+asks for with one regex search per block, so the claim lines, service
+dates and codes in between are skipped without a Python-level step each.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from hipaa_core.lines import LineIndex
+
+# Characters read per block. Blocks end on a segment terminator.
+BLOCK_CHARS = 4 * 1024 * 1024
+
+# Longest segment held whole; a longer one is cut at this length
+MAX_SEGMENT_CHARS = 64 * 1024 * 1024
+
+# Length of an ISA segment up to and including its terminator
+ISA_LENGTH = 106
+
+
+@dataclass(frozen=True)
+class X12Delimiters:
+    """Separators declared by an ISA segment."""
+    element: str = '*'
+    component: str = ':'
+    repetition: Optional[str] = None  # ISA-11 before 5010 is a code, not a separator
+    segment: str = '~'
+
+    @classmethod
+    @lru_cache(maxsize=64)
+    def from_isa(cls, isa: str) -> Optional['X12Delimiters']:
+        """Read the delimiters from the text of an ISA segment, starting at
+        'ISA' and running at least to its terminator. Returns None if the
+        text is not a complete ISA segment."""
+        if len(isa) < ISA_LENGTH:
+            return None
+        element = isa[3]
+        elements = isa.split(element, 16)
+        if len(elements) < 17 or len(elements[16]) < 2:
+            return None
+        repetition = elements[11]
+        return cls(element, elements[16][0],
+                   repetition if len(repetition) == 1 and not repetition.isalnum() else None,
+                   elements[16][1])
+
+
+@dataclass(slots=True)
+class X12Segment:
+    """One requested segment within a block."""
+    name: str
+    start: int  # offset of the segment ID in the block text
+    end: int    # offset of the segment terminator, or the end of the block
+    delimiters: X12Delimiters
+
+
+@dataclass
+class X12Block:
+    """A run of whole segments."""
+    text: str
+    line_index: LineIndex     # resolves offsets in text to stream line/column
+    segments: List[X12Segment]  # requested segments, and every ISA, in order
+
+
+def element_spans(text: str, segment: X12Segment) -> List[Tuple[int, int]]:
+    """Return (start, end) offsets of each element of segment, indexed by
+    element number. Index 0 is the segment ID."""
+    separator = segment.delimiters.element
+    spans = []
+    start = segment.start
+    while True:
+        end = text.find(separator, start, segment.end)
+        if end == -1:
+            spans.append((start, segment.end))
+            return spans
+        spans.append((start, end))
+        start = end + 1
+
+
+@lru_cache(maxsize=16)
+def _finders(names: Tuple[str, ...], delimiters: X12Delimiters) -> Tuple[re.Pattern, re.Pattern]:
+    # A segment ID, past any line breaks, followed by an element separator.
+    # An ISA may declare a new element separator, so any will do after it.
+    segment, element = re.escape(delimiters.segment), re.escape(delimiters.element)
+    body = rf'[\r\n]*(?:({"|".join(names)})(?={element})|(ISA)(?=[^\w\s]))'
+    # Segments after a terminator are searched for by the terminator, which
+    # the regex engine finds with a fast literal scan; one at the start of
+    # the block is matched on its own
+    return re.compile(body), re.compile(segment + body)
+
+
+def _head_delimiters(text: str) -> Optional[X12Delimiters]:
+    start = len(text) - len(text.lstrip('\ufeff\r\n\t '))
+    if text.startswith('ISA', start):
+        return X12Delimiters.from_isa(text[start:start + ISA_LENGTH])
+    return None
+
+
+def iter_x12_blocks(handle: TextIO, segment_names: Iterable[str],
+                    block_chars: int = BLOCK_CHARS) -> Iterator[X12Block]:
+    """Yield consecutive blocks covering an X12 text stream, each listing
+    its segments named in segment_names and its ISA segments.
+
+    Delimiters are taken from each ISA; a stream that does not start with
+    one is read with the common defaults ('*', ':' and '~').
+    """
+    names = tuple(sorted(set(segment_names) - {'ISA'}))
+    delimiters = None
+    first_line, first_column = 1, 1
+    pending = ''
+    while True:
+        chunk = handle.read(block_chars)
+        text = pending + chunk
+        if not text:
+            return
+        if delimiters is None:
+            if chunk and len(text) < ISA_LENGTH + 16:
+                # Too short yet to hold the whole ISA
+                pending = text
+                continue
+            delimiters = _head_delimiters(text) or X12Delimiters()
+        if chunk:
+            cut = text.rfind(delimiters.segment) + 1
+            if cut == 0:
+                if len(text) < MAX_SEGMENT_CHARS:
+                    pending = text
+                    continue
+                cut = len(text)
+            text, pending = text[:cut], text[cut:]
+        else:
+            pending = ''
+
+        segments = []
+        pos = 0
+        while pos is not None:
+            first, finder = _finders(names, delimiters)
+            resume = None
+            matches = finder.finditer(text, pos)
+            if pos == 0:
+                matches = chain(filter(None, [first.match(text)]), matches)
+            for match in matches:
+                start = match.start(match.lastindex)
+                name = match.group(match.lastindex)
+                changed = False
+                if name == 'ISA':
+                    # A later interchange may change the delimiters, and
+                    # the rest of the block is then searched with its own
+                    declared = X12Delimiters.from_isa(text[start:start + ISA_LENGTH])
+                    changed = declared is not None and declared != delimiters
+                    if changed:
+                        delimiters = declared
+                end = text.find(delimiters.segment, start)
+                if end == -1:
+                    end = len(text)
+                segments.append(X12Segment(name, start, end, delimiters))
+                if changed:
+                    resume = end
+                    break
+            pos = resume
+        yield X12Block(text, LineIndex(text, first_line, first_column), segments)
+        newlines = text.count('\n')
+        if newlines:
+            first_line += newlines
+            first_column = len(text) - text.rfind('\n')
+        else:
+            first_column += len(text)
+        if not chunk:
+            return
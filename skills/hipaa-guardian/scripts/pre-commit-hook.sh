@@ -9,6 +9,7 @@
 #   0 - No PHI found, commit allowed
 #   1 - High severity findings, commit blocked
 #   2 - Critical findings, commit blocked
+#   3 - Files ran out of scan time and were not fully scanned, commit blocked
 #
 
 set -e
@@ -107,6 +108,18 @@ SCAN_DATA=${HIPAA_SCAN_DATA:-true}
 SCAN_CODE=${HIPAA_SCAN_CODE:-true}
 VERBOSE=${HIPAA_VERBOSE:-false}
 
+# Scanners stop at the first finding that would block the commit and report
+# only a verdict, so a blocked commit is answered without a full scan
+if [ "$BLOCK_ON_HIGH" = "true" ]; then
+    FAIL_FAST_ARGS=(--fail-fast=high)
+elif [ "$BLOCK_ON_CRITICAL" = "true" ]; then
+    FAIL_FAST_ARGS=(--fail-fast=critical)
+else
+    FAIL_FAST_ARGS=()
+fi
+BLOCKED=false
+TIMED_OUT=false
+
 echo "HIPAA Guardian Pre-Commit Scan"
 echo "=============================="
 
@@ -168,7 +181,17 @@ run_phi_scan() {
         # silently swallow an actual crash: capture stderr and surface it so a
         # broken scanner can't masquerade as a clean scan and wave PHI through.
         local err_file="$TEMP_DIR/.scan_stderr"
-        output=$(python3 "$script_path" "$TEMP_DIR" --format json 2>"$err_file") || true
+        local status=0
+        output=$(python3 "$script_path" "$TEMP_DIR" --format json "${FAIL_FAST_ARGS[@]}" \
+            2>"$err_file") || status=$?
+        if [ ${#FAIL_FAST_ARGS[@]} -gt 0 ] && { [ $status -eq 1 ] || [ $status -eq 2 ]; }; then
+            BLOCKED=true
+        fi
+        # A file that ran out of CPU time was not fully scanned: a verdict
+        # reports a count (and exit 3), a full report lists the files
+        if [ $status -eq 3 ] || echo "$output" | grep -qE '"files_timed_out": ([1-9]|\[$)'; then
+            TIMED_OUT=true
+        fi
         if [ -s "$err_file" ]; then
             echo -e "${YELLOW}Warning: $scan_type scanner reported errors (results may be incomplete):${NC}" >&2
             cat "$err_file" >&2
@@ -190,8 +213,12 @@ run_phi_scan() {
                 echo "$output" | python3 -c "
 import sys, json
 try:
-    data = json.load(sys.stdin)
-    for f in data.get('findings', [])[:5]:
+    text = sys.stdin.read()
+    text = text.split('--- HIPAA_GUARDIAN_SCAN_BEGIN ---')[-1].split('--- HIPAA_GUARDIAN_SCAN_END ---')[0]
+    data = json.loads(text)
+    # A fail-fast verdict names only the finding that blocked the commit
+    findings = data.get('findings') or [data.get('blocking_finding') or {}]
+    for f in findings[:5]:
         print(f\"  - {f.get('severity', 'unknown').upper()}: {f.get('file', 'unknown')}:{f.get('line', '?')}\")
 except:
     pass
@@ -217,8 +244,8 @@ if [ "$SCAN_DATA" = "true" ]; then
     done
 fi
 
-# Run code scan
-if [ "$SCAN_CODE" = "true" ]; then
+# Run code scan, unless the data scan has already blocked the commit
+if [ "$SCAN_CODE" = "true" ] && [ "$BLOCKED" = "false" ]; then
     for script_loc in \
         "$SCRIPT_DIR/scan-code.py" \
         "$(dirname "$SCRIPT_DIR")/scripts/scan-code.py" \
@@ -252,7 +279,7 @@ fi
 
 TOTAL=$((FINDINGS_CRITICAL + FINDINGS_HIGH + FINDINGS_MEDIUM + FINDINGS_LOW))
 
-if [ $TOTAL -eq 0 ]; then
+if [ $TOTAL -eq 0 ] && [ "$TIMED_OUT" = "false" ]; then
     echo -e "${GREEN}No PHI/PII detected in staged files${NC}"
     exit 0
 fi
@@ -279,6 +306,22 @@ if [ "$BLOCK_ON_HIGH" = "true" ] && [ $FINDINGS_HIGH -gt 0 ]; then
     exit 1
 fi
 
+if [ "$TIMED_OUT" = "true" ]; then
+    echo ""
+    if [ "$BLOCK_ON_HIGH" = "true" ] || [ "$BLOCK_ON_CRITICAL" = "true" ]; then
+        echo -e "${RED}COMMIT BLOCKED: Staged files ran out of scan time and were not fully scanned${NC}"
+        echo ""
+        echo "To scan them without a time limit:"
+        echo "  python3 scripts/scan-all.py <path> --file-timeout 0 --format markdown"
+        echo ""
+        echo "To bypass this check once they have been reviewed:"
+        echo "  git commit --no-verify"
+        exit 3
+    fi
+    echo -e "${YELLOW}Staged files ran out of scan time and were not fully scanned${NC}"
+    [ $TOTAL -eq 0 ] && exit 0
+fi
+
 # Warnings only
 echo ""
 echo -e "${YELLOW}PHI/PII findings detected but commit allowed${NC}"
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+HIPAA Guardian - Combined Scanning Script
+
+Runs PHI detection and the code, logging, authentication and API response
+scans in a single pass. The tree is walked once and each file is read and
+decoded once; its text and line index are shared by every scanner that
+applies to it. Findings are merged into one report, in path order, with
+one exit code.
+
+Usage:
+    python scan-all.py <path> [options]
+
+Options:
+    --output, -o     Output file path
+    --format, -f     Output format: json, markdown (default: json)
+    --scanners       Scanners to run, separated by commas (default: all)
+    --verbose, -v    Verbose output
+"""
+
+if __name__ == '__main__':
+    # Hand the run to hipaa-guardiand if it is running, before paying for
+    # the imports below; it returns, and the script runs itself, if not
+    from hipaa_core.daemon import run_in_daemon
+    run_in_daemon('scan-all')
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Dict, List
+
+from hipaa_core import (Analyzer, FailFastGate, SourceFile, TimedOut, add_fail_fast_argument,
+                        add_file_timeout_argument, load_scanner, scan_files,
+                        scan_source_file, scan_within_budget, split_excludes, walk_sources)
+
+# Boundary markers for untrusted input processing
+BOUNDARY_BEGIN = "--- HIPAA_GUARDIAN_SCAN_BEGIN ---"
+BOUNDARY_END = "--- HIPAA_GUARDIAN_SCAN_END ---"
+
+
+# =============================================================================
+# Scanners
+# =============================================================================
+
+def scan_phi(verbose: bool, source: SourceFile) -> list:
+    detect_phi = load_scanner('detect-phi')
+    return detect_phi.scan_counted(partial(detect_phi.scan_source, source, verbose))
+
+
+def scan_code(source: SourceFile) -> list:
+    scanner = load_scanner('scan-code')
+    findings = scanner.scan_content_for_code_phi(source.path, source.text, source.line_index)
+    return findings[:scanner.MAX_FINDINGS_PER_FILE]
+
+
+def scan_logs(source: SourceFile) -> list:
+    findings, _ = load_scanner('scan-logs').scan_content_for_log_phi(
+        source.path, source.text, source.line_index)
+    return findings
+
+
+def scan_auth(source: SourceFile) -> list:
+    return load_scanner('scan-auth').scan_content_for_auth(
+        source.path, source.text, source.line_index)
+
+
+def scan_responses(source: SourceFile) -> list:
+    findings, _ = load_scanner('scan-response').scan_content_for_response_phi(
+        source.path, source.text, source.line_index)
+    return findings
+
+
+# Scanners in the order their findings are merged within a file: finding ID
+# prefix and the attribute naming what each finding is
+SCANNERS = {
+    'detect-phi': ('F', 'identifier_type'),
+    'scan-code': ('CF', 'pattern_name'),
+    'scan-logs': ('LOG', 'phi_type'),
+    'scan-auth': ('AUTH', 'issue_type'),
+    'scan-response': ('RESP', 'response_type'),
+}
+
+
+def build_analyzers(names: List[str], verbose: bool, file_timeout: float = 0) -> List[Analyzer]:
+    """Return the pipeline analyzers for the named scanners, each scanning
+    the files its own script would.
+
+    The code scanners each get file_timeout seconds of CPU time per file
+    (0 = no limit), as their own scripts do, and a scan that runs out gives
+    a TimedOut; detect-phi streams large files and runs unlimited, as
+    detect-phi.py does.
+    """
+    analyzers = []
+    for name in SCANNERS:
+        if name not in names:
+            continue
+        module = load_scanner(name)
+        if name == 'detect-phi':
+            skip_dirs, _ = split_excludes(module.DEFAULT_EXCLUDE)
+            # It streams archives and files too large to read whole itself
+            analyzers.append(Analyzer(name, tuple(module.DEFAULT_INCLUDE), frozenset(skip_dirs),
+                                      partial(scan_phi, verbose), reads_files=True))
+            continue
+        scan = {'scan-code': scan_code, 'scan-logs': scan_logs, 'scan-auth': scan_auth,
+                'scan-response': scan_responses}[name]
+        analyzers.append(Analyzer(name, tuple(f'**/*{ext}' for ext in module.SOURCE_EXTENSIONS),
+                                  module.SKIP_DIRS, partial(scan_within_budget, scan, file_timeout)))
+    return analyzers
+
+
+def timed_out_scanners(outcome: Dict[str, list]) -> List[str]:
+    """Names of the scanners that ran out of CPU time on one file."""
+    return [name for name, found in outcome.items() if isinstance(found, TimedOut)]
+
+
+def parse_scanners(value: str) -> List[str]:
+    """Parse the --scanners value: names separated by commas."""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCANNERS]
+    if unknown or not names:
+        raise argparse.ArgumentTypeError(
+            f"unknown scanner {', '.join(unknown) or value!r} "
+            f"(choose from {', '.join(SCANNERS)})")
+    return names
+
+
+# =============================================================================
+# Data Classes
+# =============================================================================
+
+@dataclass
+class CombinedScanResult:
+    """Container for combined scan results."""
+    findings: List[tuple] = field(default_factory=list)  # (scanner, finding)
+    scanners: List[str] = field(default_factory=list)
+    files_scanned: int = 0
+    timed_out: List[str] = field(default_factory=list)
+    archives_incomplete: List[str] = field(default_factory=list)  # by detect-phi
+    scan_timestamp: str = ''
+    scan_duration: float = 0.0
+    security_controls: Dict = field(default_factory=dict)
+
+    numbers: Dict[str, int] = field(default_factory=dict, repr=False)  # findings per scanner
+
+    def add_finding(self, scanner: str, finding):
+        self.findings.append((scanner, finding))
+
+    def add_file(self, name: str, outcome: Dict[str, list], date: str):
+        """Add the findings of the file reported as name, {scanner:
+        findings}. Findings are numbered per scanner, with its own ID
+        prefix, and each scanner stops taking files at its own total
+        limit."""
+        if getattr(outcome.get('detect-phi'), 'archive_incomplete', False):
+            self.archives_incomplete.append(name)
+        for name, found in outcome.items():
+            number = self.numbers.get(name, 0)
+            limit = getattr(load_scanner(name), 'MAX_TOTAL_FINDINGS', None)
+            if limit is not None and number >= limit:
+                continue
+            prefix = SCANNERS[name][0]
+            for f in found:
+                # Number findings in path order so IDs match across runs and --jobs
+                number += 1
+                f.id = f"{prefix}-{date}-{number:04d}"
+                self.add_finding(name, f)
+            self.numbers[name] = number
+
+    @property
+    def exit_code(self) -> int:
+        """2 if any finding is critical, 1 if any is high, else 0."""
+        if any(f.severity == 'critical' for _, f in self.findings):
+            return 2
+        if any(f.severity == 'high' for _, f in self.findings):
+            return 1
+        return 0
+
+    def to_dict(self) -> dict:
+        return {
+            'findings': [{'scanner': scanner, **finding_dict(f)}
+                         for scanner, f in self.findings],
+            'summary': {
+                'scan_timestamp': self.scan_timestamp,
+                'scan_duration_seconds': self.scan_duration,
+                'scanners': self.scanners,
+                'files_scanned': self.files_scanned,
+                'files_timed_out': self.timed_out,
+                'archives_incomplete': self.archives_incomplete,
+                'total_findings': len(self.findings),
+                'by_severity': self._count_by_severity(),
+                'by_scanner': self._count_by_scanner(),
+            },
+            'security_controls': self.security_controls,
+        }
+
+    def _count_by_severity(self) -> Dict:
+        counts = {'critical': 0, 'high': 0, 'medium': 0, 'low': 0, 'informational': 0}
+        for _, f in self.findings:
+            counts[f.severity] = counts.get(f.severity, 0) + 1
+        return counts
+
+    def _count_by_scanner(self) -> Dict:
+        counts = {name: 0 for name in self.scanners}
+        for scanner, _ in self.findings:
+            counts[scanner] += 1
+        return counts
+
+
+def finding_dict(finding) -> dict:
+    """The record a finding's own scanner reports for it."""
+    return finding.to_dict() if hasattr(finding, 'to_dict') else asdict(finding)
+
+
+# =============================================================================
+# Output Functions
+# =============================================================================
+
+def output_json(result: CombinedScanResult) -> str:
+    """Format results as JSON."""
+    return json.dumps(result.to_dict(), indent=2)
+
+
+def output_markdown(result: CombinedScanResult) -> str:
+    """Format results as Markdown."""
+    summary = result.to_dict()['summary']
+    lines = [
+        '# Combined Scan Results\n',
+        f'**Scan Time:** {result.scan_timestamp}',
+        f'**Scanners:** {", ".join(result.scanners)}',
+        f'**Files Scanned:** {result.files_scanned}',
+        f'**Timed Out:** {len(result.timed_out)}',
+        f'**Archives Not Read in Full:** {len(result.archives_incomplete)}',
+        f'**Total Findings:** {len(result.findings)}\n',
+        '## Summary\n',
+        '| Scanner | Findings |',
+        '|---------|----------|',
+    ]
+    for scanner, count in summary['by_scanner'].items():
+        lines.append(f'| {scanner} | {count} |')
+
+    lines.extend(['', '| Severity | Count |', '|----------|-------|'])
+    for sev, count in summary['by_severity'].items():
+        if count > 0:
+            lines.append(f'| {sev.capitalize()} | {count} |')
+
+    lines.extend([
+        '\n## Findings\n',
+        '| ID | Severity | Scanner | Type | Location |',
+        '|----|----------|---------|------|----------|',
+    ])
+    for scanner, f in result.findings:
+        kind = getattr(f, SCANNERS[scanner][1])
+        lines.append(f'| {f.id} | {f.severity.upper()} | {scanner} | {kind} | '
+                     f'`{f.file}:{f.line}` |')
+
+    return '\n'.join(lines)
+
+
+# =============================================================================
+# Main
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run every HIPAA Guardian scanner in one pass over a tree')
+    parser.add_argument('path', help='File or directory to scan')
+    parser.add_argument('--output', '-o', help='Output file path')
+    parser.add_argument('--format', '-f', choices=['json', 'markdown'],
+                        default='json', help='Output format')
+    parser.add_argument('--scanners', type=parse_scanners, default=list(SCANNERS),
+                        metavar='NAMES',
+                        help=f'Scanners to run, separated by commas (default: {",".join(SCANNERS)})')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Worker processes (0 = one per available CPU)')
+    add_fail_fast_argument(parser)
+    add_file_timeout_argument(parser)
+
+    args = parser.parse_args()
+
+    # Initialize
+    start_time = datetime.now()
+    detect_phi = load_scanner('detect-phi')
+    result = CombinedScanResult(scanners=[name for name in SCANNERS if name in args.scanners])
+    result.scan_timestamp = start_time.isoformat() + 'Z'
+
+    # Sanitize and validate input path
+    path = Path(detect_phi.sanitize_path(args.path))
+    if not path.exists():
+        print(f"Error: Path does not exist: {path}", file=sys.stderr)
+        sys.exit(1)
+
+    # One walk for every scanner
+    analyzers = build_analyzers(result.scanners, args.verbose, args.file_timeout)
+    files = walk_sources(path, analyzers)
+    result.files_scanned = len(files)
+
+    if args.verbose:
+        print(f"Scanning {len(files)} files with {', '.join(result.scanners)}...",
+              file=sys.stderr)
+
+    date = start_time.strftime('%Y%m%d')
+
+    # A gate takes results as they come in, and stopping early cancels the rest
+    gate = FailFastGate(args.fail_fast) if args.fail_fast else None
+    scan = partial(scan_source_file, analyzers, path)
+    outcomes = scan_files(scan, files, args.jobs, ordered=gate is None)
+    for file_path, outcome in outcomes:
+        # The other scanners' findings for the file are still reported
+        timed_out = timed_out_scanners(outcome)
+        if timed_out:
+            result.timed_out.append(detect_phi.sanitize_output_string(str(file_path)))
+            if args.verbose:
+                print(f"Warning: {result.timed_out[-1]} timed out in {', '.join(timed_out)} "
+                      f"after {args.file_timeout:g}s of CPU time", file=sys.stderr)
+        if gate is not None:
+            if gate.check([f for found in outcome.values() for f in found],
+                          timed_out=bool(timed_out)):
+                break
+            continue
+        result.add_file(detect_phi.sanitize_output_string(str(file_path)), outcome, date)
+    outcomes.close()
+
+    if gate is not None:
+        if args.output:
+            Path(args.output).write_text(gate.to_json())
+        else:
+            print(BOUNDARY_BEGIN)
+            print(gate.to_json())
+            print(BOUNDARY_END)
+        sys.exit(gate.exit_code)
+
+    # Check security controls
+    if 'scan-code' in result.scanners:
+        result.security_controls = load_scanner('scan-code').check_security_controls(path)
+
+    # Calculate duration
+    result.scan_duration = (datetime.now() - start_time).total_seconds()
+
+    # Format output
+    if args.format == 'json':
+        output = output_json(result)
+    else:
+        output = output_markdown(result)
+
+    # Write output with boundary markers so downstream consumers (including
+    # LLMs) can distinguish tool output from ingested file content
+    if args.output:
+        Path(args.output).write_text(output)
+        if args.verbose:
+            print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(BOUNDARY_BEGIN)
+        print(output)
+        print(BOUNDARY_END)
+
+    # Exit code based on findings
+    sys.exit(result.exit_code)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,15 +13,26 @@ Options:
     --verbose, -v    Verbose output
 """
 
+if __name__ == '__main__':
+    # Hand the run to hipaa-guardiand if it is running, before paying for
+    # the imports below; it returns, and the script runs itself, if not
+    from hipaa_core.daemon import run_in_daemon
+    run_in_daemon('scan-auth')
+
 import argparse
 import json
 import re
 import sys
 from dataclasses import dataclass, field, asdict
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 
+from hipaa_core import (FailFastGate, GlobMatcher, LineIndex, TimedOut,
+                        add_fail_fast_argument, add_file_timeout_argument, scan_files,
+                        scan_within_budget, walk_files)
+
 
 # =============================================================================
 # Framework Detection Patterns
@@ -235,6 +246,7 @@ class AuthScanResult:
     """Container for authentication scan results."""
     findings: List[AuthFinding] = field(default_factory=list)
     files_scanned: int = 0
+    timed_out: List[str] = field(default_factory=list)
     routes_analyzed: int = 0
     scan_timestamp: str = ''
     scan_duration: float = 0.0
@@ -249,6 +261,7 @@ class AuthScanResult:
                 'scan_timestamp': self.scan_timestamp,
                 'scan_duration_seconds': self.scan_duration,
                 'files_scanned': self.files_scanned,
+                'files_timed_out': self.timed_out,
                 'routes_analyzed': self.routes_analyzed,
                 'total_findings': len(self.findings),
                 'by_severity': self._count_by_severity(),
@@ -375,14 +388,22 @@ def calculate_risk(issue_type: str, phi_keywords: List[str], is_public_route: bo
     return score, severity
 
 
-def scan_file_for_auth(file_path: Path, finding_counter: List[int]) -> List[AuthFinding]:
+def scan_file_for_auth(file_path: Path) -> List[AuthFinding]:
     """Scan a file for authentication vulnerabilities."""
-    findings = []
-
     try:
         content = file_path.read_text(encoding='utf-8', errors='ignore')
-    except Exception:
-        return findings
+    except (OSError, UnicodeError):
+        return []
+
+    return scan_content_for_auth(file_path, content, LineIndex(content))
+
+
+def scan_content_for_auth(file_path: Path, content: str,
+                          line_index: LineIndex) -> List[AuthFinding]:
+    """Scan the text of a file for authentication vulnerabilities, with
+    line_index built over it. Used directly by scan-all, which reads each
+    file once for every scanner."""
+    findings = []
 
     framework = detect_framework(file_path, content)
     if not framework:
@@ -403,8 +424,8 @@ def scan_file_for_auth(file_path: Path, finding_counter: List[int]) -> List[Auth
         if not phi_keywords:
             continue
 
-        # Find line number
-        line_num = content[:match.start()].count('\n')
+        # Find line number (0-based, to index into lines)
+        line_num = line_index.line_of(match.start()) - 1
 
         # Check for auth decorators
         has_auth, has_role = has_auth_decorator(content, line_num, framework, lines)
@@ -417,12 +438,11 @@ def scan_file_for_auth(file_path: Path, finding_counter: List[int]) -> List[Auth
             issue_type = 'no_role_check'
 
         if issue_type:
-            finding_counter[0] += 1
             is_public = ':' not in route and '<' not in route and '{' not in route
             risk_score, severity = calculate_risk(issue_type, phi_keywords, is_public)
 
             finding = AuthFinding(
-                id=f"AUTH-{datetime.now().strftime('%Y%m%d')}-{finding_counter[0]:04d}",
+                id='',
                 timestamp=datetime.now().isoformat() + 'Z',
                 file=str(file_path),
                 line=line_num + 1,
@@ -440,25 +460,21 @@ def scan_file_for_auth(file_path: Path, finding_counter: List[int]) -> List[Auth
     return findings
 
 
-def get_source_files(path: Path) -> List[Path]:
-    """Get all source files to scan."""
-    files = []
+# All extensions we care about
+SOURCE_EXTENSIONS = sorted({ext for config in FRAMEWORK_PATTERNS.values()
+                            for ext in config['extensions']})
 
-    all_extensions = set()
-    for config in FRAMEWORK_PATTERNS.values():
-        all_extensions.update(config['extensions'])
+# Directories to skip
+SKIP_DIRS = frozenset({'node_modules', '.git', 'venv', '__pycache__', 'vendor', 'dist', 'build'})
 
-    skip_dirs = {'node_modules', '.git', 'venv', '__pycache__', 'vendor', 'dist', 'build'}
 
+def get_source_files(path: Path) -> List[Path]:
+    """Get all source files to scan."""
     if path.is_file():
-        return [path] if path.suffix in all_extensions else []
+        return [path] if path.suffix in SOURCE_EXTENSIONS else []
 
-    for ext in all_extensions:
-        for file_path in path.glob(f'**/*{ext}'):
-            if not any(skip in file_path.parts for skip in skip_dirs):
-                files.append(file_path)
-
-    return files
+    # One walk for all extensions; skipped directories are never entered
+    return walk_files(path, GlobMatcher(f'**/*{ext}' for ext in SOURCE_EXTENSIONS), SKIP_DIRS)
 
 
 # =============================================================================
@@ -476,6 +492,7 @@ def output_markdown(result: AuthScanResult) -> str:
         '# Authentication Gate Scan Results\n',
         f'**Scan Time:** {result.scan_timestamp}',
         f'**Files Scanned:** {result.files_scanned}',
+        f'**Timed Out:** {len(result.timed_out)}',
         f'**Routes Analyzed:** {result.routes_analyzed}',
         f'**Findings:** {len(result.findings)}\n',
         '## Summary by Severity\n',
@@ -523,6 +540,10 @@ def main():
     parser.add_argument('--output', '-o', help='Output file path')
     parser.add_argument('--format', '-f', choices=['json', 'markdown'], default='markdown')
     parser.add_argument('--verbose', '-v', action='store_true')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Worker processes (0 = one per available CPU)')
+    add_fail_fast_argument(parser)
+    add_file_timeout_argument(parser)
 
     args = parser.parse_args()
 
@@ -530,7 +551,7 @@ def main():
     path = Path(args.path)
     result = AuthScanResult()
     result.scan_timestamp = start_time.isoformat() + 'Z'
-    finding_counter = [0]
+    finding_number = 0
     routes_count = 0
 
     if not path.exists():
@@ -543,11 +564,34 @@ def main():
     if args.verbose:
         print(f"Scanning {len(files)} source files...", file=sys.stderr)
 
-    for file_path in files:
-        findings = scan_file_for_auth(file_path, finding_counter)
+    # A gate takes results as they come in, and stopping early cancels the rest
+    gate = FailFastGate(args.fail_fast) if args.fail_fast else None
+    scan = partial(scan_within_budget, scan_file_for_auth, args.file_timeout)
+    outcomes = scan_files(scan, files, args.jobs, ordered=gate is None)
+    for file_path, findings in outcomes:
+        if isinstance(findings, TimedOut):
+            result.timed_out.append(str(file_path))
+            if args.verbose:
+                print(f"Warning: {file_path} timed out after "
+                      f"{args.file_timeout:g}s of CPU time", file=sys.stderr)
+        if gate is not None:
+            if gate.check(findings):
+                break
+            continue
         routes_count += len(findings)
         for f in findings:
+            # Number findings in path order so IDs match across runs and --jobs
+            finding_number += 1
+            f.id = f"AUTH-{start_time.strftime('%Y%m%d')}-{finding_number:04d}"
             result.add_finding(f)
+    outcomes.close()
+
+    if gate is not None:
+        if args.output:
+            Path(args.output).write_text(gate.to_json())
+        else:
+            print(gate.to_json())
+        sys.exit(gate.exit_code)
 
     result.routes_analyzed = routes_count
     result.scan_duration = (datetime.now() - start_time).total_seconds()
@@ -16,8 +16,15 @@ Options:
     --output, -o     Output file path
     --format, -f     Output format: json, markdown (default: json)
     --verbose, -v    Verbose output
+    --watch          Rescan files as they change and print new/resolved findings
 """
 
+if __name__ == '__main__':
+    # Hand the run to hipaa-guardiand if it is running, before paying for
+    # the imports below; it returns, and the script runs itself, if not
+    from hipaa_core.daemon import run_in_daemon
+    run_in_daemon('scan-code')
+
 import argparse
 import hashlib
 import json
@@ -27,7 +34,14 @@ import sys
 from dataclasses import dataclass, field, asdict
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, Iterator, List, Dict, Tuple
+
+from functools import partial
+
+from hipaa_core import (DEFAULT_CACHE_DIR, FailFastGate, GlobMatcher, LineIndex, ScanCache,
+                        TimedOut, WatchedTree, add_fail_fast_argument, add_file_timeout_argument,
+                        add_watch_argument, ruleset_fingerprint, scan_files, scan_within_budget,
+                        walk_files, watch_tree)
 
 
 # =============================================================================
@@ -81,6 +95,14 @@ def is_safe_file(file_path: Path) -> bool:
         return False
 
 
+def is_oversized(file_path: Path) -> bool:
+    """Return True if file_path is skipped for exceeding MAX_FILE_SIZE_BYTES."""
+    try:
+        return file_path.stat().st_size > MAX_FILE_SIZE_BYTES
+    except OSError:
+        return False
+
+
 # =============================================================================
 # Code-Specific Detection Patterns
 # =============================================================================
@@ -93,38 +115,121 @@ PHI_PATTERNS = {
     'date': r'\b(0?[1-9]|1[0-2])[-/](0?[1-9]|[12]\d|3[01])[-/](19|20)\d{2}\b',
 }
 
+# Flags the code patterns are matched with
+PATTERN_FLAGS = re.IGNORECASE | re.MULTILINE
+
+SSN_PATTERN = re.compile(PHI_PATTERNS['ssn'])
+QUOTE_PATTERN = re.compile(r'["\']')
+
+
+@dataclass(frozen=True)
+class EnclosedSSN:
+    """An SSN between an opening and the next close after it, such as a
+    docstring or block comment holding one.
+
+    Finds what re.finditer(opening + r'[\s\S]*?SSN[\s\S]*?' + close) would,
+    but by locating each part in turn, so it takes linear time where the
+    regex backtracks over the rest of the file for each opening with no SSN
+    or close after it.
+    """
+    opening: str  # regex
+    close: str    # literal
+
+    def spans(self, content: str) -> Iterator[Tuple[int, int]]:
+        opening = re.compile(self.opening, PATTERN_FLAGS)
+        pos = 0
+        while True:
+            start = opening.search(content, pos)
+            if start is None:
+                return
+            # The first SSN and close after an opening are the first after
+            # any later one, so when either is missing nothing else matches
+            ssn = SSN_PATTERN.search(content, start.end())
+            if ssn is None:
+                return
+            end = content.find(self.close, ssn.end())
+            if end == -1:
+                return
+            pos = end + len(self.close)
+            yield start.start(), pos
+
+
+@dataclass(frozen=True)
+class QuotedSSN:
+    """An SSN between two quotes on one line.
+
+    Finds what re.finditer(r'["\'].*SSN.*["\']') would: from the first
+    quote to the last one on the line, if an SSN ends before it. The regex
+    backtracks over the rest of the line from every quote; this looks at
+    each line once.
+    """
+
+    def spans(self, content: str) -> Iterator[Tuple[int, int]]:
+        pos = 0
+        ssn = None
+        while True:
+            quote = QUOTE_PATTERN.search(content, pos)
+            if quote is None:
+                return
+            start = quote.start()
+            if ssn is None or ssn.start() <= start:
+                ssn = SSN_PATTERN.search(content, start + 1)
+                if ssn is None:
+                    return
+            line_end = content.find('\n', start)
+            if line_end == -1:
+                line_end = len(content)
+            last = max(content.rfind('"', start, line_end), content.rfind("'", start, line_end))
+            if ssn.end() <= last:
+                pos = last + 1
+                yield start, pos
+            else:
+                # A later quote on the line has no SSN after it either
+                pos = line_end
+
+
+def pattern_spans(pattern, content: str) -> Iterator[Tuple[int, int]]:
+    """Yield the (start, end) of each match of a code pattern, a regex or
+    one of the span matchers above."""
+    if isinstance(pattern, str):
+        for match in re.finditer(pattern, content, PATTERN_FLAGS):
+            yield match.span()
+    else:
+        yield from pattern.spans(content)
+
+
 # Language-specific patterns
 CODE_PATTERNS = {
     'python': {
         'extensions': ['.py'],
         'string_patterns': [
             # SSN in string
-            (r'["\'].*\b\d{3}-\d{2}-\d{4}\b.*["\']', 'ssn_in_string'),
+            (QuotedSSN(), 'ssn_in_string'),
             # PHI variable assignment
             (r'(ssn|social_security|patient_id|mrn|dob|date_of_birth)\s*=\s*["\'][^"\']+["\']', 'phi_assignment'),
         ],
         'comment_patterns': [
             (r'#.*\b\d{3}-\d{2}-\d{4}\b', 'ssn_in_comment'),
             (r'#.*(patient|ssn|mrn|dob).*\b\d', 'phi_in_comment'),
-            (r'"""[\s\S]*?\b\d{3}-\d{2}-\d{4}\b[\s\S]*?"""', 'ssn_in_docstring'),
+            (EnclosedSSN('"""', '"""'), 'ssn_in_docstring'),
         ],
         'fixture_patterns': [
-            (r'(test_data|fixture|mock|sample)\s*=\s*\{[\s\S]*?\b\d{3}-\d{2}-\d{4}\b[\s\S]*?\}', 'phi_in_fixture'),
+            (EnclosedSSN(r'(test_data|fixture|mock|sample)\s*=\s*\{', '}'), 'phi_in_fixture'),
         ],
     },
     'javascript': {
         'extensions': ['.js', '.jsx', '.ts', '.tsx'],
         'string_patterns': [
-            (r'["\'].*\b\d{3}-\d{2}-\d{4}\b.*["\']', 'ssn_in_string'),
+            (QuotedSSN(), 'ssn_in_string'),
             (r'(const|let|var)\s+(ssn|patientId|mrn)\s*=\s*["\'][^"\']+["\']', 'phi_declaration'),
             (r'(ssn|patientId|mrn|dateOfBirth)\s*:\s*["\'][^"\']+["\']', 'phi_property'),
         ],
         'comment_patterns': [
             (r'//.*\b\d{3}-\d{2}-\d{4}\b', 'ssn_in_comment'),
-            (r'/\*[\s\S]*?\b\d{3}-\d{2}-\d{4}\b[\s\S]*?\*/', 'ssn_in_block_comment'),
+            (EnclosedSSN(r'/\*', '*/'), 'ssn_in_block_comment'),
         ],
         'fixture_patterns': [
-            (r'(testData|fixture|mock)\s*=\s*\{[\s\S]*?\b\d{3}-\d{2}-\d{4}\b[\s\S]*?\}', 'phi_in_fixture'),
+            (EnclosedSSN(r'(testData|fixture|mock)\s*=\s*\{', '}'), 'phi_in_fixture'),
         ],
     },
     'sql': {
@@ -135,7 +240,7 @@ CODE_PATTERNS = {
         ],
         'comment_patterns': [
             (r'--.*\b\d{3}-\d{2}-\d{4}\b', 'ssn_in_comment'),
-            (r'/\*[\s\S]*?\b\d{3}-\d{2}-\d{4}\b[\s\S]*?\*/', 'ssn_in_block_comment'),
+            (EnclosedSSN(r'/\*', '*/'), 'ssn_in_block_comment'),
         ],
         'fixture_patterns': [],
     },
@@ -241,6 +346,11 @@ class CodeScanResult:
     """Container for code scan results."""
     findings: List[CodeFinding] = field(default_factory=list)
     files_scanned: int = 0
+    skipped_for_size: List[str] = field(default_factory=list)
+    timed_out: List[str] = field(default_factory=list)
+    cache_enabled: bool = False
+    cache_hits: int = 0
+    cache_misses: int = 0
     scan_timestamp: str = ''
     scan_duration: float = 0.0
     security_controls: Dict = field(default_factory=dict)
@@ -255,6 +365,13 @@ class CodeScanResult:
                 'scan_timestamp': self.scan_timestamp,
                 'scan_duration_seconds': self.scan_duration,
                 'files_scanned': self.files_scanned,
+                'files_skipped_for_size': self.skipped_for_size,
+                'files_timed_out': self.timed_out,
+                'cache': {
+                    'enabled': self.cache_enabled,
+                    'hits': self.cache_hits,
+                    'misses': self.cache_misses,
+                },
                 'total_findings': len(self.findings),
                 'by_severity': self._count_by_severity(),
                 'by_type': self._count_by_type(),
@@ -306,16 +423,13 @@ def redact_context(context: str) -> str:
     return sanitize_output_string(context)
 
 
-def get_line_context(content: str, match_start: int, max_length: int = 100) -> tuple:
+def get_line_context(content: str, line_index: LineIndex, match_start: int,
+                     max_length: int = 100) -> tuple:
     """Get line number and context for a match."""
-    lines_before = content[:match_start].count('\n')
-    line_num = lines_before + 1
+    line_num = line_index.line_of(match_start)
 
     # Get the line containing the match
-    line_start = content.rfind('\n', 0, match_start) + 1
-    line_end = content.find('\n', match_start)
-    if line_end == -1:
-        line_end = len(content)
+    line_start, line_end = line_index.line_span(match_start)
 
     line_content = content[line_start:line_end]
     column = match_start - line_start + 1
@@ -386,25 +500,39 @@ def calculate_risk(finding_type: str, language: str, pattern_name: str) -> int:
     return base
 
 
-def scan_file_for_code_phi(file_path: Path, finding_counter: List[int]) -> List[CodeFinding]:
+def scan_file_for_code_phi(file_path: Path) -> List[CodeFinding]:
     """Scan a source code file for PHI.
 
+    Findings are returned without an id; main() numbers them once every
+    file's results have been merged in path order.
+
     Includes input validation and size checks to guard against adversarial
     or oversized inputs (Indirect Prompt Injection mitigation).
     """
-    findings = []
-    language = get_language(str(file_path))
-
-    if language == 'unknown':
-        return findings
+    if get_language(str(file_path)) == 'unknown':
+        return []
 
     # Validate file safety before reading
     if not is_safe_file(file_path):
-        return findings
+        return []
 
     try:
         content = file_path.read_text(encoding='utf-8', errors='ignore')
     except (OSError, UnicodeDecodeError, ValueError):
+        return []
+
+    return scan_content_for_code_phi(file_path, content, LineIndex(content))
+
+
+def scan_content_for_code_phi(file_path: Path, content: str,
+                              line_index: LineIndex) -> List[CodeFinding]:
+    """Scan the text of a source code file for PHI, with line_index built
+    over it. Used directly by scan-all, which reads each file once for
+    every scanner."""
+    findings = []
+    language = get_language(str(file_path))
+
+    if language == 'unknown':
         return findings
 
     config = CODE_PATTERNS.get(language, {})
@@ -419,11 +547,10 @@ def scan_file_for_code_phi(file_path: Path, finding_counter: List[int]) -> List[
     ]
     for config_key, finding_type in pattern_buckets:
         for pattern, pattern_name in config.get(config_key, []):
-            for match in re.finditer(pattern, content, re.IGNORECASE | re.MULTILINE):
-                line_num, column, context = get_line_context(content, match.start())
-                finding_counter[0] += 1
+            for start, end in pattern_spans(pattern, content):
+                line_num, column, context = get_line_context(content, line_index, start)
                 findings.append(CodeFinding(
-                    id=f"CF-{datetime.now().strftime('%Y%m%d')}-{finding_counter[0]:04d}",
+                    id='',
                     timestamp=datetime.now().isoformat() + 'Z',
                     file=str(file_path),
                     line=line_num,
@@ -431,7 +558,7 @@ def scan_file_for_code_phi(file_path: Path, finding_counter: List[int]) -> List[
                     finding_type=finding_type,
                     pattern_name=pattern_name,
                     language=language,
-                    value_hash=hash_value(match.group()),
+                    value_hash=hash_value(content[start:end]),
                     context=context,
                     risk_score=calculate_risk(finding_type, language, pattern_name),
                     is_test_file=is_test,
@@ -477,27 +604,24 @@ def check_security_controls(path: Path) -> Dict:
     return controls
 
 
-def get_code_files(path: Path) -> List[Path]:
-    """Get all source code files to scan."""
-    files = []
+# All extensions we care about
+SOURCE_EXTENSIONS = sorted({ext for config in CODE_PATTERNS.values()
+                            for ext in config['extensions']})
+
+# Directories to skip
+SKIP_DIRS = frozenset({'node_modules', '.git', 'venv', '__pycache__', 'vendor', '.idea',
+                       'dist', 'build'})
 
-    # Get all extensions we care about
-    all_extensions = set()
-    for config in CODE_PATTERNS.values():
-        all_extensions.update(config['extensions'])
 
-    # Directories to skip
-    skip_dirs = {'node_modules', '.git', 'venv', '__pycache__', 'vendor', '.idea', 'dist', 'build'}
+def code_file_matcher() -> GlobMatcher:
+    """Matcher for the root-relative paths of source code files."""
+    return GlobMatcher(f'**/*{ext}' for ext in SOURCE_EXTENSIONS)
 
-    for ext in all_extensions:
-        pattern = f'**/*{ext}'
-        for file_path in path.glob(pattern):
-            # Skip excluded directories
-            if any(skip in file_path.parts for skip in skip_dirs):
-                continue
-            files.append(file_path)
 
-    return files
+def get_code_files(path: Path) -> List[Path]:
+    """Get all source code files to scan."""
+    # One walk for all extensions; skipped directories are never entered
+    return walk_files(path, code_file_matcher(), SKIP_DIRS)
 
 
 # =============================================================================
@@ -515,6 +639,9 @@ def output_markdown(result: CodeScanResult) -> str:
         '# Code Scanning Results\n',
         f'**Scan Time:** {result.scan_timestamp}',
         f'**Files Scanned:** {result.files_scanned}',
+        f'**Skipped (over size limit):** {len(result.skipped_for_size)}',
+        f'**Timed Out:** {len(result.timed_out)}',
+        f'**Cache Hits/Misses:** {result.cache_hits}/{result.cache_misses}',
         f'**Total Findings:** {len(result.findings)}\n',
         '## Summary\n',
         '| Severity | Count |',
@@ -574,15 +701,26 @@ def main():
     parser.add_argument('--format', '-f', choices=['json', 'markdown'],
                         default='json', help='Output format')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Worker processes (0 = one per available CPU)')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_DIR, metavar='DIR',
+                        help='Reuse findings for unchanged files from an on-disk cache '
+                             f'(default directory: {DEFAULT_CACHE_DIR})')
+    add_fail_fast_argument(parser)
+    add_file_timeout_argument(parser)
+    add_watch_argument(parser)
 
     args = parser.parse_args()
+    if args.watch and (args.output or args.cache or args.fail_fast):
+        parser.error('--watch prints changes to stdout, and cannot be combined with '
+                     '--output, --cache or --fail-fast')
 
     # Initialize
     start_time = datetime.now()
     path = Path(args.path)
     result = CodeScanResult()
     result.scan_timestamp = start_time.isoformat() + 'Z'
-    finding_counter = [0]
+    finding_number = 0
 
     # Sanitize and validate input path
     sanitized_path = sanitize_path(str(path))
@@ -592,25 +730,79 @@ def main():
         print(f"Error: Path does not exist: {path}", file=sys.stderr)
         sys.exit(1)
 
+    scan = partial(scan_within_budget, scan_file_for_code_phi, args.file_timeout)
+
+    if args.watch:
+        # Findings of one file are told apart by what matched, not where
+        tree = WatchedTree(path, code_file_matcher(), SKIP_DIRS)
+        sys.exit(watch_tree(tree, scan, ('pattern_name', 'finding_type', 'value_hash'),
+                            f"CF-{start_time.strftime('%Y%m%d')}-", 'pattern_name',
+                            fmt=args.format, boundaries=(BOUNDARY_BEGIN, BOUNDARY_END),
+                            jobs=args.jobs, debounce=args.debounce,
+                            max_per_file=MAX_FINDINGS_PER_FILE, verbose=args.verbose))
+
     # Get files
     files = get_code_files(path)
     result.files_scanned = len(files)
+    result.skipped_for_size = [sanitize_output_string(str(f)) for f in files
+                               if is_oversized(f)]
 
     if args.verbose:
         print(f"Scanning {len(files)} code files...", file=sys.stderr)
 
     # Scan files with total findings limit to prevent output flooding
     total_findings_count = 0
-    for file_path in files:
+    cache = None
+    if args.cache:
+        fingerprint = ruleset_fingerprint(__file__, PHI_PATTERNS, CODE_PATTERNS)
+        cache = ScanCache(args.cache, 'scan-code', fingerprint, CodeFinding)
+        cache.prepare()
+        scan = partial(cache.scan, scan)
+        result.cache_enabled = True
+
+    # A gate takes results as they come in, and stopping early cancels the rest
+    gate = FailFastGate(args.fail_fast) if args.fail_fast else None
+    outcomes = scan_files(scan, files, args.jobs, ordered=gate is None)
+    for file_path, outcome in outcomes:
+        if cache is not None:
+            findings, cache_hit = outcome
+            if cache_hit:
+                result.cache_hits += 1
+            else:
+                result.cache_misses += 1
+        else:
+            findings = outcome
+        if isinstance(findings, TimedOut):
+            result.timed_out.append(sanitize_output_string(str(file_path)))
+            if args.verbose:
+                print(f"Warning: {result.timed_out[-1]} timed out after "
+                      f"{args.file_timeout:g}s of CPU time", file=sys.stderr)
+        if gate is not None:
+            if gate.check(findings[:MAX_FINDINGS_PER_FILE],
+                          timed_out=isinstance(findings, TimedOut)):
+                break
+            continue
         if total_findings_count >= MAX_TOTAL_FINDINGS:
             if args.verbose:
                 print(f"Warning: Reached maximum findings limit ({MAX_TOTAL_FINDINGS}). "
                       "Stopping scan.", file=sys.stderr)
             break
-        findings = scan_file_for_code_phi(file_path, finding_counter)
         for f in findings[:MAX_FINDINGS_PER_FILE]:
+            # Number findings in path order so IDs match across runs and --jobs
+            finding_number += 1
+            f.id = f"CF-{start_time.strftime('%Y%m%d')}-{finding_number:04d}"
             result.add_finding(f)
             total_findings_count += 1
+    outcomes.close()
+
+    if gate is not None:
+        if args.output:
+            Path(args.output).write_text(gate.to_json())
+        else:
+            print(BOUNDARY_BEGIN)
+            print(gate.to_json())
+            print(BOUNDARY_END)
+        sys.exit(gate.exit_code)
 
     # Check security controls
     result.security_controls = check_security_controls(path)
@@ -13,15 +13,26 @@ Options:
     --verbose, -v    Verbose output
 """
 
+if __name__ == '__main__':
+    # Hand the run to hipaa-guardiand if it is running, before paying for
+    # the imports below; it returns, and the script runs itself, if not
+    from hipaa_core.daemon import run_in_daemon
+    run_in_daemon('scan-logs')
+
 import argparse
 import json
 import re
 import sys
 from dataclasses import dataclass, field, asdict
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 from typing import List, Dict, Tuple
 
+from hipaa_core import (FailFastGate, GlobMatcher, LineIndex, TimedOut,
+                        add_fail_fast_argument, add_file_timeout_argument, scan_files,
+                        scan_within_budget, walk_files)
+
 
 # =============================================================================
 # Logging Pattern Detection
@@ -165,6 +176,7 @@ class LogScanResult:
     """Container for log scan results."""
     findings: List[LogFinding] = field(default_factory=list)
     files_scanned: int = 0
+    timed_out: List[str] = field(default_factory=list)
     log_statements_analyzed: int = 0
     scan_timestamp: str = ''
     scan_duration: float = 0.0
@@ -179,6 +191,7 @@ class LogScanResult:
                 'scan_timestamp': self.scan_timestamp,
                 'scan_duration_seconds': self.scan_duration,
                 'files_scanned': self.files_scanned,
+                'files_timed_out': self.timed_out,
                 'log_statements_analyzed': self.log_statements_analyzed,
                 'total_findings': len(self.findings),
                 'by_severity': self._count_by_severity(),
@@ -241,13 +254,10 @@ def extract_log_content(content: str, match_start: int) -> Tuple[str, int]:
     return log_content, pos
 
 
-def get_line_info(content: str, pos: int) -> Tuple[int, str]:
+def get_line_info(content: str, line_index: LineIndex, pos: int) -> Tuple[int, str]:
     """Get line number and context for a position."""
-    line_num = content[:pos].count('\n') + 1
-    line_start = content.rfind('\n', 0, pos) + 1
-    line_end = content.find('\n', pos)
-    if line_end == -1:
-        line_end = len(content)
+    line_num = line_index.line_of(pos)
+    line_start, line_end = line_index.line_span(pos)
 
     context = content[line_start:line_end].strip()
     if len(context) > 150:
@@ -291,8 +301,24 @@ def calculate_risk(phi_type: str) -> Tuple[int, str]:
     return score, severity
 
 
-def scan_file_for_log_phi(file_path: Path, finding_counter: List[int]) -> Tuple[List[LogFinding], int]:
+def scan_file_for_log_phi(file_path: Path) -> Tuple[List[LogFinding], int]:
     """Scan a file for PHI in logging statements."""
+    if get_language(file_path) == 'unknown':
+        return [], 0
+
+    try:
+        content = file_path.read_text(encoding='utf-8', errors='ignore')
+    except (OSError, UnicodeError):
+        return [], 0
+
+    return scan_content_for_log_phi(file_path, content, LineIndex(content))
+
+
+def scan_content_for_log_phi(file_path: Path, content: str,
+                             line_index: LineIndex) -> Tuple[List[LogFinding], int]:
+    """Scan the text of a file for PHI in logging statements, with
+    line_index built over it. Used directly by scan-all, which reads each
+    file once for every scanner."""
     findings = []
     log_count = 0
 
@@ -300,11 +326,6 @@ def scan_file_for_log_phi(file_path: Path, finding_counter: List[int]) -> Tuple[
     if language == 'unknown':
         return findings, 0
 
-    try:
-        content = file_path.read_text(encoding='utf-8', errors='ignore')
-    except Exception:
-        return findings, 0
-
     config = LOGGING_PATTERNS[language]
 
     # Find all log statements
@@ -323,8 +344,7 @@ def scan_file_for_log_phi(file_path: Path, finding_counter: List[int]) -> Tuple[
             # Check for PHI patterns
             for phi_pattern, phi_type, phi_desc in PHI_IN_LOG_PATTERNS:
                 if re.search(phi_pattern, log_content, re.I):
-                    finding_counter[0] += 1
-                    line_num, context = get_line_info(content, match.start())
+                    line_num, context = get_line_info(content, line_index, match.start())
                     risk_score, severity = calculate_risk(phi_type)
 
                     # Redact any actual PHI patterns in context
@@ -332,7 +352,7 @@ def scan_file_for_log_phi(file_path: Path, finding_counter: List[int]) -> Tuple[
                     context = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b', '[EMAIL-REDACTED]', context)
 
                     finding = LogFinding(
-                        id=f"LOG-{datetime.now().strftime('%Y%m%d')}-{finding_counter[0]:04d}",
+                        id='',
                         timestamp=datetime.now().isoformat() + 'Z',
                         file=str(file_path),
                         line=line_num,
@@ -350,25 +370,21 @@ def scan_file_for_log_phi(file_path: Path, finding_counter: List[int]) -> Tuple[
     return findings, log_count
 
 
-def get_source_files(path: Path) -> List[Path]:
-    """Get all source files to scan."""
-    files = []
+# All extensions we care about
+SOURCE_EXTENSIONS = sorted({ext for config in LOGGING_PATTERNS.values()
+                            for ext in config['extensions']})
 
-    all_extensions = set()
-    for config in LOGGING_PATTERNS.values():
-        all_extensions.update(config['extensions'])
+# Directories to skip
+SKIP_DIRS = frozenset({'node_modules', '.git', 'venv', '__pycache__', 'vendor', 'dist', 'build'})
 
-    skip_dirs = {'node_modules', '.git', 'venv', '__pycache__', 'vendor', 'dist', 'build'}
 
+def get_source_files(path: Path) -> List[Path]:
+    """Get all source files to scan."""
     if path.is_file():
-        return [path] if path.suffix in all_extensions else []
-
-    for ext in all_extensions:
-        for file_path in path.glob(f'**/*{ext}'):
-            if not any(skip in file_path.parts for skip in skip_dirs):
-                files.append(file_path)
+        return [path] if path.suffix in SOURCE_EXTENSIONS else []
 
-    return files
+    # One walk for all extensions; skipped directories are never entered
+    return walk_files(path, GlobMatcher(f'**/*{ext}' for ext in SOURCE_EXTENSIONS), SKIP_DIRS)
 
 
 # =============================================================================
@@ -386,6 +402,7 @@ def output_markdown(result: LogScanResult) -> str:
         '# Log Safety Scan Results\n',
         f'**Scan Time:** {result.scan_timestamp}',
         f'**Files Scanned:** {result.files_scanned}',
+        f'**Timed Out:** {len(result.timed_out)}',
         f'**Log Statements Analyzed:** {result.log_statements_analyzed}',
         f'**PHI Leakage Findings:** {len(result.findings)}\n',
     ]
@@ -462,6 +479,10 @@ def main():
     parser.add_argument('--output', '-o', help='Output file path')
     parser.add_argument('--format', '-f', choices=['json', 'markdown'], default='markdown')
     parser.add_argument('--verbose', '-v', action='store_true')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Worker processes (0 = one per available CPU)')
+    add_fail_fast_argument(parser)
+    add_file_timeout_argument(parser)
 
     args = parser.parse_args()
 
@@ -469,7 +490,7 @@ def main():
     path = Path(args.path)
     result = LogScanResult()
     result.scan_timestamp = start_time.isoformat() + 'Z'
-    finding_counter = [0]
+    finding_number = 0
     total_log_statements = 0
 
     if not path.exists():
@@ -482,11 +503,37 @@ def main():
     if args.verbose:
         print(f"Scanning {len(files)} source files...", file=sys.stderr)
 
-    for file_path in files:
-        findings, log_count = scan_file_for_log_phi(file_path, finding_counter)
+    # A gate takes results as they come in, and stopping early cancels the rest
+    gate = FailFastGate(args.fail_fast) if args.fail_fast else None
+    scan = partial(scan_within_budget, scan_file_for_log_phi, args.file_timeout)
+    outcomes = scan_files(scan, files, args.jobs, ordered=gate is None)
+    for file_path, outcome in outcomes:
+        if isinstance(outcome, TimedOut):
+            result.timed_out.append(str(file_path))
+            if args.verbose:
+                print(f"Warning: {file_path} timed out after "
+                      f"{args.file_timeout:g}s of CPU time", file=sys.stderr)
+            findings, log_count = outcome, 0
+        else:
+            findings, log_count = outcome
+        if gate is not None:
+            if gate.check(findings):
+                break
+            continue
         total_log_statements += log_count
         for f in findings:
+            # Number findings in path order so IDs match across runs and --jobs
+            finding_number += 1
+            f.id = f"LOG-{start_time.strftime('%Y%m%d')}-{finding_number:04d}"
             result.add_finding(f)
+    outcomes.close()
+
+    if gate is not None:
+        if args.output:
+            Path(args.output).write_text(gate.to_json())
+        else:
+            print(gate.to_json())
+        sys.exit(gate.exit_code)
 
     result.log_statements_analyzed = total_log_statements
     result.scan_duration = (datetime.now() - start_time).total_seconds()
@@ -13,20 +13,86 @@ Options:
     --verbose, -v    Verbose output
 """
 
+if __name__ == '__main__':
+    # Hand the run to hipaa-guardiand if it is running, before paying for
+    # the imports below; it returns, and the script runs itself, if not
+    from hipaa_core.daemon import run_in_daemon
+    run_in_daemon('scan-response')
+
 import argparse
 import json
 import re
 import sys
 from dataclasses import dataclass, field, asdict
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Iterator, Optional, Tuple
+
+from hipaa_core import (FailFastGate, GlobMatcher, LineIndex, TimedOut,
+                        add_fail_fast_argument, add_file_timeout_argument, scan_files,
+                        scan_within_budget, walk_files)
 
 
 # =============================================================================
 # API Response Detection Patterns
 # =============================================================================
 
+# Flags the response patterns are matched with
+PATTERN_FLAGS = re.IGNORECASE | re.MULTILINE
+
+PATIENT_PATTERN = re.compile('patient', PATTERN_FLAGS)
+
+
+@dataclass(frozen=True)
+class PatientBlock:
+    """A block that mentions patient: opening, then, if arrow is given,
+    everything up to the next ')' followed by arrow, then a body running
+    to the next '}'.
+
+    Finds what the regex opening + r'[^)]*\)' + arrow +
+    r'[^}]*patient[^}]*\}' would (without the middle part if arrow is
+    None), but in linear time. The regex backtracks through the body
+    looking for patient, and rescans it from every opening that shares it.
+    """
+    opening: str              # regex, ending in '{', or in '(' if arrow is given
+    arrow: Optional[str] = None  # regex, ending in '{'
+
+    def matches(self, content: str) -> Iterator[Tuple[int, int, str]]:
+        opening = re.compile(self.opening, PATTERN_FLAGS)
+        arrow = re.compile(self.arrow, PATTERN_FLAGS) if self.arrow else None
+        # The next ')', '}' and patient, kept while later openings share them
+        paren = brace = -1
+        patient = None
+        pos = 0
+        while True:
+            start = opening.search(content, pos)
+            if start is None:
+                return
+            body = start.end()
+            pos = start.start() + 1
+            if arrow is not None:
+                if paren < body:
+                    paren = content.find(')', body)
+                    if paren == -1:
+                        return
+                after = arrow.match(content, paren + 1)
+                if after is None:
+                    continue
+                body = after.end()
+            if brace < body:
+                brace = content.find('}', body)
+                if brace == -1:
+                    return
+            if patient is None or patient.start() < body:
+                patient = PATIENT_PATTERN.search(content, body)
+                if patient is None:
+                    return
+            if patient.end() <= brace:
+                pos = brace + 1
+                yield start.start(), pos, content[start.start():pos]
+
+
 RESPONSE_PATTERNS = {
     'python': {
         'extensions': ['.py'],
@@ -34,7 +100,7 @@ RESPONSE_PATTERNS = {
             # Flask/FastAPI JSON responses
             (r'return\s+jsonify\s*\(\s*([^)]+)\s*\)', 'flask_jsonify'),
             (r'return\s+JSONResponse\s*\(\s*content\s*=\s*([^)]+)\s*\)', 'fastapi_json'),
-            (r'return\s+\{[^}]*patient[^}]*\}', 'dict_return'),
+            (PatientBlock(r'return\s+\{'), 'dict_return'),
             (r'\.to_dict\s*\(\s*\)', 'to_dict'),
             (r'\.model_dump\s*\(\s*\)', 'pydantic_dump'),
             (r'\.dict\s*\(\s*\)', 'pydantic_dict'),
@@ -57,7 +123,7 @@ RESPONSE_PATTERNS = {
             (r'return\s+NextResponse\.json\s*\(\s*([^)]+)\s*\)', 'nextjs_response'),
             (r'ctx\.body\s*=\s*([^;]+)', 'koa_body'),
             # GraphQL resolvers
-            (r'resolve[r]?\s*:\s*\([^)]*\)\s*=>\s*\{[^}]*patient[^}]*\}', 'graphql_resolver'),
+            (PatientBlock(r'resolver?\s*:\s*\(', r'\s*=>\s*\{'), 'graphql_resolver'),
         ],
         'phi_fields': [
             r'\bssn\b', r'\bsocialSecurity\b',
@@ -173,6 +239,7 @@ class ResponseScanResult:
     """Container for API response scan results."""
     findings: List[ResponseFinding] = field(default_factory=list)
     files_scanned: int = 0
+    timed_out: List[str] = field(default_factory=list)
     responses_analyzed: int = 0
     scan_timestamp: str = ''
     scan_duration: float = 0.0
@@ -187,6 +254,7 @@ class ResponseScanResult:
                 'scan_timestamp': self.scan_timestamp,
                 'scan_duration_seconds': self.scan_duration,
                 'files_scanned': self.files_scanned,
+                'files_timed_out': self.timed_out,
                 'responses_analyzed': self.responses_analyzed,
                 'total_findings': len(self.findings),
                 'by_severity': self._count_by_severity(),
@@ -211,6 +279,17 @@ class ResponseScanResult:
 # Detection Functions
 # =============================================================================
 
+def response_matches(pattern, content: str) -> Iterator[Tuple[int, int, str]]:
+    """Yield (start, end, response content) for each match of a response
+    pattern, a regex or a PatientBlock. The response content is the
+    regex's first group, if it has one, or the whole match."""
+    if isinstance(pattern, str):
+        for match in re.finditer(pattern, content, PATTERN_FLAGS):
+            yield match.start(), match.end(), match.group(1) if match.lastindex else match.group()
+    else:
+        yield from pattern.matches(content)
+
+
 def get_language(file_path: Path) -> str:
     """Determine language from file extension."""
     ext = file_path.suffix.lower()
@@ -248,13 +327,10 @@ def find_phi_fields(content: str, phi_patterns: List[str]) -> List[str]:
     return list(set(found))
 
 
-def get_line_info(content: str, pos: int) -> Tuple[int, str]:
+def get_line_info(content: str, line_index: LineIndex, pos: int) -> Tuple[int, str]:
     """Get line number and context for a position."""
-    line_num = content[:pos].count('\n') + 1
-    line_start = content.rfind('\n', 0, pos) + 1
-    line_end = content.find('\n', pos)
-    if line_end == -1:
-        line_end = len(content)
+    line_num = line_index.line_of(pos)
+    line_start, line_end = line_index.line_span(pos)
 
     context = content[line_start:line_end].strip()
     if len(context) > 150:
@@ -296,8 +372,24 @@ def calculate_risk(phi_fields: List[str]) -> Tuple[int, str]:
     return score, severity
 
 
-def scan_file_for_response_phi(file_path: Path, finding_counter: List[int]) -> Tuple[List[ResponseFinding], int]:
+def scan_file_for_response_phi(file_path: Path) -> Tuple[List[ResponseFinding], int]:
     """Scan a file for PHI exposure in API responses."""
+    if get_language(file_path) == 'unknown':
+        return [], 0
+
+    try:
+        content = file_path.read_text(encoding='utf-8', errors='ignore')
+    except (OSError, UnicodeError):
+        return [], 0
+
+    return scan_content_for_response_phi(file_path, content, LineIndex(content))
+
+
+def scan_content_for_response_phi(file_path: Path, content: str,
+                                  line_index: LineIndex) -> Tuple[List[ResponseFinding], int]:
+    """Scan the text of a file for PHI exposure in API responses, with
+    line_index built over it. Used directly by scan-all, which reads each
+    file once for every scanner."""
     findings = []
     response_count = 0
 
@@ -305,41 +397,32 @@ def scan_file_for_response_phi(file_path: Path, finding_counter: List[int]) -> T
     if language == 'unknown':
         return findings, 0
 
-    try:
-        content = file_path.read_text(encoding='utf-8', errors='ignore')
-    except Exception:
-        return findings, 0
-
     config = RESPONSE_PATTERNS[language]
 
     for pattern, response_type in config['response_patterns']:
-        for match in re.finditer(pattern, content, re.I | re.M):
+        for start, end, response_content in response_matches(pattern, content):
             response_count += 1
 
-            # Get the response content
-            response_content = match.group(1) if match.lastindex else match.group()
-
             # Check if masking is applied
-            if has_masking(content, match.start(), match.end()):
+            if has_masking(content, start, end):
                 continue
 
             # Find PHI fields
             phi_fields = find_phi_fields(response_content, config['phi_fields'])
 
             # Also check surrounding context for PHI fields
-            context_start = max(0, match.start() - 500)
-            context_end = min(len(content), match.end() + 200)
+            context_start = max(0, start - 500)
+            context_end = min(len(content), end + 200)
             context_content = content[context_start:context_end]
             phi_fields.extend(find_phi_fields(context_content, config['phi_fields']))
-            phi_fields = list(set(phi_fields))
+            phi_fields = sorted(set(phi_fields))
 
             if phi_fields:
-                finding_counter[0] += 1
-                line_num, context = get_line_info(content, match.start())
+                line_num, context = get_line_info(content, line_index, start)
                 risk_score, severity = calculate_risk(phi_fields)
 
                 finding = ResponseFinding(
-                    id=f"RESP-{datetime.now().strftime('%Y%m%d')}-{finding_counter[0]:04d}",
+                    id='',
                     timestamp=datetime.now().isoformat() + 'Z',
                     file=str(file_path),
                     line=line_num,
@@ -355,25 +438,21 @@ def scan_file_for_response_phi(file_path: Path, finding_counter: List[int]) -> T
     return findings, response_count
 
 
-def get_source_files(path: Path) -> List[Path]:
-    """Get all source files to scan."""
-    files = []
+# All extensions we care about
+SOURCE_EXTENSIONS = sorted({ext for config in RESPONSE_PATTERNS.values()
+                            for ext in config['extensions']})
 
-    all_extensions = set()
-    for config in RESPONSE_PATTERNS.values():
-        all_extensions.update(config['extensions'])
+# Directories to skip
+SKIP_DIRS = frozenset({'node_modules', '.git', 'venv', '__pycache__', 'vendor', 'dist', 'build'})
 
-    skip_dirs = {'node_modules', '.git', 'venv', '__pycache__', 'vendor', 'dist', 'build'}
 
+def get_source_files(path: Path) -> List[Path]:
+    """Get all source files to scan."""
     if path.is_file():
-        return [path] if path.suffix in all_extensions else []
+        return [path] if path.suffix in SOURCE_EXTENSIONS else []
 
-    for ext in all_extensions:
-        for file_path in path.glob(f'**/*{ext}'):
-            if not any(skip in file_path.parts for skip in skip_dirs):
-                files.append(file_path)
-
-    return files
+    # One walk for all extensions; skipped directories are never entered
+    return walk_files(path, GlobMatcher(f'**/*{ext}' for ext in SOURCE_EXTENSIONS), SKIP_DIRS)
 
 
 # =============================================================================
@@ -391,6 +470,7 @@ def output_markdown(result: ResponseScanResult) -> str:
         '# API Response PHI Exposure Scan\n',
         f'**Scan Time:** {result.scan_timestamp}',
         f'**Files Scanned:** {result.files_scanned}',
+        f'**Timed Out:** {len(result.timed_out)}',
         f'**API Responses Analyzed:** {result.responses_analyzed}',
         f'**PHI Exposure Findings:** {len(result.findings)}\n',
     ]
@@ -465,6 +545,10 @@ def main():
     parser.add_argument('--output', '-o', help='Output file path')
     parser.add_argument('--format', '-f', choices=['json', 'markdown'], default='markdown')
     parser.add_argument('--verbose', '-v', action='store_true')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Worker processes (0 = one per available CPU)')
+    add_fail_fast_argument(parser)
+    add_file_timeout_argument(parser)
 
     args = parser.parse_args()
 
@@ -472,7 +556,7 @@ def main():
     path = Path(args.path)
     result = ResponseScanResult()
     result.scan_timestamp = start_time.isoformat() + 'Z'
-    finding_counter = [0]
+    finding_number = 0
     total_responses = 0
 
     if not path.exists():
@@ -485,11 +569,37 @@ def main():
     if args.verbose:
         print(f"Scanning {len(files)} source files...", file=sys.stderr)
 
-    for file_path in files:
-        findings, response_count = scan_file_for_response_phi(file_path, finding_counter)
+    # A gate takes results as they come in, and stopping early cancels the rest
+    gate = FailFastGate(args.fail_fast) if args.fail_fast else None
+    scan = partial(scan_within_budget, scan_file_for_response_phi, args.file_timeout)
+    outcomes = scan_files(scan, files, args.jobs, ordered=gate is None)
+    for file_path, outcome in outcomes:
+        if isinstance(outcome, TimedOut):
+            result.timed_out.append(str(file_path))
+            if args.verbose:
+                print(f"Warning: {file_path} timed out after "
+                      f"{args.file_timeout:g}s of CPU time", file=sys.stderr)
+            findings, response_count = outcome, 0
+        else:
+            findings, response_count = outcome
+        if gate is not None:
+            if gate.check(findings):
+                break
+            continue
         total_responses += response_count
         for f in findings:
+            # Number findings in path order so IDs match across runs and --jobs
+            finding_number += 1
+            f.id = f"RESP-{start_time.strftime('%Y%m%d')}-{finding_number:04d}"
             result.add_finding(f)
+    outcomes.close()
+
+    if gate is not None:
+        if args.output:
+            Path(args.output).write_text(gate.to_json())
+        else:
+            print(gate.to_json())
+        sys.exit(gate.exit_code)
 
     result.responses_analyzed = total_responses
     result.scan_duration = (datetime.now() - start_time).total_seconds()